@@ -1,7 +1,13 @@
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
-from langfuse import observe, get_client, propagate_attributes
-import litellm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # paquet chefkit (racine du dépôt)
+# litellm et langfuse importés au premier usage (démarrage rapide) : voir chefkit.lazy
+from chefkit.lazy import get_client, lazy_import, observe, propagate_attributes
+
+litellm = lazy_import("litellm")
 
 
 # Chargement des variables d'environnement
@@ -1,30 +1,54 @@
 import os
 import json
 import re
+import sys
 import time # Import indispensable pour le sleep
+from pathlib import Path
 from dotenv import load_dotenv
-from langfuse import observe, get_client, propagate_attributes
-import litellm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # paquet chefkit (racine du dépôt)
+# litellm et langfuse importés au premier usage (démarrage rapide) : voir chefkit.lazy
+from chefkit.lazy import get_client, lazy_import, observe, propagate_attributes
+from chefkit.context import StepContext
+from chefkit.prompts import PromptLayout, PrefixCacheStats
+from chefkit.tokens import check_prompt, fit_items, preload_tokenizers, prompt_sizes, token_counter
+
+litellm = lazy_import("litellm")
 
 # Chargement des variables d'environnement
 load_dotenv()
 
 MODEL_ID = "groq/llama-3.1-8b-instant"
+# Pause anti rate limit avant chaque appel (mise à 0 par le serveur, qui a son propre budget LLM)
+RATE_LIMIT_DELAY = float(os.getenv("CHEFBOT_RATE_LIMIT_DELAY", 5))
+# Tokens de contexte max envoyés à chaque étape (contraintes + résultats utiles des étapes précédentes)
+CONTEXT_BUDGET = int(os.getenv("CHEFBOT_CONTEXT_BUDGET", 1200))
+# Tokens max des résultats d'étapes envoyés à la synthèse (avant : str(work_done) sans limite)
+SYNTHESIS_BUDGET = int(os.getenv("CHEFBOT_SYNTHESIS_BUDGET", 3000))
 
-def ask_chef(system_prompt: str, user_prompt: str, temperature: float = 0.3):
+# Tokens du prompt servis par le cache de préfixe du fournisseur
+prompt_cache = PrefixCacheStats()
+
+def ask_chef(system_prompt: str, user_prompt: str, temperature: float = 0.3, context: list = None,
+             site: str = "ask_chef"):
     # On place le sleep ICI pour qu'il s'applique à chaque appel
-    print(f"Attente de 5s (Rate Limit)...")
-    time.sleep(5)
+    if RATE_LIMIT_DELAY:
+        print(f"Attente de {RATE_LIMIT_DELAY:g}s (Rate Limit)...")
+        time.sleep(RATE_LIMIT_DELAY)
     
+    # Ordre fixe : système, puis contexte accumulé, puis la consigne (la seule partie qui change)
+    # -> les appels successifs partagent le même début de prompt, mis en cache par le fournisseur
+    request = PromptLayout(system_prompt, context_title="Contexte").request(user_prompt, context=context)
+    # Taille du prompt comptée en local (tokenizer Llama 3) : histogramme par site d'appel,
+    # PromptTooLarge avant l'envoi plutôt qu'une erreur de contexte de l'API
+    check_prompt(request["messages"], MODEL_ID, site=site)
     response = litellm.completion(
         model=MODEL_ID,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
+        **request,
         temperature=temperature,
         api_key=os.getenv("GROQ_API_KEY")
     )
+    prompt_cache.record(response)
     return response.choices[0].message.content
 
 @observe(name="1. Planification (JSON)")
@@ -34,7 +58,7 @@ def get_planning_steps(constraints: str):
     
     attempts = 0
     while attempts < 2:
-        res = ask_chef(system_prompt, f"Contraintes : {constraints}")
+        res = ask_chef(system_prompt, f"Contraintes : {constraints}", site="planification")
         try:
             json_str = re.search(r'\[.*\]', res, re.DOTALL).group() if "[" in res else res
             return json.loads(json_str)
@@ -53,35 +77,47 @@ def get_planning_steps(constraints: str):
 @observe(name="2. Exécution des étapes")
 def execute_steps(steps: list, constraints: str):
     results = []
-    current_context = f"Contraintes : {constraints}"
+    # Plus de concaténation de tout le texte brut : chaque étape reçoit les contraintes et les
+    # résultats déjà envoyés tels quels, plus le nouveau (complet s'il tient, sinon résumé), dans
+    # le budget. Le contexte ne fait que s'allonger : le préfixe reste en cache chez le fournisseur
+    context = StepContext(budget_tokens=CONTEXT_BUDGET, count_tokens=token_counter(MODEL_ID))
+    context.pin(f"Contraintes : {constraints}")
     
     for step in steps:
-        prompt = f"Exécute cette étape : {step}. Contexte actuel : {current_context}"
-        res = ask_chef("Tu es ChefBot.", prompt)
+        res = ask_chef("Tu es ChefBot.", f"Exécute cette étape : {step}", context=context.select(step), site="étape")
         results.append(res)
-        current_context += f"\n- {step}: {res}"
-        
+        context.add(step, res)
+    
+    prompt_cache.report()
+    get_client().update_current_span(metadata={"context": context.stats()})
     return results
 
 @observe(name="3. Synthèse Finale")
 def synthesize_menu(work_done: list):
     # Le sleep de ask_chef s'appliquera aussi ici
-    return ask_chef("Tu es ChefBot.", f"Compile ces éléments en un menu pour une semaine entière, jour par jour: {str(work_done)}")
+    # Résultats des étapes ramenés au budget (les plus longs réduits à leurs premières phrases)
+    work_done = fit_items(work_done, SYNTHESIS_BUDGET, MODEL_ID)
+    return ask_chef("Tu es ChefBot.", f"Compile ces éléments en un menu pour une semaine entière, jour par jour: {str(work_done)}",
+                    site="synthèse")
 
 @observe(name="Planification Menu Hebdomadaire")
 def plan_weekly_menu(constraints: str) -> str:
     with propagate_attributes(tags=["COLPIN / MORETTI", "Partie 2"]):
         steps = get_planning_steps(constraints)
         details = execute_steps(steps, constraints)
-        return synthesize_menu(details)
+        menu = synthesize_menu(details)
+        prompt_sizes.report_stats()
+        return menu
 
 if __name__ == "__main__":
     langfuse = get_client()
     contraintes = "Végétarien, budget étudiant, produits d'hiver."
+    preload_tokenizers([MODEL_ID])  # tokenizer chargé au démarrage (téléchargement éventuel), pas pendant les appels
     
     print(f"🚀 Lancement du planning (Mode: Anti Rate Limit)")
     try:
         menu = plan_weekly_menu(contraintes)
         print("\n--- MENU FINAL ---\n", menu)
+        print("\n--- TAILLE DES PROMPTS (tokens) ---\n" + prompt_sizes.format())
     finally:
         langfuse.flush()
\ No newline at end of file
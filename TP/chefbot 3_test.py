@@ -1,30 +1,45 @@
 import os
 import json
 import re
+import sys
 import time
+from pathlib import Path
 from dotenv import load_dotenv
-from langfuse import observe, get_client, propagate_attributes
-import litellm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # paquet chefkit (racine du dépôt)
+from chefkit.datasets import load_dataset
+# litellm et langfuse importés au premier usage (démarrage rapide) : voir chefkit.lazy
+from chefkit.lazy import get_client, lazy_client, lazy_import, observe, propagate_attributes
+from chefkit.tokens import check_prompt, fit_items, preload_tokenizers
+
+litellm = lazy_import("litellm")
 
 # 1. Configuration initiale
 load_dotenv()
 MODEL_ID = "groq/llama-3.3-70b-versatile"
 DATASET_NAME = "chefbot-menu-eval-COLPIN-MORETTI"
-langfuse = get_client()
+# Version figée du dataset (ex: "3f2a9c1b7e4d", cf. python -m chefkit.datasets versions ...) ; vide = la plus récente
+DATASET_VERSION = os.getenv("CHEFBOT_DATASET_VERSION") or None
+# Tokens max des travaux envoyés à la synthèse
+SYNTHESIS_BUDGET = int(os.getenv("CHEFBOT_SYNTHESIS_BUDGET", 3000))
+langfuse = lazy_client(get_client)  # créé au premier appel (pas à l'import)
 
 # --- FONCTION DE BASE AVEC ANTI-RATE LIMIT ---
 
-def ask_chef(system_prompt: str, user_prompt: str, temperature: float = 0.3):
+def ask_chef(system_prompt: str, user_prompt: str, temperature: float = 0.3, site: str = "ask_chef"):
     # Sécurité indispensable pour Groq 8b-instant (surtout pendant une expérience)
     print(f"Attente 5s (Rate Limit)...")
     time.sleep(20)
     
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    # Taille comptée avant l'envoi (histogramme par site, PromptTooLarge si trop grand)
+    check_prompt(messages, MODEL_ID, site=site)
     response = litellm.completion(
         model=MODEL_ID,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
+        messages=messages,
         temperature=temperature,
         api_key=os.getenv("GROQ_API_KEY")
     )
@@ -61,7 +76,9 @@ def execute_steps(steps: list, constraints: str):
 
 @observe(name="3. Synthèse Finale")
 def synthesize_menu(work_done: list):
-    return ask_chef("Tu es ChefBot.", f"Compile ces travaux en menu hebdomadaire complet : {str(work_done)}")
+    work_done = fit_items(work_done, SYNTHESIS_BUDGET, MODEL_ID)
+    return ask_chef("Tu es ChefBot.", f"Compile ces travaux en menu hebdomadaire complet : {str(work_done)}",
+                    site="synthèse")
 
 @observe(name="Planification Menu Hebdomadaire")
 def plan_weekly_menu(constraints: str) -> str:
@@ -117,8 +134,10 @@ def llm_judge(output: str, expected: dict, **kwargs):
 def run_chef_experiment():
     print(f"Partie 3 - Lancement de l'expérience sur : {DATASET_NAME}")
     
-    # 1. On récupère les items du dataset manuellement pour éviter l'erreur de len()
-    dataset = langfuse.get_dataset(DATASET_NAME)
+    # 1. On récupère les items depuis le cache local (.cache/datasets) : le serveur n'est
+    # interrogé que pour savoir si le dataset a changé (aucun appel si CHEFKIT_OFFLINE=1)
+    dataset = load_dataset(langfuse, DATASET_NAME, version=DATASET_VERSION)
+    print(f"Dataset version {dataset.version} ({len(dataset.items)} items)")
     
     # 2. On définit la fonction de test
     # Note : Langfuse passe l'objet 'item' à la fonction task
@@ -133,7 +152,8 @@ def run_chef_experiment():
         name="ChefBot_Full_Workflow_V3",
         data=dataset.items,       # ✅ On passe la liste des items (.items)
         task=my_chef_task,        # ✅ On utilise 'task' au lieu de 'run'
-        evaluators=[rule_evaluator, llm_judge]
+        evaluators=[rule_evaluator, llm_judge],
+        metadata={"dataset_version": dataset.version}  # pour rejouer l'expérience sur les mêmes items
     )
     
     print("\n" + "="*50)
@@ -141,5 +161,6 @@ def run_chef_experiment():
     print("="*50)
 
 if __name__ == "__main__":
+    preload_tokenizers([MODEL_ID])  # tokenizer chargé au démarrage, pas pendant les appels
     run_chef_experiment()
     langfuse.flush()
\ No newline at end of file
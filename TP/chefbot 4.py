@@ -1,11 +1,18 @@
 #On a pas utiliser le dataset car on arrive a le cree ais il y a une une limite donc on a pas fait 3.2et 3.3 , le dataset ici est une base de donnee simulee
 import os
 import json
+import sys
 import time
+from pathlib import Path
 from dotenv import load_dotenv
-import litellm
 from smolagents import CodeAgent, LiteLLMModel, tool
-from langfuse import observe, get_client, propagate_attributes
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # paquet chefkit (racine du dépôt)
+from chefkit.cache import lower_arg, memoize_tool, report_cache_stats
+# litellm et langfuse importés au premier usage (démarrage rapide) : voir chefkit.lazy
+from chefkit.lazy import get_client, lazy_import, observe, propagate_attributes
+
+litellm = lazy_import("litellm")
 
 # 1. Chargement des variables d'environnement
 load_dotenv()
@@ -41,10 +48,14 @@ DIETARY_DB = {
 # PARTIE 4.1 : FONCTIONS PYTHON BRUTES
 
 
+# Outils purs => mis en cache (le frigo est une source mutable : invalidate("fridge") s'il change)
+# Clé = l'argument en minuscules, comme le fait le corps de l'outil (.lower())
+@memoize_tool(ttl=60, source="fridge")
 def check_fridge():
     """Retourne la liste des ingrédients disponibles."""
     return str(FRIDGE_CONTENT)
 
+@memoize_tool(ttl=600, normalize=lower_arg)
 def get_recipe(dish_name: str):
     """Retourne une recette détaillée pour un plat donné."""
     # Petite sécurité pour gérer les majuscules/minuscules
@@ -53,6 +64,7 @@ def get_recipe(dish_name: str):
             return RECIPES_DB[key]
     return "Recette non trouvée."
 
+@memoize_tool(ttl=600, normalize=lower_arg)
 def check_dietary_info(ingredient: str):
     """Retourne les infos nutritionnelles et allergènes."""
     return DIETARY_DB.get(ingredient.lower(), "Info non disponible.")
@@ -168,6 +180,7 @@ def run_manual_loop(user_query):
 
 # 1. Définition des outils avec @tool
 @tool
+@memoize_tool(ttl=60, source="fridge")
 def check_fridge_tool() -> str:
     """
     Vérifie les ingrédients disponibles dans le frigo.
@@ -176,6 +189,7 @@ def check_fridge_tool() -> str:
     return str(FRIDGE_CONTENT)
 
 @tool
+@memoize_tool(ttl=600, normalize=lower_arg)
 def get_recipe_tool(dish_name: str) -> str:
     """
     Trouve une recette pour un plat donné.
@@ -189,6 +203,7 @@ def get_recipe_tool(dish_name: str) -> str:
     return "Recette introuvable."
 
 @tool
+@memoize_tool(ttl=600, normalize=lower_arg)
 def check_dietary_info_tool(ingredient: str) -> str:
     """
     Donne les informations nutritionnelles et allergènes d'un ingrédient.
@@ -197,6 +212,7 @@ def check_dietary_info_tool(ingredient: str) -> str:
     """
     return DIETARY_DB.get(ingredient.lower(), "Info inconnue.")
 
+@observe(name="Partie 4 - Smolagents")
 def run_smolagents_loop(user_query):
     print(f"\n\n--- DÉMARRAGE MODE SMOLAGENTS ({MODEL_ID}) ---")
     
@@ -217,6 +233,10 @@ def run_smolagents_loop(user_query):
     except Exception as e:
         print(f"Erreur Smolagents : {e}")
 
+    # Taux de hit du cache des outils (visible dans la trace Langfuse)
+    stats = report_cache_stats()
+    print(f"Cache outils : {stats['overall']['hits']}/{stats['overall']['calls']} hits")
+
 
 # MAIN EXECUTION
 
@@ -229,4 +249,6 @@ if __name__ == "__main__":
     run_manual_loop(QUERY)
     
     # 2. Lancer la méthode Framework
-    run_smolagents_loop(QUERY)
\ No newline at end of file
+    run_smolagents_loop(QUERY)
+
+    get_client().flush()
\ No newline at end of file
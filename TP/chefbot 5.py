@@ -3,9 +3,14 @@ import json
 import sys
 from datetime import datetime
 from dotenv import load_dotenv
-import litellm
-from smolagents import CodeAgent, LiteLLMModel, tool, Tool
+from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # paquet chefkit (racine du dépôt)
+from chefkit.lazy import deferred, lazy_import, module_getattr
+from chefkit.runlog import RunLog, step_callbacks
+from chefkit.sessions import SessionStore, open_store, make_order_tool
+
+litellm = lazy_import("litellm")  # importé au premier usage (plusieurs secondes)
 
 
 load_dotenv()
@@ -14,24 +19,6 @@ MODEL_ID = "groq/llama-3.3-70b-versatile"
 if not os.getenv("GROQ_API_KEY"):
     print("ATTENTION : La variable GROQ_API_KEY est manquante dans le fichier .env")
 
-# Classe utilitaire pour enregistrer la sortie dans un fichier
-class DualLogger:
-    def __init__(self, filename):
-        self.terminal = sys.stdout
-        self.log = open(filename, "w", encoding="utf-8")
-
-    def write(self, message):
-        self.terminal.write(message)
-        self.log.write(message)
-
-    def flush(self):
-        self.terminal.flush()
-        self.log.flush()
-
-# Activation du logging vers fichier
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-sys.stdout = DualLogger(f"run_{timestamp}.txt")
-
 
 
 # PARTIE 4 : RECETTES & FRIGO
@@ -54,8 +41,9 @@ DIETARY_DB = {
 }
 
 # Outils Partie 4 
+# Fonctions simples : les outils smolagents sont construits à la création des agents
+# (agent_tools(), MenuDatabaseTool), smolagents n'est pas importé au chargement du script.
 
-@tool
 def check_fridge_tool() -> str:
     """
     Vérifie les ingrédients disponibles dans le frigo.
@@ -63,7 +51,6 @@ def check_fridge_tool() -> str:
     """
     return str(FRIDGE_CONTENT)
 
-@tool
 def get_recipe_tool(dish_name: str) -> str:
     """
     Trouve une recette pour un plat donné.
@@ -76,7 +63,6 @@ def get_recipe_tool(dish_name: str) -> str:
             return RECIPES_DB[key]
     return "Recette introuvable."
 
-@tool
 def check_dietary_info_tool(ingredient: str) -> str:
     """
     Donne les informations nutritionnelles et allergènes d'un ingrédient.
@@ -87,12 +73,16 @@ def check_dietary_info_tool(ingredient: str) -> str:
     return DIETARY_DB.get(ingredient.lower(), "Info inconnue.")
 
 def run_partie_4():
+    from smolagents import CodeAgent, LiteLLMModel
+
     print("\n\nPARTIE 4 : FRIGO & RECETTES ")
     model = LiteLLMModel(model_id=MODEL_ID)
+    tools = agent_tools()
     agent = CodeAgent(
-        tools=[check_fridge_tool, get_recipe_tool, check_dietary_info_tool], 
+        tools=[tools["check_fridge_tool"], tools["get_recipe_tool"], tools["check_dietary_info_tool"]], 
         model=model,
-        add_base_tools=False
+        add_base_tools=False,
+        step_callbacks=step_callbacks()
     )
     query = "Qu'est-ce que j'ai dans le frigo ? Donne moi une recette possible avec ces ingrédients, et vérifie si la recette contient du lactose."
     
@@ -108,54 +98,58 @@ def run_partie_4():
 
 # 5.1 - Outil Base de Données Tool est dans la parentese pas avec le @tool
 
-class MenuDatabaseTool(Tool):
-    name = "menu_search"
-    description = "Recherche des plats dans le menu selon des critères."
-    inputs = {
-        "category": {"type": "string", "description": "Optionnel: 'Entrée', 'Plat', 'Dessert'", "nullable": True},
-        "max_price": {"type": "integer", "description": "Optionnel: prix maximum en euros", "nullable": True},
-        "allergen_free": {"type": "string", "description": "Optionnel: allergène à éviter (ex: 'gluten', 'lactose')", "nullable": True}
-    }
-    output_type = "string"
-
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        # Base de données de 10 plats minimum
-        self.menu_db = [
-            {"nom": "Salade César", "prix": 12, "allergenes": ["lactose", "gluten"], "categorie": "Entrée"},
-            {"nom": "Soupe de Potiron", "prix": 8, "allergenes": [], "categorie": "Entrée"},
-            {"nom": "Carpaccio de Bœuf", "prix": 14, "allergenes": [], "categorie": "Entrée"},
-            {"nom": "Risotto aux Champignons", "prix": 18, "allergenes": ["lactose"], "categorie": "Plat"},
-            {"nom": "Steak Frites", "prix": 22, "allergenes": [], "categorie": "Plat"},
-            {"nom": "Curry de Légumes", "prix": 16, "allergenes": [], "categorie": "Plat"}, # Vegan
-            {"nom": "Pâtes Carbonara", "prix": 17, "allergenes": ["lactose", "gluten", "oeuf"], "categorie": "Plat"},
-            {"nom": "Pavé de Saumon", "prix": 20, "allergenes": ["poisson"], "categorie": "Plat"},
-            {"nom": "Mousse au Chocolat", "prix": 7, "allergenes": ["lactose", "oeuf"], "categorie": "Dessert"},
-            {"nom": "Salade de Fruits", "prix": 6, "allergenes": [], "categorie": "Dessert"}
-        ]
-
-    def forward(self, category: str = None, max_price: int = None, allergen_free: str = None) -> str:
-        results = self.menu_db
-        
-        # Filtrage
-        if category:
-            results = [p for p in results if p["categorie"].lower() == category.lower()]
-        
-        if max_price:
-            results = [p for p in results if p["prix"] <= max_price]
+@deferred
+def _menu_database_tool():
+    from smolagents import Tool
+
+    class MenuDatabaseTool(Tool):
+        name = "menu_search"
+        description = "Recherche des plats dans le menu selon des critères."
+        inputs = {
+            "category": {"type": "string", "description": "Optionnel: 'Entrée', 'Plat', 'Dessert'", "nullable": True},
+            "max_price": {"type": "integer", "description": "Optionnel: prix maximum en euros", "nullable": True},
+            "allergen_free": {"type": "string", "description": "Optionnel: allergène à éviter (ex: 'gluten', 'lactose')", "nullable": True}
+        }
+        output_type = "string"
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            # Base de données de 10 plats minimum
+            self.menu_db = [
+                {"nom": "Salade César", "prix": 12, "allergenes": ["lactose", "gluten"], "categorie": "Entrée", "vegetarien": False},
+                {"nom": "Soupe de Potiron", "prix": 8, "allergenes": [], "categorie": "Entrée", "vegetarien": True},
+                {"nom": "Carpaccio de Bœuf", "prix": 14, "allergenes": [], "categorie": "Entrée", "vegetarien": False},
+                {"nom": "Risotto aux Champignons", "prix": 18, "allergenes": ["lactose"], "categorie": "Plat", "vegetarien": True},
+                {"nom": "Steak Frites", "prix": 22, "allergenes": [], "categorie": "Plat", "vegetarien": False},
+                {"nom": "Curry de Légumes", "prix": 16, "allergenes": [], "categorie": "Plat", "vegetarien": True}, # Vegan
+                {"nom": "Pâtes Carbonara", "prix": 17, "allergenes": ["lactose", "gluten", "oeuf"], "categorie": "Plat", "vegetarien": False},
+                {"nom": "Pavé de Saumon", "prix": 20, "allergenes": ["poisson"], "categorie": "Plat", "vegetarien": False},
+                {"nom": "Mousse au Chocolat", "prix": 7, "allergenes": ["lactose", "oeuf"], "categorie": "Dessert", "vegetarien": True},
+                {"nom": "Salade de Fruits", "prix": 6, "allergenes": [], "categorie": "Dessert", "vegetarien": True}
+            ]
+
+        def forward(self, category: str = None, max_price: int = None, allergen_free: str = None) -> str:
+            results = self.menu_db
             
-        if allergen_free:
-            # On garde le plat si l'allergène N'EST PAS dans la liste des allergènes du plat
-            results = [p for p in results if allergen_free.lower() not in [a.lower() for a in p["allergenes"]]]
+            # Filtrage
+            if category:
+                results = [p for p in results if p["categorie"].lower() == category.lower()]
             
-        if not results:
-            return "Aucun plat trouvé avec ces critères."
-            
-        return json.dumps(results, ensure_ascii=False)
+            if max_price:
+                results = [p for p in results if p["prix"] <= max_price]
+                
+            if allergen_free:
+                # On garde le plat si l'allergène N'EST PAS dans la liste des allergènes du plat
+                results = [p for p in results if allergen_free.lower() not in [a.lower() for a in p["allergenes"]]]
+                
+            if not results:
+                return "Aucun plat trouvé avec ces critères."
+                
+            return json.dumps(results, ensure_ascii=False)
+    return MenuDatabaseTool
 
 # Outil de calcul pour l'agent (5.2)
 #utilisation de l'outils de calcu
-@tool
 def calculate_bill(prices: list[int]) -> int:
     """
     Calcule la somme totale d'une liste de prix.
@@ -165,52 +159,101 @@ def calculate_bill(prices: list[int]) -> int:
     """
     return sum(prices)
 
+
+@deferred
+def agent_tools():
+    """Les fonctions ci-dessus en outils smolagents (construits une fois)."""
+    from smolagents import tool
+
+    return {f.__name__: tool(f) for f in (check_fridge_tool, get_recipe_tool, check_dietary_info_tool, calculate_bill)}
+
+
+__getattr__ = module_getattr(__name__, MenuDatabaseTool=_menu_database_tool)
+
 # 5.2 - Agent avec Planification
 
+BUDGET_GROUPE = 60
+
+def verifier_menu_groupe(candidat, menu_db):
+    """
+    Vérificateur déterministe du menu proposé (pas d'appel LLM).
+    None = pas encore un menu candidat, True = menu accepté, str = contrainte non respectée.
+    """
+    if not isinstance(candidat, dict) or set(candidat) != {"vegetarien", "sans_gluten", "autre"}:
+        return None
+    plats = {p["nom"].lower(): p for p in menu_db}
+    choix = {}
+    for client, nom in candidat.items():
+        plat = plats.get(str(nom).lower())
+        if plat is None:
+            return f"'{nom}' n'est pas au menu"
+        if plat["categorie"] != "Plat":
+            return f"'{nom}' n'est pas un plat"
+        choix[client] = plat
+    if not choix["vegetarien"]["vegetarien"]:
+        return f"'{choix['vegetarien']['nom']}' n'est pas végétarien"
+    if "gluten" in choix["sans_gluten"]["allergenes"]:
+        return f"'{choix['sans_gluten']['nom']}' contient du gluten"
+    total = sum(p["prix"] for p in choix.values())
+    if total > BUDGET_GROUPE:
+        return f"total {total}€ > budget {BUDGET_GROUPE}€"
+    return True
+
+
 def run_partie_5_planning():
+    from smolagents import LiteLLMModel
+    from chefkit.planning import AdaptivePlanningAgent
+
     print("\n\nPARTIE 5.2 : AGENT PLANIFICATEUR ")
     
     model = LiteLLMModel(model_id=MODEL_ID)
-    menu_tool = MenuDatabaseTool()
+    menu_tool = _menu_database_tool()()
     
-    # Initialisation de l'agent avec planning_interval
-    agent = CodeAgent(
-        tools=[menu_tool, calculate_bill],
+    # Planification adaptative (au lieu de planning_interval=2) : un plan au départ, puis
+    # re-planification seulement si un appel d'outil échoue ("Aucun plat trouvé"...) ou si le vérificateur refuse le menu.
+    # Dès que le vérificateur accepte, le menu est la réponse finale (pas d'étape en plus).
+    agent = AdaptivePlanningAgent(
+        tools=[menu_tool, agent_tools()["calculate_bill"]],
         model=model,
-        planning_interval=2, # Planifie toutes les 2 étapes (donnée dans l'énoncé)
-        add_base_tools=True
+        verifier=lambda candidat: verifier_menu_groupe(candidat, menu_tool.menu_db),
+        max_plan_age=4,
+        add_base_tools=True,
+        step_callbacks=step_callbacks()
     )
 
-    query = """
+    query = f"""
     On est 3 clients au restaurant.
     1. Un végétarien (pas de viande/poisson).
     2. Un sans gluten (pas de gluten).
     3. Moi je mange de tout.
     
-    Budget TOTAL max pour le groupe : 60 euros.
+    Budget TOTAL max pour le groupe : {BUDGET_GROUPE} euros.
     
     Propose-nous un menu complet (1 plat par personne) qui respecte le budget et les régimes.
     Utilise l'outil de calcul pour vérifier le total.
+    Quand tu as un menu candidat, termine ton code par le dictionnaire
+    {{"vegetarien": nom_du_plat, "sans_gluten": nom_du_plat, "autre": nom_du_plat}} : il sera vérifié automatiquement.
     """
     
     try:
-        agent.run(query)
+        menu = agent.run(query)
+        print(f"Menu retenu: {menu}")
+        print(f"Planification: {agent.plan_stats}")
     except Exception as e:
         print(f"Erreur Planning: {e}")
 
 # 5.3 - Agent Conversationnel Multi-tours
 
-def run_partie_5_conversation():
+def run_partie_5_conversation(store: SessionStore = None, session_id: str = "table-1"):
+    from smolagents import CodeAgent, LiteLLMModel
+
     print("\n\nPARTIE 5.3 : AGENT CONVERSATIONNEL ")
     
     model = LiteLLMModel(model_id=MODEL_ID)
-    menu_tool = MenuDatabaseTool()
-    
-    agent = CodeAgent(
-        tools=[menu_tool, calculate_bill],
-        model=model,
-        add_base_tools=True
-    )
+    menu_tool = _menu_database_tool()()
+    # La conversation est dans le store (mémoire compacte + commande), pas dans l'agent :
+    # n'importe quel process peut servir le tour suivant, même après un redémarrage
+    store = store or open_store(os.getenv("CHEFBOT_SESSIONS", "memory://"))
 
     # Simulation du dialogue
     dialogue_turns = [
@@ -222,8 +265,27 @@ def run_partie_5_conversation():
     for i, turn in enumerate(dialogue_turns):
         print(f"\n--- TOUR {i+1}")
         print(f"Client: {turn}")
-        # reset=False est crucial ici pour garder la mémoire de la conversation
-        agent.run(turn, reset=False)
+        session = store.load(session_id)
+        ordered = len(session.order)
+        # Agent neuf à chaque tour : l'historique lui est redonné dans la tâche
+        agent = CodeAgent(
+            tools=[menu_tool, agent_tools()["calculate_bill"], make_order_tool(session, menu_tool.menu_db)],
+            model=model,
+            add_base_tools=True,
+            step_callbacks=step_callbacks()
+        )
+        answer = agent.run(session.context() + turn)
+        added = session.order[ordered:]
+
+        # Sauvegarde sur la dernière version de la session (rejouée si un autre process l'a modifiée)
+        def save(state):
+            for dish in added:
+                state.add_to_order(dish)
+            state.record_turn(turn, answer)
+
+        store.update(session_id, save)
+
+    print(f"Commande finale: {store.load(session_id).order}")
 
 
 
@@ -231,6 +293,11 @@ def run_partie_5_conversation():
 
 
 if __name__ == "__main__":
+    # Sortie console copiée dans run_<date>.txt par un thread d'écriture (l'agent n'attend pas le disque),
+    # + run_<date>.events.jsonl : une ligne JSON par étape d'agent (durée, tokens, outils)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    run_log = RunLog(f"run_{timestamp}.txt").install()
+
     #regarde la console si pb sur litellm
     litellm._turn_on_debug()
     
@@ -238,4 +305,5 @@ if __name__ == "__main__":
     run_partie_5_planning()
     run_partie_5_conversation()
     
-    print(f"\n\n--- Fin du programme. Trace sauvegardée dans le fichier txt généré.")
\ No newline at end of file
+    print(f"\n\n--- Fin du programme. Trace sauvegardée dans {run_log.path} (événements : run_{timestamp}.events.jsonl)")
+    run_log.close()
\ No newline at end of file
@@ -3,9 +3,20 @@ import os
 import json
 import sys
 from datetime import datetime
+from pathlib import Path
 from dotenv import load_dotenv
-from smolagents import CodeAgent, tool, Tool
-from smolagents.models import LiteLLMModel
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # paquet chefkit (racine du dépôt)
+from chefkit.agentdocs import compile_prompts, report_prompt_stats
+from chefkit.blackboard import Blackboard, share_tools
+from chefkit.budget import RunBudget, apply_budget
+from chefkit.cache import lower_arg, memoize_tool, report_cache_stats
+from chefkit.datafile import load_table
+from chefkit.delegation import enable_parallel_delegation
+from chefkit.ingredients import get_kb
+from chefkit.lazy import deferred, get_client, module_getattr, observe
+from chefkit.routing import ModelRouter, route_agents
+from chefkit.sandbox import get_pool, sandboxed
 
 
 # CONFIGURATION
@@ -15,119 +26,160 @@ load_dotenv()
 
 
 MODEL_ID = "groq/llama-3.3-70b-versatile"
+SMALL_MODEL_ID = "groq/llama-3.1-8b-instant"  # étapes d'appel d'outils des agents spécialisés
 
-if not os.getenv("GROQ_API_KEY"):
-    print("ERREUR: GROQ_API_KEY manquante dans .env")
-    sys.exit(1)
+# Budget de toute la requête (manager + agents spécialisés ensemble) : au-delà, réponse partielle
+MAX_LLM_CALLS = int(os.getenv("CHEFBOT_MAX_LLM_CALLS", 25))
+MAX_TOKENS = int(os.getenv("CHEFBOT_MAX_TOKENS", 120_000))
+MAX_SECONDS = float(os.getenv("CHEFBOT_MAX_SECONDS", 180))
 
 
 # DONNÉES
 
 
-FRIDGE_CONTENT = ["poulet", "crème fraîche", "champignons", "pâtes", "épinards", "fromage"]
-
-RECIPES_DB = {
-    "poulet aux champignons": "1. Saisir le poulet. 2. Ajouter champignons et crème. 3. Servir avec pâtes.",
-    "pâtes aux épinards": "1. Cuire les pâtes. 2. Faire revenir épinards avec crème. 3. Mélanger.",
-    "gratin de pâtes": "1. Cuire pâtes. 2. Mettre dans plat avec crème et fromage. 3. Gratiner."
-}
+# Les données de référence sont dans data/*.json, compilées en tables binaires
+# mappées en mémoire (lecture seule, partagées entre processus) : voir chefkit.datafile
+FRIDGE_CONTENT = load_table("fridge")
+RECIPES_DB = load_table("recipes")
 
-DIETARY_DB = {
-    "crème fraîche": "Contient lactose. Riche en lipides.",
-    "poulet": "Riche en protéines. Viande.",
-    "champignons": "Légume. Riche en fibres.",
-    "pâtes": "Féculent. Contient gluten.",
-    "épinards": "Légume. Riche en fer.",
-    "fromage": "Contient lactose.",
-    "olive": "Fruit à coque.",
-    "quinoa": "Sans gluten.",
-    "potiron": "Légume.",
-    "boeuf": "Viande.",
-    "saumon": "Poisson.",
-    "chèvre": "Contient lactose."
-}
+# Les infos nutritionnelles sont dans la base d'ingrédients de chefkit
+# (clés normalisées : "crèmes fraîches" == "creme fraiche" == "crème fraîche")
 
 
 # OUTILS
 
+# Les outils de lecture sont purs : résultats mis en cache et partagés entre agents.
+# Le frigo est une source mutable -> appeler invalidate("fridge") après l'avoir modifié.
+# Clé du cache = les arguments tels quels, sauf pour les outils qui n'utilisent que arg.lower()
+# (normalize=lower_arg) : les autres renvoient le nom demandé dans leur réponse.
+# Ce sont des fonctions simples : les outils smolagents sont construits au premier usage
+# (agent_tools(), MenuDatabaseTool), smolagents n'est pas importé au chargement du script.
+
 #ingédients disponible
-@tool
+@memoize_tool(ttl=60, source="fridge")
 def check_fridge_tool() -> str:
     """Vérifie les ingrédients disponibles dans le frigo."""
-    return f"Ingrédients: {', '.join(FRIDGE_CONTENT)}"
+    return f"Ingrédients: {', '.join(FRIDGE_CONTENT.column('ingredient'))}"
 
-@tool
+def _find_recipe(dish_name: str):
+    for recipe in RECIPES_DB:
+        if dish_name.lower() in recipe["nom"].lower():
+            return recipe
+    return None
+
+@memoize_tool(ttl=600, normalize=lower_arg)
 def get_recipe_tool(dish_name: str) -> str:
     """Trouve une recette pour un plat.
     
     Args:
         dish_name: Nom du plat recherché
     """
-    for key in RECIPES_DB:
-        if dish_name.lower() in key.lower():
-            return f"Recette '{key}': {RECIPES_DB[key]}"
-    return f"Recette introuvable. Disponibles: {', '.join(RECIPES_DB.keys())}"
+    recipe = _find_recipe(dish_name)
+    if recipe:
+        return f"Recette '{recipe['nom']}': {recipe['etapes']}"
+    return f"Recette introuvable. Disponibles: {', '.join(RECIPES_DB.column('nom'))}"
+
+@memoize_tool(ttl=600)
+def get_recipes_tool(dish_names: list) -> str:
+    """Trouve les recettes de PLUSIEURS plats en un seul appel.
+    Retourne un JSON {plat demandé: recette ou null si introuvable}.
+
+    Args:
+        dish_names: Liste des noms de plats (ex: ['gratin de pâtes', 'poulet aux champignons'])
+    """
+    results = {}
+    for dish_name in dish_names:
+        recipe = _find_recipe(str(dish_name))
+        results[dish_name] = {"plat": recipe["nom"], "recette": recipe["etapes"]} if recipe else None
+    return json.dumps(results, ensure_ascii=False)
 
-@tool
+@memoize_tool(ttl=600)
 def check_dietary_info_tool(ingredient: str) -> str:
     """Infos nutritionnelles et allergènes d'un ingrédient.
     
     Args:
         ingredient: Nom de l'ingrédient
     """
-    return DIETARY_DB.get(ingredient.lower(), f"Info inconnue pour '{ingredient}'")
-
-class MenuDatabaseTool(Tool):
-    """Recherche dans le menu du restaurant."""
-    name = "menu_search"
-    description = "Recherche plats selon catégorie, prix, allergènes"
-    inputs = {
-        "category": {"type": "string", "description": "Apéritif/Entrée/Plat/Dessert", "nullable": True},
-        "max_price": {"type": "integer", "description": "Prix max en euros", "nullable": True},
-        "allergen_free": {"type": "string", "description": "Allergène à éviter", "nullable": True}
-    }
-    output_type = "string"
-
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.menu_db = [
-            # Apéritifs
-            {"nom": "Tapenade d'Olives", "prix": 4, "allergenes": ["fruits à coque"], "categorie": "Apéritif"},
-            {"nom": "Mini-Toasts Chèvre", "prix": 5, "allergenes": ["lactose", "gluten"], "categorie": "Apéritif"},
-            {"nom": "Bâtonnets de Légumes", "prix": 3, "allergenes": [], "categorie": "Apéritif"},
-            
-            # Entrées
-            {"nom": "Salade César", "prix": 12, "allergenes": ["lactose", "gluten"], "categorie": "Entrée"},
-            {"nom": "Soupe de Potiron", "prix": 8, "allergenes": [], "categorie": "Entrée"},
-            {"nom": "Carpaccio de Bœuf", "prix": 14, "allergenes": ["viande"], "categorie": "Entrée"},
-            {"nom": "Salade Quinoa Avocat", "prix": 11, "allergenes": [], "categorie": "Entrée"},
-            
-            # Plats
-            {"nom": "Risotto aux Champignons", "prix": 18, "allergenes": ["lactose"], "categorie": "Plat"},
-            {"nom": "Steak Frites", "prix": 22, "allergenes": ["viande"], "categorie": "Plat"},
-            {"nom": "Curry de Légumes", "prix": 16, "allergenes": [], "categorie": "Plat"},
-            {"nom": "Pâtes Carbonara", "prix": 17, "allergenes": ["lactose", "gluten", "oeuf", "viande"], "categorie": "Plat"},
-            {"nom": "Pavé de Saumon", "prix": 20, "allergenes": ["poisson"], "categorie": "Plat"},
-            
-            # Desserts
-            {"nom": "Mousse au Chocolat", "prix": 7, "allergenes": ["lactose", "oeuf"], "categorie": "Dessert"},
-            {"nom": "Salade de Fruits", "prix": 6, "allergenes": [], "categorie": "Dessert"},
-            {"nom": "Sorbet Citron", "prix": 5, "allergenes": [], "categorie": "Dessert"}
-        ]
-
-    def forward(self, category: str = None, max_price: int = None, allergen_free: str = None) -> str:
-        results = self.menu_db.copy()
+    kb = get_kb()
+    info = kb.lookup(ingredient)
+    if info is None:
+        # "beurre de cacahuète" n'est pas "beurre" : les proches sont à confirmer, jamais la réponse
+        suggestions = ", ".join(i.name for i in kb.partial(ingredient) or kb.complete(ingredient[:3]))
+        return (f"Info inconnue pour '{ingredient}' (allergènes non vérifiés)"
+                + (f". Proches, à confirmer: {suggestions}" if suggestions else ""))
+    return info.describe()
+
+@memoize_tool(ttl=600)
+def check_ingredients_tool(ingredients: list) -> str:
+    """Vérifie TOUTE une liste d'ingrédients en un seul appel (allergènes, régime, nutrition).
+    Retourne un JSON {ingrédient: infos ou null si inconnu}.
+
+    Args:
+        ingredients: Liste des noms d'ingrédients (ex: ['crème fraîche', 'pâtes', 'poulet'])
+    """
+    results = get_kb().lookup_many([str(i) for i in ingredients])
+    return json.dumps({k: v.to_dict() if v else None for k, v in results.items()}, ensure_ascii=False)
+
+@deferred
+def _menu_database_tool():
+    from smolagents import Tool
+
+    class MenuDatabaseTool(Tool):
+        """Recherche dans le menu du restaurant."""
+        name = "menu_search"
+        description = "Recherche plats selon catégorie, prix, allergènes"
+        inputs = {
+            "category": {"type": "string", "description": "Apéritif/Entrée/Plat/Dessert", "nullable": True},
+            "max_price": {"type": "integer", "description": "Prix max en euros", "nullable": True},
+            "allergen_free": {"type": "string", "description": "Allergène à éviter", "nullable": True}
+        }
+        output_type = "string"
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.menu_db = load_table("menu")  # data/menu.json
+
+        def _filter(self, category=None, max_price=None, allergens_free=()):
+            results = list(self.menu_db)
         
-        if category:
-            results = [p for p in results if p["categorie"].lower() == category.lower()]
-        if max_price:
-            results = [p for p in results if p["prix"] <= max_price]
-        if allergen_free:
-            results = [p for p in results if not any(allergen_free.lower() in a.lower() for a in p["allergenes"])]
-            
-        return json.dumps(results, ensure_ascii=False, indent=2) if results else "Aucun plat trouvé."
-
-@tool
+            if category:
+                results = [p for p in results if p["categorie"].lower() == category.lower()]
+            if max_price:
+                results = [p for p in results if p["prix"] <= max_price]
+            for allergen in allergens_free:
+                results = [p for p in results if not any(allergen.lower() in a.lower() for a in p["allergenes"])]
+            return results
+
+        @memoize_tool(ttl=600, name="menu_search", normalize=lower_arg)
+        def forward(self, category: str = None, max_price: int = None, allergen_free: str = None) -> str:
+            results = self._filter(category, max_price, [allergen_free] if allergen_free else [])
+            return json.dumps(results, ensure_ascii=False, indent=2) if results else "Aucun plat trouvé."
+    return MenuDatabaseTool
+
+
+@deferred
+def _menu_batch_search_tool():
+    MenuDatabaseTool = _menu_database_tool()
+
+    class MenuBatchSearchTool(MenuDatabaseTool):
+        """Version batch : toutes les catégories et tous les allergènes en un seul appel."""
+        name = "menu_search_batch"
+        description = ("Recherche en UN appel les plats de plusieurs catégories, sans AUCUN des allergènes donnés. "
+                       "Retourne un JSON {catégorie: [plats]}")
+        inputs = {
+            "categories": {"type": "array", "description": "Liste de catégories, ex: ['Apéritif', 'Entrée', 'Plat', 'Dessert']"},
+            "max_price": {"type": "integer", "description": "Prix max par plat en euros", "nullable": True},
+            "allergens_free": {"type": "array", "description": "Allergènes à éviter, ex: ['viande', 'poisson', 'gluten']", "nullable": True}
+        }
+        output_type = "string"
+
+        @memoize_tool(ttl=600, name="menu_search_batch")
+        def forward(self, categories: list, max_price: int = None, allergens_free: list = None) -> str:
+            results = {c: self._filter(c, max_price, allergens_free or []) for c in categories}
+            return json.dumps(results, ensure_ascii=False)
+    return MenuBatchSearchTool
+
+
 def calculate_bill(prices: list) -> int:
     """Calcule la somme de prix.
     
@@ -137,16 +189,36 @@ def calculate_bill(prices: list) -> int:
     return sum(int(p) for p in prices)
 
 
+@deferred
+def agent_tools():
+    """Les fonctions ci-dessus en outils smolagents (construits une fois)."""
+    from smolagents import tool
+
+    return {f.__name__: tool(f) for f in (check_fridge_tool, get_recipe_tool, get_recipes_tool,
+                                          check_dietary_info_tool, check_ingredients_tool, calculate_bill)}
+
+
+__getattr__ = module_getattr(__name__, MenuDatabaseTool=_menu_database_tool,
+                             MenuBatchSearchTool=_menu_batch_search_tool)
+
+
 # SYSTÈME MULTI-AGENT
 
 
+@observe(name="Système multi-agents - Restaurant")
 def run_multi_agent_system():
+    from smolagents import CodeAgent, LiteLLMModel
+
     print("\n" + "="*60)
     print("SYSTÈME MULTI-AGENTS - RESTAURANT")
     print("="*60 + "\n")
+
+    # Vérifiée ici et pas à l'import : le serveur charge ce script sans le lancer
+    if not os.getenv("GROQ_API_KEY"):
+        print("ERREUR: GROQ_API_KEY manquante dans .env")
+        sys.exit(1)
     
     # SOLUTION: Créer le modèle avec les bons paramètres
-    import litellm
     
     # Configuration explicite pour Groq
     model = LiteLLMModel(
@@ -154,34 +226,50 @@ def run_multi_agent_system():
         api_key=os.getenv("GROQ_API_KEY")
     )
     
-    print(f"OK Modèle: {MODEL_ID}\n")
+    small_model = LiteLLMModel(
+        model_id=SMALL_MODEL_ID,
+        api_key=os.getenv("GROQ_API_KEY")
+    )
+    # Routage : le manager (synthèse) et les plans sur le 70B, les appels d'outils des
+    # agents spécialisés sur le 8B, avec bascule sur le 70B si le 8B échoue
+    router = ModelRouter(small=small_model, large=model)
+    
+    print(f"OK Modèles: {SMALL_MODEL_ID} (outils) / {MODEL_ID} (synthèse)\n")
+
+    tools = agent_tools()
 
     # AGENTS SPÉCIALISÉS
     print("--- Création des agents ---\n")
     #agent nutrisioniste
+    # Chaque étape d'un CodeAgent = un appel LLM : on pousse les agents vers les outils batch
     nutritionist = CodeAgent(
-        tools=[check_dietary_info_tool],
+        tools=[tools["check_dietary_info_tool"], tools["check_ingredients_tool"]],
         model=model,
         name="nutritionist",
-        description="Expert nutrition - vérifie allergènes",
+        description="Expert nutrition - vérifie allergènes. Donne-lui la liste COMPLÈTE des ingrédients en une fois.",
+        instructions="Pour plusieurs ingrédients, appelle check_ingredients_tool UNE seule fois avec toute la liste, "
+                     "jamais check_dietary_info_tool en boucle.",
         add_base_tools=False
     )
     print("OK Nutritionist")
 #agent chef
     chef = CodeAgent(
-        tools=[check_fridge_tool, get_recipe_tool],
+        tools=[tools["check_fridge_tool"], tools["get_recipe_tool"], tools["get_recipes_tool"]],
         model=model,
         name="chef",
-        description="Chef cuisinier - recettes et frigo",
+        description="Chef cuisinier - recettes et frigo. Accepte plusieurs plats en une demande.",
+        instructions="Pour plusieurs plats, appelle get_recipes_tool UNE seule fois avec toute la liste.",
         add_base_tools=False
     )
     print("OK Chef")
 #agent calcul cout
     budget_manager = CodeAgent(
-        tools=[MenuDatabaseTool(), calculate_bill],
+        tools=[_menu_database_tool()(), _menu_batch_search_tool()(), tools["calculate_bill"]],
         model=model,
         name="budget_manager",
-        description="Gère menu restaurant et budget",
+        description="Gère menu restaurant et budget. Cherche toutes les catégories en une demande.",
+        instructions="Pour plusieurs catégories ou allergènes, appelle menu_search_batch UNE seule fois "
+                     "(toutes les catégories, tous les allergènes) au lieu de menu_search en boucle.",
         add_base_tools=False
     )
     print("OK Budget Manager\n")
@@ -199,6 +287,30 @@ def run_multi_agent_system():
         add_base_tools=False
     )
     print("Manager créé\n")
+    route_agents(manager, router)
+    # Un seul budget pour tout l'arbre : quand il est épuisé, chaque agent rend ce qu'il a déjà trouvé
+    budget = RunBudget(max_llm_calls=MAX_LLM_CALLS, max_tokens=MAX_TOKENS, max_seconds=MAX_SECONDS)
+    apply_budget(manager, budget)
+    # Outil delegate_parallel : le manager lance des sous-tâches indépendantes en même temps
+    # (durée ~ le plus lent des agents au lieu de la somme)
+    enable_parallel_delegation(manager)
+    # Tableau partagé pour cette requête : un résultat d'outil obtenu par un agent sert aux autres
+    # (pas de nouvel appel), et chaque agent spécialisé reçoit les résultats déjà connus dans sa tâche
+    board = Blackboard()
+    share_tools(manager, board)
+    # Prompts système compacts (une ligne par outil / agent), rendus une fois par configuration :
+    # ils sont renvoyés à CHAQUE étape de chaque agent
+    compile_prompts(manager)
+
+    # Le code généré par les agents tourne dans des processus du pool (forkserver : timeout, limites CPU/mémoire),
+    # les appels d'outils et de sous-agents reviennent dans ce processus
+    sandboxed(manager, get_pool(timeout=60, cpu_seconds=30, memory_mb=1024))
+    print("Sandbox: code des agents exécuté dans le pool de processus\n")
+    for agent_name, models in report_prompt_stats(manager, [SMALL_MODEL_ID, MODEL_ID]).items():
+        overhead = models[MODEL_ID]
+        print(f"Prompt système {agent_name} : {overhead['system_prompt']} tokens par étape "
+              f"(au lieu de {overhead['uncompiled']})")
+    print()
 
     # REQUÊTE COMPLEXE du TP    
     query = """
@@ -221,8 +333,9 @@ def run_multi_agent_system():
     Compatible avec TOUTES les restrictions (végétarien + sans gluten + sans fruits à coque).
     
     INSTRUCTIONS:
-    1. Utilise 'budget_manager' pour chercher plats compatibles
-    2. Si doute sur ingrédient, demande au 'nutritionist'
+    1. Utilise 'budget_manager' pour chercher les plats compatibles des 4 catégories EN UNE SEULE demande
+    2. Si doute sur des ingrédients, envoie-les TOUS au 'nutritionist' en une seule demande
+       (demandes indépendantes à plusieurs agents : lance-les ensemble avec delegate_parallel)
     3. Affiche menu final
     4. Calcule total pour 8 personnes
     5. Vérifie que total <= 120€
@@ -234,6 +347,7 @@ def run_multi_agent_system():
     print(query)
     print("="*60 + "\n")
     
+    response, error = None, None
     try:
         print(">>> Traitement par le manager...\n")
         response = manager.run(query)
@@ -245,14 +359,31 @@ def run_multi_agent_system():
         print("="*60 + "\n")
         
     except Exception as e:
+        error = str(e)
         print(f"\nErreur: {e}")
         import traceback
         traceback.print_exc()
 
+    stats = report_cache_stats()
+    model_stats = router.report_stats()["models"]
+    print(f"Cache outils : {stats['overall']['hits']}/{stats['overall']['calls']} hits")
+    for model_id, usage in model_stats.items():
+        print(f"Modèle {model_id} : {usage['calls']} appels, {usage['seconds']:.1f}s, "
+              f"{usage['escalations']} bascules vers le 70B")
+    shared = board.stats()
+    print(f"Tableau partagé : {shared['tool_calls']} appels d'outils pour {shared['calls']} demandes "
+          f"({shared['shared_hits']} résultats repris d'un autre agent)")
+    usage = budget.report_stats()
+    print(f"Budget : {usage['llm_calls']}/{MAX_LLM_CALLS} appels, {usage['tokens']} tokens, {usage['seconds']}s"
+          + (f" (arrêt : {usage['stopped_by']})" if usage["stopped_by"] else ""))
     print("\n--- Terminé ---")
+    # Renvoyé à l'appelant (chefbot multi-agent) : les print ci-dessus ne sont que le compte rendu console
+    return {"response": None if response is None else str(response), "error": error, "cache": stats["overall"],
+            "models": model_stats, "shared": shared, "budget": usage}
 
 
 
 if __name__ == "__main__":
     #on croise les doights pour que ca marche
-    run_multi_agent_system()
\ No newline at end of file
+    run_multi_agent_system()
+    get_client().flush()
\ No newline at end of file
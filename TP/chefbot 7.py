@@ -1,16 +1,24 @@
 
 import os
+import sys
 import json
 from datetime import datetime
+from pathlib import Path
 from typing import Dict, List, Any
 from dataclasses import dataclass, asdict
 from dotenv import load_dotenv
 
-from langfuse import Langfuse
 
-import litellm
-from smolagents import CodeAgent, tool, Tool
-from smolagents.models import LiteLLMModel
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # paquet chefkit (racine du dépôt)
+from chefkit.datasets import format_stats, load_dataset, upload_items
+from chefkit.experiments import load_spec, run_matrix, summarize
+from chefkit.ingredients import get_kb
+from chefkit.journal import Journal, merge_journals, parse_shard, run_shards
+from chefkit.lazy import deferred, get_client, lazy_import, module_getattr, observe
+from chefkit.routing import ModelRouter, route_agents
+
+litellm = lazy_import("litellm")  # importé au premier appel du juge (plusieurs secondes)
 
 load_dotenv()
 
@@ -23,8 +31,12 @@ LANGFUSE_PUBLIC_KEY = os.getenv("LANGFUSE_PUBLIC_KEY")
 LANGFUSE_SECRET_KEY = os.getenv("LANGFUSE_SECRET_KEY")
 LANGFUSE_HOST = os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
 
-MODEL_CONFIG_1 = "groq/llama-3.3-70b-versatile"  
-MODEL_CONFIG_2 = "groq/llama-3.3-70b-versatile"      
+MODEL_CONFIG_1 = "groq/llama-3.3-70b-versatile"
+MODEL_CONFIG_2 = "groq/llama-3.1-8b-instant"
+MODEL_SMALL = "groq/llama-3.1-8b-instant"  # config "routed" : outils sur le 8B, synthèse sur model_id
+
+# Les configurations comparées sont décrites dans un fichier (modèle x routage x planning x instructions x dataset)
+SPEC = Path(__file__).resolve().parent.parent / "data" / "experiments" / "compare_configurations.toml"
 
 
 # 7.1 - DATASET DE SCÉNARIOS
@@ -144,74 +156,114 @@ EVALUATION_DATASET = [
 # OUTILS DU SYSTÈME MULTI-AGENT
 
 
-DIETARY_DB = {
-    "olive": "Fruit à coque", "quinoa": "Sans gluten", "potiron": "Faible index glycémique",
-    "citron": "Faible en sucre", "champignons": "Légume", "épinards": "Légume"
-}
+# Base d'ingrédients partagée (clés normalisées, synonymes, allergènes structurés)
+# Fonctions simples : les outils smolagents sont construits à la création des agents (agent_tools())
 
-@tool
 def check_dietary_info_tool(ingredient: str) -> str:
-    """Infos nutritionnelles."""
-    return DIETARY_DB.get(ingredient.lower(), f"Info inconnue")
-
-class MenuDatabaseTool(Tool):
-    name = "menu_search"
-    description = "Recherche plats restaurant"
-    inputs = {
-        "category": {"type": "string", "nullable": True},
-        "max_price": {"type": "integer", "nullable": True},
-        "allergen_free": {"type": "string", "nullable": True}
-    }
-    output_type = "string"
-
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.menu_db = [
-            {"nom": "Bâtonnets Légumes", "prix": 3, "allergenes": [], "categorie": "Apéritif"},
-            {"nom": "Soupe Potiron", "prix": 8, "allergenes": [], "categorie": "Entrée"},
-            {"nom": "Salade Quinoa", "prix": 11, "allergenes": [], "categorie": "Entrée"},
-            {"nom": "Curry Légumes", "prix": 16, "allergenes": [], "categorie": "Plat"},
-            {"nom": "Sorbet Citron", "prix": 5, "allergenes": [], "categorie": "Dessert"},
-            {"nom": "Salade Fruits", "prix": 6, "allergenes": [], "categorie": "Dessert"},
-        ]
-
-    def forward(self, category=None, max_price=None, allergen_free=None):
-        results = self.menu_db.copy()
-        if category:
-            results = [p for p in results if p["categorie"].lower() == category.lower()]
-        if max_price:
-            results = [p for p in results if p["prix"] <= max_price]
-        if allergen_free:
-            results = [p for p in results if allergen_free.lower() not in [a.lower() for a in p["allergenes"]]]
-        return json.dumps(results, ensure_ascii=False) if results else "Aucun plat"
-
-@tool
+    """Infos nutritionnelles.
+
+    Args:
+        ingredient: Nom de l'ingrédient
+    """
+    info = get_kb().lookup(ingredient)
+    return info.describe() if info else "Info inconnue"
+
+def check_ingredients_tool(ingredients: list) -> str:
+    """Infos nutritionnelles de toute une liste d'ingrédients en un appel (JSON).
+
+    Args:
+        ingredients: Liste des ingrédients
+    """
+    results = get_kb().lookup_many([str(i) for i in ingredients])
+    return json.dumps({k: v.to_dict() if v else None for k, v in results.items()}, ensure_ascii=False)
+
+@deferred
+def _menu_database_tool():
+    from smolagents import Tool
+
+    class MenuDatabaseTool(Tool):
+        name = "menu_search"
+        description = "Recherche plats restaurant"
+        inputs = {
+            "category": {"type": "string", "nullable": True},
+            "max_price": {"type": "integer", "nullable": True},
+            "allergen_free": {"type": "string", "nullable": True}
+        }
+        output_type = "string"
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.menu_db = [
+                {"nom": "Bâtonnets Légumes", "prix": 3, "allergenes": [], "categorie": "Apéritif"},
+                {"nom": "Soupe Potiron", "prix": 8, "allergenes": [], "categorie": "Entrée"},
+                {"nom": "Salade Quinoa", "prix": 11, "allergenes": [], "categorie": "Entrée"},
+                {"nom": "Curry Légumes", "prix": 16, "allergenes": [], "categorie": "Plat"},
+                {"nom": "Sorbet Citron", "prix": 5, "allergenes": [], "categorie": "Dessert"},
+                {"nom": "Salade Fruits", "prix": 6, "allergenes": [], "categorie": "Dessert"},
+            ]
+
+        def forward(self, category=None, max_price=None, allergen_free=None):
+            results = self.menu_db.copy()
+            if category:
+                results = [p for p in results if p["categorie"].lower() == category.lower()]
+            if max_price:
+                results = [p for p in results if p["prix"] <= max_price]
+            if allergen_free:
+                results = [p for p in results if allergen_free.lower() not in [a.lower() for a in p["allergenes"]]]
+            return json.dumps(results, ensure_ascii=False) if results else "Aucun plat"
+    return MenuDatabaseTool
+
 #tool permettant le calcul
 def calculate_bill(prices: list) -> int:
-    """Calcule total."""
+    """Calcule total.
+
+    Args:
+        prices: Liste des prix
+    """
     return sum(int(p) for p in prices)
 
 
+@deferred
+def agent_tools():
+    """Les fonctions ci-dessus en outils smolagents (construits une fois)."""
+    from smolagents import tool
+
+    return {f.__name__: tool(f) for f in (check_dietary_info_tool, check_ingredients_tool, calculate_bill)}
+
+
+__getattr__ = module_getattr(__name__, MenuDatabaseTool=_menu_database_tool)
+
+
 # SYSTÈME MULTI-AGENT
 
 #créations des agents qui utilse tout les tools
-def create_multi_agent_system(model_id: str, config_name: str):
+def create_multi_agent_system(model_id: str, config_name: str, planning_interval: int = None,
+                              instructions: str = None):
+    from smolagents import CodeAgent, LiteLLMModel
+
+    tools = agent_tools()
     model = LiteLLMModel(model_id=model_id, api_key=GROQ_API_KEY)
     
     nutritionist = CodeAgent(
-        tools=[check_dietary_info_tool], model=model,
+        tools=[tools["check_dietary_info_tool"], tools["check_ingredients_tool"]], model=model,
         name="nutritionist", description="Expert nutrition", add_base_tools=False
     )
     
     budget_manager = CodeAgent(
-        tools=[MenuDatabaseTool(), calculate_bill], model=model,
+        tools=[_menu_database_tool()(), tools["calculate_bill"]], model=model,
         name="budget_manager", description="Gère menu et budget", add_base_tools=False
     )
     
     manager = CodeAgent(
         tools=[], managed_agents=[nutritionist, budget_manager], model=model,
-        name="manager", description="Manager - délègue aux agents", add_base_tools=False
+        name="manager", description="Manager - délègue aux agents", add_base_tools=False,
+        planning_interval=planning_interval or None,  # 0 dans la spec = pas de planification
+        instructions=instructions or None
     )
+
+    if config_name == "routed":
+        small = LiteLLMModel(model_id=MODEL_SMALL, api_key=GROQ_API_KEY)
+        route_agents(manager, ModelRouter(small=small, large=model))
     
     return manager
 
@@ -303,108 +355,152 @@ class LLMJudge:
 # 7.3 - EXPÉRIMENTATION ET COMPARAISON
 
 
+def load_items(dataset: str = None) -> List[Scenario]:
+    """Scénarios d'un dataset de la spec : "scenarios" (ceux du fichier) ou un dataset Langfuse."""
+    if dataset in (None, "scenarios"):
+        return EVALUATION_DATASET
+    # mêmes champs que ceux envoyés par upload_items (cache local, voir chefkit.datasets)
+    return [
+        Scenario(
+            id=(item.metadata or {}).get("id", item.id),
+            difficulty=(item.metadata or {}).get("difficulty", ""),
+            description="",
+            query=item.input,
+            expected_output=ExpectedOutput(**item.expected_output),
+        )
+        for item in load_dataset(get_client(), dataset).items
+    ]
+
+
 @observe()
-def run_experiment(scenario: Scenario, model_id: str, config_name: str, langfuse_client: Langfuse):
-    print(f"\n{'='*60}\n{scenario.id} ({scenario.difficulty}) - {model_id}\n{'='*60}")
-    
-    agent = create_multi_agent_system(model_id, config_name)
-    
+def run_cell(params: dict, scenario: Scenario) -> dict:
+    """Réponse de l'équipe d'agents d'une cellule de la spec (mise en cache par chefkit.experiments)."""
+    print(f"\n{'='*60}\n{scenario.id} ({scenario.difficulty}) - {params['model']} / {params['routing']}\n{'='*60}")
+    get_client().update_current_trace(
+        name=f"{scenario.id}_{params['routing']}",
+        metadata={"scenario": scenario.to_dict(), "params": params},
+        tags=[scenario.difficulty, params["model"], params["routing"]],
+    )
+
+    agent = create_multi_agent_system(params["model"], params["routing"], params.get("planning_interval"),
+                                      params.get("instructions"))
+
     start = datetime.now()
     try:
-        response = agent.run(scenario.query)
-        exec_time = (datetime.now() - start).total_seconds()
+        response = str(agent.run(scenario.query))
         success = True
     except Exception as e:
         response = f"Erreur: {e}"
-        exec_time = (datetime.now() - start).total_seconds()
         success = False
-    
+    exec_time = (datetime.now() - start).total_seconds()
+
     print(f"{exec_time:.2f}s")
-    
-    judge = LLMJudge()
-    evaluation = judge.evaluate(scenario, response)
-    
-    print(f"   Score: {evaluation.average_score:.2f}")
+    return {"response": response, "execution_time": exec_time, "success": success}
+
+
+def score_cell(params: dict, scenario: Scenario, output: dict) -> dict:
+    """Note du juge sur les 5 critères (refaite si on change de juge, sans relancer les agents)."""
+    judge = LLMJudge(params["judge"]) if params.get("judge") else LLMJudge()
+    evaluation = judge.evaluate(scenario, output["response"])
+
+    print(f"   {scenario.id} - Score: {evaluation.average_score:.2f}")
     print(f"   Contraintes: {evaluation.respect_contraintes.score:.2f}")
     print(f"   Complétude: {evaluation.completude.score:.2f}")
     print(f"   Budget: {evaluation.budget.score:.2f}")
     print(f"   Cohérence: {evaluation.coherence.score:.2f}")
     print(f"   Faisabilité: {evaluation.faisabilite.score:.2f}")
-    
+
     return {
-        "scenario_id": scenario.id,
-        "difficulty": scenario.difficulty,
-        "model_id": model_id,
-        "config_name": config_name,
-        "execution_time": exec_time,
-        "success": success,
-        "response": response,
-        "evaluation": evaluation.to_dict()
+        "average_score": evaluation.average_score,
+        "execution_time": output["execution_time"],
+        "evaluation": evaluation.to_dict(),
     }
 
-def compare_configurations():
+RUN_NAME = "chefbot-multiagent-compare"
+
+def compare_configurations(shard: tuple = (0, 1), spec=SPEC, refresh: bool = False):
+    # Les cellules de la spec (produit cartésien des axes) tournent en parallèle ; les cellules
+    # identiques ne tournent qu'une fois, et les réponses des agents sont en cache
+    # (experiments/_outputs/) : changer de juge ne relance pas les agents.
+    # Chaque résultat est écrit dans un journal JSONL dès qu'il est jugé : relancer reprend
+    # là où ça s'est arrêté. shard=(i, N) : ce process ne fait que sa part des couples (cellule, scénario),
+    # sans rapport : il est fait une seule fois, sur les journaux fusionnés (report_results)
     print("\n" + "="*60)
     print("ÉVALUATION END-TO-END MULTI-AGENT")
     print("="*60)
-    
+
+    stats = {}
+    all_results = run_matrix(load_spec(spec), run_cell, score_cell, load_items, shard=shard, refresh=refresh,
+                             stats=stats)
+    print(f"\n{stats['cells']} cellules ({stats['duplicates']} doublons fusionnés), {stats['runs']} runs : "
+          f"{stats['agent_runs']} exécutions d'agents, {stats['cached_outputs']} réponses en cache, "
+          f"{stats['resumed']} repris du journal, {stats['errors']} erreurs")
+    if shard[1] > 1:
+        print(f"Shard {shard[0]}/{shard[1]} : résultats dans le journal, rapport après la fusion")
+        return all_results
+    report_results(all_results)
+    return all_results
+
+
+def merged_results(spec=SPEC) -> list:
+    """Fusionne les journaux des shards de la spec ; retourne leurs résultats."""
+    merged = merge_journals(Journal.for_run(load_spec(spec)["name"]).path.parent)
+    print(f"\nJournaux fusionnés : {len(merged)} résultats")
+    return [record["result"] for record in merged]
+
+
+def report_results(all_results: list):
+    """Dataset Langfuse, analyse comparative et fichier de résultats d'une évaluation complète."""
+    from langfuse import Langfuse
+
     langfuse = Langfuse(
         public_key=LANGFUSE_PUBLIC_KEY,
         secret_key=LANGFUSE_SECRET_KEY,
         host=LANGFUSE_HOST
     )
-    
-    configs = [
-        {"name": "config_1_llama70b", "model_id": MODEL_CONFIG_1, "config_name": "default",
-         "description": "Llama 70B - Précision"},
-        {"name": "config_2_llama8b", "model_id": MODEL_CONFIG_2, "config_name": "default",
-         "description": "Llama 8B - Vitesse"}
-    ]
-    
-    all_results = []
-    
-    for config in configs:
-        print(f"\n{'#'*60}\n{config['name']}: {config['description']}\n{'#'*60}")
-        
-        for scenario in EVALUATION_DATASET:
-            result = run_experiment(scenario, config["model_id"], config["config_name"], langfuse)
-            result["config"] = config["name"]
-            all_results.append(result)
-            
-            langfuse.trace(
-                name=f"{scenario.id}_{config['name']}",
-                metadata={"scenario": scenario.to_dict(), "config": config, "result": result},
-                tags=[scenario.difficulty, config["name"]]
-            )
-    
-    # Dataset Langfuse (cela ne marcheara pas)
-    for scenario in EVALUATION_DATASET:
-        langfuse.create_dataset_item(
-            dataset_name="chefbot-multiagent-eval",
-            input=scenario.query,
-            expected_output=scenario.expected_output.__dict__,
-            metadata={"id": scenario.id, "difficulty": scenario.difficulty}
-        )
-    
+
+    # Dataset Langfuse : créé s'il n'existe pas, envoi par lots, sans doublons si on relance
+    stats = upload_items(langfuse, "chefbot-multiagent-eval", [
+        {"input": scenario.query, "expected_output": scenario.expected_output.__dict__,
+         "metadata": {"id": scenario.id, "difficulty": scenario.difficulty}}
+        for scenario in EVALUATION_DATASET
+    ])
+    print(f"Dataset chefbot-multiagent-eval : {format_stats(stats)}")
+
     # Analyse
     print("\n" + "="*60 + "\nANALYSE COMPARATIVE\n" + "="*60)
-    for config in configs:
-        config_results = [r for r in all_results if r["config"] == config["name"]]
-        avg_score = sum(r["evaluation"]["average_score"] for r in config_results) / len(config_results)
-        avg_time = sum(r["execution_time"] for r in config_results) / len(config_results)
-        print(f"\n{config['name']}:")
-        print(f"  Score moyen: {avg_score:.2f}")
-        print(f"  Temps moyen: {avg_time:.2f}s")
-    
+    for name, cell in summarize(all_results).items():
+        print(f"\n{name}:")
+        if "average_score" in cell:
+            print(f"  Score moyen: {cell['average_score']:.2f}")
+            print(f"  Temps moyen: {cell['execution_time']:.2f}s")
+        if cell["errors"]:
+            print(f"  Erreurs: {cell['errors']}/{cell['runs']}")
+
     # Sauvegarder
     output = f"evaluation_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     with open(output, "w") as f:
         json.dump(all_results, f, ensure_ascii=False, indent=2)
     print(f"\nRésultats: {output}")
-    
+
     langfuse.flush()
-    return all_results
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Évaluation ChefBot Multi-Agent - Partie 7")
+    parser.add_argument("--shard", type=parse_shard, default=(0, 1), help="ne lancer que la part i/N")
+    parser.add_argument("--workers", type=int, default=1, help="répartir l'évaluation sur N process puis fusionner")
+    parser.add_argument("--spec", default=SPEC, help="spec TOML / YAML des configurations à comparer")
+    parser.add_argument("--refresh", action="store_true", help="relancer les agents (ignorer les réponses en cache)")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # Les shards n'écrivent que leur journal ; dataset et fichier de résultats une seule fois, ici
+        code = run_shards(__file__, args.workers, ["--spec", str(args.spec)] + (["--refresh"] if args.refresh else []))
+        report_results(merged_results(args.spec))
+        sys.exit(code)
+
     print("\nÉvaluation ChefBot Multi-Agent - Partie 7")
-    results = compare_configurations()
+    results = compare_configurations(shard=args.shard, spec=args.spec, refresh=args.refresh)
     print("\nC'est finiiiiiiiiiiiiiiiiii")
\ No newline at end of file
@@ -1,14 +1,19 @@
 import json
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
-from langfuse import observe, get_client, propagate_attributes
-from smolagents import CodeAgent, LiteLLMModel, tool
-import litellm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # paquet chefkit (racine du dépôt)
+# litellm, langfuse et smolagents importés au premier usage (démarrage rapide) : voir chefkit.lazy
+from chefkit.lazy import get_client, lazy_import, observe, propagate_attributes
+
+litellm = lazy_import("litellm")
 
 load_dotenv()
 
 
-@tool
+# Outils : fonctions simples, converties en outils smolagents à la création de l'agent
 def get_best_meals() -> str:
     """Récupère la liste officielle des meilleurs repas avec leurs ingrédients nécessaires."""
     meals = {
@@ -40,7 +45,6 @@ def get_best_meals() -> str:
     return json.dumps(meals, ensure_ascii=False)
 
 
-@tool
 def get_fridge_inventory() -> str:
     """Récupère le contenu du frigo avec les quantités disponibles."""
     frigo = {
@@ -58,9 +62,15 @@ def get_fridge_inventory() -> str:
 
 class ChefAgent:
     def __init__(self, model="groq/llama-3.3-70b-versatile"):
+        from smolagents import CodeAgent, LiteLLMModel, tool
+
         self.langfuse = get_client()
-        self.model = LiteLLMModel(model_id=model, api_key=os.getenv("GROQ_API_KEY"))
-        self.agent = CodeAgent(tools=[get_best_meals, get_fridge_inventory], model=self.model)
+        # model: id du modèle, ou un LiteLLMModel déjà créé (partagé par le serveur entre les requêtes)
+        if isinstance(model, LiteLLMModel):
+            self.model = model
+        else:
+            self.model = LiteLLMModel(model_id=model, api_key=os.getenv("GROQ_API_KEY"))
+        self.agent = CodeAgent(tools=[tool(get_best_meals), tool(get_fridge_inventory)], model=self.model)
 
     @observe(name="ask_chef COLPIN / MORETTI")
     def ask_chef(self, user_query: str) -> str:
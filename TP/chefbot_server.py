@@ -0,0 +1,149 @@
+# Service HTTP autour de ChefAgent : les agents ne sont plus appelables seulement depuis __main__
+#
+#   python TP/chefbot_server.py --port 8000 --llm-per-minute 30
+#
+#   POST /ask         {"question": "..."}                      -> ChefAgent.ask_chef
+#   POST /plan        {"constraints": "..."}                   -> plan_weekly_menu (chefbot 2)
+#   POST /restaurant  {"session_id": "table-4", "message": "..."} -> agent serveur multi-tours
+#   GET  /health
+#
+# - un seul client modèle (LiteLLMModel) partagé par toutes les requêtes
+# - concurrence bornée + file d'attente bornée : au-delà, 429 tout de suite (latence p99 stable)
+# - questions identiques en cours de traitement = une seule exécution (coalescing)
+# - budget LLM (token bucket) : quand il est épuisé, 429 avec Retry-After
+# - sessions /restaurant dans un store (--sessions memory:// | sqlite:///sessions.db | redis://...),
+#   pas dans la mémoire d'un agent : plusieurs process peuvent servir la même table
+# - traces Langfuse échantillonnées et tronquées (chefkit.tracing) : CHEFKIT_TRACE_TAIL="*=0.1"
+#   garde 10 % des requêtes plus toutes celles en erreur
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # paquet chefkit (racine du dépôt)
+from chefkit.cache import normalize_arg
+from chefkit.scripts import load_script
+from chefkit.server import JsonServer, LLMBudget, require
+from chefkit.sessions import make_order_tool, open_store
+from chefkit.tokens import preload_tokenizers
+from chefkit.tracing import TracingPolicy, init_tracing, parse_rates
+
+load_dotenv()
+
+MODEL_ID = "groq/llama-3.3-70b-versatile"
+
+# Nombre moyen d'appels LLM par requête (débité du budget)
+COST_ASK = 4
+COST_PLAN = 5
+COST_RESTAURANT = 3
+
+
+class ChefService:
+    def __init__(self, model_id: str = MODEL_ID, sessions_url: str = "memory://", session_idle: float = 3600):
+        from smolagents import LiteLLMModel  # import local : smolagents ne charge qu'au démarrage du service
+
+        self.model = LiteLLMModel(model_id=model_id, api_key=os.getenv("GROQ_API_KEY"))
+        self.chefbot = load_script("TP/chefbot.py")
+        self.planner = load_script("TP/chefbot 2.py")
+        self.planner.RATE_LIMIT_DELAY = 0  # le budget du serveur remplace les sleep
+        self.restaurant = load_script("TP/chefbot 6.py")
+        # tokenizers chargés au démarrage (téléchargement éventuel), pas sur le chemin des requêtes
+        preload_tokenizers([model_id, self.planner.MODEL_ID])
+        self.sessions = open_store(sessions_url, max_idle=session_idle)
+        self._table_locks = {}  # session_id -> [verrou, dernier usage]
+        self._locks_lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def ask(self, body: dict) -> dict:
+        question = require(body, "question")
+        # Un CodeAgent par requête (sa mémoire n'est pas partagée), mais le même modèle
+        chef = self.chefbot.ChefAgent(model=self.model)
+        return {"answer": str(chef.ask_chef(question))}
+
+    def plan(self, body: dict) -> dict:
+        constraints = require(body, "constraints")
+        return {"menu": self.planner.plan_weekly_menu(constraints)}
+
+    def restaurant_chat(self, body: dict) -> dict:
+        from smolagents import CodeAgent
+
+        session_id = require(body, "session_id")
+        message = require(body, "message")
+        with self._locks_lock:
+            now = time.monotonic()
+            entry = self._table_locks.setdefault(session_id, [threading.Lock(), now])
+            entry[1] = now
+            if now - self._last_sweep > 60:
+                self._last_sweep = now
+                self.sessions.evict_idle()
+                # Les verrous des tables inactives partent avec leurs sessions (sauf s'ils sont tenus)
+                idle = now - self.sessions.max_idle
+                self._table_locks = {
+                    key: e for key, e in self._table_locks.items() if e[1] >= idle or e[0].locked()
+                }
+        # Les tours d'une même table sont traités dans l'ordre (dans ce process)
+        with entry[0]:
+            session = self.sessions.load(session_id)
+            ordered = len(session.order)
+            menu_tool = self.restaurant.MenuDatabaseTool()
+            agent = CodeAgent(
+                tools=[menu_tool, self.restaurant.agent_tools()["calculate_bill"], make_order_tool(session, menu_tool.menu_db)],
+                model=self.model,
+                add_base_tools=False,
+            )
+            reply = agent.run(session.context() + message)
+            added = session.order[ordered:]
+
+            # Un autre process a pu servir la même table entre-temps : le tour est rejoué
+            # sur la dernière version de la session (update réessaie en cas de conflit)
+            def save(state):
+                for dish in added:
+                    state.add_to_order(dish)
+                state.record_turn(message, reply)
+
+            session = self.sessions.update(session_id, save)
+        return {"session_id": session_id, "reply": str(reply), "order": session.order, "total": session.total}
+
+
+def build_server(service: ChefService, concurrency: int, queue: int, llm_per_minute: float) -> JsonServer:
+    server = JsonServer(max_concurrency=concurrency, max_queue=queue, budget=LLMBudget(per_minute=llm_per_minute))
+    server.route("POST", "/ask", service.ask, cost=COST_ASK,
+                 coalesce_key=lambda body: normalize_arg(body["question"]))
+    server.route("POST", "/plan", service.plan, cost=COST_PLAN,
+                 coalesce_key=lambda body: normalize_arg(body["constraints"]))
+    server.route("POST", "/restaurant", service.restaurant_chat, cost=COST_RESTAURANT)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Service HTTP ChefBot")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--concurrency", type=int, default=8, help="requêtes agents simultanées")
+    parser.add_argument("--queue", type=int, default=32, help="requêtes en attente avant 429")
+    parser.add_argument("--llm-per-minute", type=float, default=30, help="budget d'appels LLM par minute")
+    parser.add_argument("--sessions", default="memory://", help="store des sessions restaurant")
+    parser.add_argument("--session-idle", type=float, default=3600, help="secondes d'inactivité avant expiration")
+    parser.add_argument("--trace-tail", help='taux de traces gardées par nom, ex: "*=0.1" (défaut : CHEFKIT_TRACE_TAIL)')
+    args = parser.parse_args()
+
+    # Avant tout get_client() (les scripts chargés par ChefService en font un)
+    tracing = TracingPolicy.from_env()
+    if args.trace_tail:
+        tracing.tail_rates = parse_rates(args.trace_tail)
+    init_tracing(tracing)
+
+    server = build_server(ChefService(sessions_url=args.sessions, session_idle=args.session_idle), args.concurrency, args.queue, args.llm_per_minute)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nArrêt du serveur.")
+        print(f"Traces : {tracing.stats()}")
+    finally:
+        from langfuse import get_client
+        get_client().flush()
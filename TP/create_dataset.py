@@ -1,61 +1,50 @@
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
-from langfuse import Langfuse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # paquet chefkit (racine du dépôt)
+from chefkit.datasets import format_stats, read_items, upload_items
+from chefkit.lazy import lazy_client
 
 # Charger les variables d'environnement
 load_dotenv()
 
 DATASET_NAME = "chefbot-menu-eval-COLPIN-MORETTI"
+# Cas de test (une ligne JSON par item) ; d'autres fichiers .jsonl/.csv peuvent être passés en argument
+DEFAULT_ITEMS = Path(__file__).resolve().parent.parent / "data" / "datasets" / "chefbot-menu-eval.jsonl"
+
+
+def _langfuse_client():
+    from langfuse import Langfuse
+    return Langfuse(
+        public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
+        secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
+        host=os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
+    )
 
 
-langfuse = Langfuse(
-    public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
-    secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
-    host=os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
-)
+langfuse = lazy_client(_langfuse_client)  # connexion au premier usage
 
-def setup_evaluation_dataset():
+def setup_evaluation_dataset(files=(DEFAULT_ITEMS,)):
     print(f"Création du dataset '{DATASET_NAME}'...")
 
-    langfuse.create_dataset(
-        name=DATASET_NAME,
+    test_cases = [item for path in files for item in read_items(path)]
+    
+    # Envoi en parallèle par lots ; les items déjà présents (même contenu) ne sont pas recréés,
+    # on peut donc relancer le script sans doublons
+    stats = upload_items(
+        langfuse,
+        DATASET_NAME,
+        test_cases,
         description="Dataset d'évaluation pour le ChefBot",
         metadata={"authors": "COLPIN / MORETTI"}
     )
+    for error in stats["errors"]:
+        print(f"  ✗ {error}")
     
-    test_cases = [
-        {
-            "input": {"constraints": "Repas pour diabétique"},
-            "expected": {"must_avoid": ["sucre", "miel", "sirop", "pâtes blanches"], "must_include": ["légumes verts", "fibres"]}
-        },
-        {
-            "input": {"constraints": "Étudiant sans four avec petit budget"},
-            "expected": {"must_avoid": ["rôti", "gratin", "pizza"], "must_include": ["pâtes", "riz", "poêle"]}
-        },
-        {
-            "input": {"constraints": "Sportif en prise de masse, sans produits laitiers"},
-            "expected": {"must_avoid": ["beurre", "fromage", "lait"], "must_include": ["poulet", "œufs", "tofu", "riz"]}
-        },
-        {
-            "input": {"constraints": "Menu de Noël traditionnel mais végétarien"},
-            "expected": {"must_avoid": ["dinde", "foie gras", "saumon"], "must_include": ["marrons", "champignons", "truffe"]}
-        },
-        {
-            "input": {"constraints": "Régime paléo strict"},
-            "expected": {"must_avoid": ["pâtes", "pain", "riz", "légumineuses"], "must_include": ["viande", "noix", "baies"]}
-        }
-    ]
-    
-    for i, case in enumerate(test_cases, 1):
-        langfuse.create_dataset_item(
-            dataset_name=DATASET_NAME,
-            input=case["input"],
-            expected_output=case["expected"]
-        )
-        print(f"  ✓ Item {i}/{len(test_cases)} ajouté")
-    
-    print(f"✅ Dataset créé avec {len(test_cases)} items.")
+    print(f"✅ Dataset '{DATASET_NAME}' : {format_stats(stats)}.")
     langfuse.flush()
 
 if __name__ == "__main__":
-    setup_evaluation_dataset()
\ No newline at end of file
+    setup_evaluation_dataset(sys.argv[1:] or (DEFAULT_ITEMS,))
@@ -0,0 +1,9 @@
+"""
+chefkit
+=======
+Shared helpers for the ChefBot scripts (TP/) and the lecture examples (code_prof/).
+
+The scripts are run directly (``python "TP/chefbot 6.py"``), so they add the
+repository root to ``sys.path`` before importing from this package.
+Submodules are imported explicitly; nothing heavy is imported here.
+"""
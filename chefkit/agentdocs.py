@@ -0,0 +1,225 @@
+"""
+Compact Agent Prompts
+=====================
+Every step of an agent resends its whole system prompt: the smolagents
+template, one docstring per tool (signature, description, indented ``Args:``
+block) and, for a manager, one docstring per team member repeating the same
+``task`` / ``additional_args`` boilerplate. ``compile_prompts`` renders these
+fragments in a minimal form and caches the rendered system prompt:
+
+    compile_prompts(manager)                              # manager + all its managed agents
+    prompt_report(manager, [SMALL_MODEL_ID, MODEL_ID])    # tokens sent at every step, per agent
+
+- a tool becomes one valid Python signature (JSON schema types mapped to
+  ``str`` / ``list`` / ``dict``...) and a one-line docstring: whitespace
+  collapsed, argument descriptions inline, optional arguments as ``= None``
+- a team member becomes ``def name(task: str, additional_args: dict = None) -> str``
+  with its description, without the boilerplate arguments doc
+- the system prompt is rendered once per configuration (template, fragments,
+  instructions) and reused by every agent built the same way and every run;
+  changing a tool or a description changes the key
+- ``prompt_report`` counts with each model's tokenizer (``chefkit.tokens``)
+  the system prompt before / after compilation and each fragment
+
+Only how the tools are described changes, not the tools themselves: apply it
+before or after ``share_tools`` / ``apply_budget``. ToolCallingAgents still
+send the full JSON schemas of their tools with each call.
+"""
+
+import hashlib
+import json
+import re
+import threading
+
+from chefkit.lazy import report_metadata
+from chefkit.tokens import count_tokens, counter_name
+
+_SPACES = re.compile(r"\s+")
+_MEMBERS = re.compile(r"(\{%-? *for agent in managed_agents\.values\(\) *%\}).*?(\{%-? *endfor *%\})", re.S)
+# JSON schema type names -> Python annotations, for the CodeAgent stubs
+_PYTHON_TYPES = {
+    "string": "str", "integer": "int", "number": "float", "boolean": "bool",
+    "array": "list", "object": "dict", "null": "None", "any": "Any",
+}
+_MEMBER_INPUTS = {
+    "task": {"type": "string", "description": ""},
+    "additional_args": {"type": "object", "description": "", "nullable": True},
+}
+
+_fragments = {}  # metadata key -> Fragment
+_prompts = {}    # configuration key -> rendered system prompt
+_lock = threading.Lock()
+_stats = {"renders": 0, "hits": 0}
+
+
+def compact_text(text: str) -> str:
+    """Collapse whitespace (newlines, docstring indentation) to single spaces."""
+    return _SPACES.sub(" ", text or "").strip()
+
+
+class Fragment:
+    """What the system prompt template reads from a tool or a team member, in compiled form."""
+
+    def __init__(self, name: str, description: str, inputs: dict, output_type: str, code: str, text: str):
+        self.name = name
+        self.description = description
+        self.inputs = inputs
+        self.output_type = output_type
+        self.code = code   # CodeAgent form
+        self.text = text   # ToolCallingAgent form
+
+    def to_code_prompt(self) -> str:
+        return self.code
+
+    def to_tool_calling_prompt(self) -> str:
+        return self.text
+
+
+def python_type(json_type) -> str:
+    """Python annotation of a tool input / output type ("array" -> "list", unknown -> "Any")."""
+    if isinstance(json_type, list):  # ["string", "null"]
+        return " | ".join(dict.fromkeys(python_type(t) for t in json_type))
+    return _PYTHON_TYPES.get(json_type, "Any")
+
+
+def _compile(name: str, description: str, inputs: dict, output_type: str, output_schema=None) -> Fragment:
+    args, code_args, docs = [], [], []
+    required = [arg for arg, schema in inputs.items() if not schema.get("nullable")]
+    for arg, schema in inputs.items():
+        default = " = None" if schema.get("nullable") else ""
+        args.append(f"{arg}: {schema.get('type', 'any')}{default}")
+        annotation = python_type(schema.get("type", "any"))
+        if default and required and list(inputs).index(arg) < list(inputs).index(required[-1]):
+            # no default before a required argument in Python: optional through the annotation
+            annotation, default = f"{annotation} | None", ""
+        code_args.append(f"{arg}: {annotation}{default}")
+        doc = compact_text(schema.get("description"))
+        if doc and doc.lower() != arg.lower():
+            docs.append(f"{arg}: {doc}")
+    doc = compact_text(description)
+    if docs and doc and doc[-1] not in ".!?:":
+        doc += "."
+    if docs:
+        doc += " Args: " + "; ".join(docs)
+    if output_schema:
+        output_type = "object"
+        doc += " Returns: " + json.dumps(output_schema, ensure_ascii=False, separators=(",", ":"))
+    signature = f"{name}({', '.join(args)}) -> {output_type}"
+    code_signature = f"{name}({', '.join(code_args)}) -> {python_type(output_type)}"
+    return Fragment(name, compact_text(description), inputs, output_type,
+                    code=f'def {code_signature}:\n    """{doc}"""', text=f"{signature}: {doc}")
+
+
+def _fragment(name, description, inputs, output_type, output_schema=None) -> Fragment:
+    key = (name, description, json.dumps(inputs, sort_keys=True, default=str), output_type,
+           json.dumps(output_schema, sort_keys=True, default=str))
+    with _lock:
+        fragment = _fragments.get(key)
+    if fragment is None:
+        fragment = _compile(name, description, inputs, output_type, output_schema)
+        with _lock:
+            _fragments[key] = fragment
+    return fragment
+
+
+def tool_fragment(tool) -> Fragment:
+    return _fragment(tool.name, tool.description, tool.inputs, tool.output_type, getattr(tool, "output_schema", None))
+
+
+def member_fragment(agent) -> Fragment:
+    """A managed agent, as the manager sees it."""
+    return _fragment(agent.name, agent.description, _MEMBER_INPUTS, "string")
+
+
+def compact_template(template: str) -> str:
+    """The system prompt template with each team member rendered from its fragment."""
+    def members(match):
+        body = match.group(0)
+        line = "{{ agent.to_code_prompt() }}" if "def {{" in body else "- {{ agent.to_tool_calling_prompt() }}"
+        return f"{match.group(1)}\n{line}\n{match.group(2)}"
+    return _MEMBERS.sub(members, template)
+
+
+def _variables(agent) -> dict:
+    variables = {
+        "tools": {name: tool_fragment(tool) for name, tool in agent.tools.items()},
+        "managed_agents": {name: member_fragment(a) for name, a in (agent.managed_agents or {}).items()},
+        "custom_instructions": compact_text(agent.instructions) if agent.instructions else agent.instructions,
+    }
+    if hasattr(agent, "authorized_imports"):  # CodeAgent
+        variables["authorized_imports"] = ("You can import from any package you want."
+                                           if "*" in agent.authorized_imports else str(agent.authorized_imports))
+        variables["code_block_opening_tag"], variables["code_block_closing_tag"] = agent.code_block_tags
+    return variables
+
+
+def render_system_prompt(agent) -> str:
+    """`agent`'s system prompt from compiled fragments, rendered once per configuration."""
+    template = compact_template(agent.prompt_templates["system_prompt"])
+    variables = _variables(agent)
+    key = hashlib.sha256(json.dumps(
+        [template, variables], sort_keys=True, default=lambda f: [f.code, f.text] if isinstance(f, Fragment) else str(f),
+    ).encode()).hexdigest()
+    with _lock:
+        prompt = _prompts.get(key)
+        _stats["hits" if prompt is not None else "renders"] += 1
+    if prompt is None:
+        from smolagents.agents import populate_template
+        prompt = populate_template(template, variables)
+        with _lock:
+            _prompts[key] = prompt
+    return prompt
+
+
+def compile_prompts(agent):
+    """Use compiled, cached system prompts for `agent` and all its managed agents."""
+    if not getattr(agent, "_compiled_prompts", False):
+        agent.default_system_prompt = agent.initialize_system_prompt  # smolagents' own rendering
+        agent.initialize_system_prompt = lambda: render_system_prompt(agent)
+        agent._compiled_prompts = True
+    for sub_agent in (getattr(agent, "managed_agents", {}) or {}).values():
+        if hasattr(sub_agent, "prompt_templates"):
+            compile_prompts(sub_agent)
+    return agent
+
+
+def prompt_report(agent, model_ids=None) -> dict:
+    """{agent: {model: tokens}} of the system prompt (sent at every step) of `agent` and its managed agents.
+
+    Per model: "system_prompt" (as sent), "uncompiled" (smolagents' rendering),
+    "fragments" ({tool or team member: tokens}) and "tokenizer".
+    """
+    report = {}
+    name = getattr(agent, "name", None) or "manager"
+    ids = model_ids or [agent.model.model_id]
+    prompt = agent.system_prompt
+    default = getattr(agent, "default_system_prompt", agent.initialize_system_prompt)()
+    variables = _variables(agent)
+    fragments = {**variables["tools"], **variables["managed_agents"]}
+    code = hasattr(agent, "code_block_tags")
+    report[name] = {
+        model_id: {
+            "system_prompt": count_tokens(prompt, model_id),
+            "uncompiled": count_tokens(default, model_id),
+            "fragments": {n: count_tokens(f.code if code else f.text, model_id) for n, f in fragments.items()},
+            "tokenizer": counter_name(model_id),
+        }
+        for model_id in ids
+    }
+    for sub_agent in (getattr(agent, "managed_agents", {}) or {}).values():
+        if hasattr(sub_agent, "prompt_templates"):
+            report.update(prompt_report(sub_agent, model_ids))
+    return report
+
+
+def prompt_cache_stats() -> dict:
+    with _lock:
+        return {**_stats, "prompts": len(_prompts), "fragments": len(_fragments)}
+
+
+def report_prompt_stats(agent, model_ids=None) -> dict:
+    """Attach the per-step system prompt tokens of the agent tree to the current Langfuse trace (if any)."""
+    report = prompt_report(agent, model_ids)
+    overhead = {name: {m: r["system_prompt"] for m, r in models.items()} for name, models in report.items()}
+    report_metadata("prompt_overhead", overhead)
+    return report
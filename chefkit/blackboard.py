@@ -0,0 +1,171 @@
+"""
+Shared Tool Results
+===================
+The nutritionist, the chef and the budget manager each have their own memory:
+the menu found by one is searched again by the next, or re-derived by the
+LLM. A ``Blackboard`` lives for one request and is shared by the whole
+manager/worker tree:
+
+    board = Blackboard()
+    share_tools(manager, board)      # manager + all its managed agents
+    manager.run(task)
+    board.stats()
+
+- every tool call goes through the board: a result already published (same
+  tool, same arguments as given, by any agent) is returned without calling
+  the tool again; a call already running in another agent (parallel
+  delegation) is waited for instead of being made twice
+- each managed agent's task is prefixed with the results published so far,
+  so its LLM uses them directly instead of spending a step on the same call
+
+Unlike ``memoize_tool`` (process-wide, for pure tools, with a TTL), the board
+is dropped with the request: it also suits tools reading mutable data (the
+fridge) as long as nothing changes it during the request. Tools that change
+something must be listed in ``exclude``.
+"""
+
+import threading
+import time
+
+from chefkit.lazy import deferred, module_getattr
+
+FACTS_HEADER = ("Résultats d'outils déjà obtenus pour cette demande "
+                "(utilise-les directement, ne rappelle pas ces outils avec les mêmes arguments) :")
+
+
+def _frozen(value):
+    """`value` as a hashable key, unchanged otherwise: "Tomate" and "tomate" stay two calls."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_frozen(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _frozen(v)) for k, v in value.items()))
+    return value
+
+
+class Blackboard:
+    def __init__(self, max_fact_chars: int = 800, max_facts_chars: int = 4000, header: str = FACTS_HEADER):
+        """
+        Args:
+            max_fact_chars: Length of one result in the facts handed to the agents.
+            max_facts_chars: Length of all the facts together (the most recent are kept).
+            header: First line of the facts section.
+        """
+        self.max_fact_chars = max_fact_chars
+        self.max_facts_chars = max_facts_chars
+        self.header = header
+        self._entries = {}   # key -> entry dict
+        self._running = {}   # key -> threading.Event
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "tool_calls": 0, "hits": 0, "shared_hits": 0, "waits": 0}
+
+    def call(self, tool_name: str, arguments: dict, compute, agent: str = None):
+        """The result of tool_name(**arguments): from the board, or computed once and published."""
+        try:
+            key = (tool_name, _frozen(arguments))
+            hash(key)
+        except TypeError:
+            return compute()
+
+        with self._lock:
+            self._stats["calls"] += 1
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._stats["hits"] += 1
+                    self._stats["shared_hits"] += int(entry["agent"] != agent)
+                    return entry["value"]
+                running = self._running.get(key)
+                if running is None:
+                    running = self._running[key] = threading.Event()
+                    break
+                self._stats["waits"] += 1
+            running.wait()
+
+        try:
+            value = compute()
+            with self._lock:
+                self._stats["tool_calls"] += 1
+                self._entries[key] = {"tool": tool_name, "arguments": arguments, "value": value,
+                                      "agent": agent, "time": time.time()}
+            return value
+        finally:
+            with self._lock:
+                del self._running[key]
+            running.set()  # waiters find the entry, or compute it themselves after an error
+
+    def facts(self) -> str:
+        """The published results, as a prompt section ("" if none)."""
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: e["time"])
+        lines, size = [], 0
+        for entry in reversed(entries):
+            arguments = ", ".join(f"{k}={v!r}" for k, v in entry["arguments"].items())
+            value = str(entry["value"])
+            if len(value) > self.max_fact_chars:
+                value = value[:self.max_fact_chars] + " […]"
+            line = f"- {entry['tool']}({arguments}) -> {value}"
+            if size + len(line) > self.max_facts_chars:
+                break
+            lines.append(line)
+            size += len(line)
+        return "\n".join([self.header] + lines[::-1]) if lines else ""
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "facts": len(self._entries)}
+
+
+@deferred
+def _shared_tool():
+    from smolagents import Tool
+
+    class SharedTool(Tool):
+        """A tool of one agent, with its calls going through a Blackboard."""
+        skip_forward_signature_validation = True
+
+        def __init__(self, tool: Tool, board: Blackboard, agent: str = None):
+            self.tool = tool
+            self.board = board
+            self.agent = agent
+            self.name = tool.name
+            self.description = tool.description
+            self.inputs = tool.inputs
+            self.output_type = tool.output_type
+            super().__init__()
+
+        def forward(self, *args, **kwargs):
+            arguments = {**dict(zip(self.inputs, args)), **kwargs}
+            return self.board.call(self.name, arguments, lambda: self.tool(*args, **kwargs), self.agent)
+    return SharedTool
+
+
+__getattr__ = module_getattr(__name__, SharedTool=_shared_tool)
+
+
+def share_tools(agent, board: Blackboard, exclude=("final_answer", "delegate_parallel"), _managed: bool = False):
+    """Route the tool calls of `agent` and of all its managed agents through `board`."""
+    name = getattr(agent, "name", None) or "manager"
+    shared_tool = _shared_tool()
+    for tool_name, tool in list(agent.tools.items()):
+        if tool_name not in exclude and not isinstance(tool, shared_tool):
+            agent.tools[tool_name] = shared_tool(tool, board, name)
+
+    if _managed and not getattr(agent, "_blackboard_run", False):
+        run = agent.run
+
+        def run_with_facts(task, *args, **kwargs):
+            facts = board.facts()
+            return run(f"{facts}\n\n{task}" if facts else task, *args, **kwargs)
+
+        agent.run = run_with_facts
+        agent._blackboard_run = True
+
+    for sub_agent in (getattr(agent, "managed_agents", {}) or {}).values():
+        if hasattr(sub_agent, "tools"):
+            share_tools(sub_agent, board, exclude, _managed=True)
+    return agent
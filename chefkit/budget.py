@@ -0,0 +1,165 @@
+"""
+Run Budgets
+===========
+``max_steps`` bounds one agent, not a manager/worker tree: a confused manager
+can delegate again and again, and every managed agent has its own steps. A
+``RunBudget`` is shared by the whole tree and counts what actually costs:
+LLM calls, tokens and wall time.
+
+    budget = RunBudget(max_llm_calls=25, max_tokens=80_000, max_seconds=120)
+    apply_budget(manager, budget)          # manager + all its managed agents
+    answer = manager.run(task)
+    budget.stats()
+
+When the budget runs out, the next LLM call of any agent is not sent: the
+agent gets a final answer built from what it has so far (its last
+observations), prefixed with the reason. A worker thus returns its partial
+result to the manager, which then stops the same way: the run ends with the
+best partial answer instead of an exception, and the worst-case latency is
+``max_seconds`` plus the LLM calls already in flight.
+
+Apply the budget after ``route_agents``: it wraps whatever model the agents use.
+"""
+
+import re
+import threading
+import time
+
+from chefkit.lazy import deferred, module_getattr, report_metadata
+
+PLAN_STOP = "<end_plan>"
+_NO_OUTPUT = re.compile(r"\s*Last output from code snippet:\s*None\s*$")
+
+
+class RunBudget:
+    def __init__(self, max_llm_calls: int = None, max_tokens: int = None, max_seconds: float = None):
+        """
+        Args:
+            max_llm_calls: LLM calls, all agents together.
+            max_tokens: Input + output tokens, all agents together.
+            max_seconds: Wall time from the first LLM call.
+        """
+        self.max_llm_calls = max_llm_calls
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.llm_calls = 0
+        self.tokens = 0
+        self.started = None
+        self.stopped_by = None
+        self.refused = 0
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return 0.0 if self.started is None else time.monotonic() - self.started
+
+    def exhausted(self) -> str:
+        """The reason the budget is spent, or None."""
+        if self.max_llm_calls is not None and self.llm_calls >= self.max_llm_calls:
+            return f"{self.llm_calls} LLM calls"
+        if self.max_tokens is not None and self.tokens >= self.max_tokens:
+            return f"{self.tokens} tokens"
+        if self.max_seconds is not None and self.elapsed() >= self.max_seconds:
+            return f"{self.elapsed():.0f}s"
+        return None
+
+    def acquire(self) -> str:
+        """Reserve one LLM call; returns the reason if the budget is spent instead."""
+        with self._lock:
+            if self.started is None:
+                self.started = time.monotonic()
+            reason = self.exhausted()
+            if reason:
+                self.stopped_by = self.stopped_by or reason
+                self.refused += 1
+                return reason
+            self.llm_calls += 1
+            return None
+
+    def charge(self, message):
+        usage = getattr(message, "token_usage", None)
+        if usage is not None:
+            with self._lock:
+                self.tokens += usage.input_tokens + usage.output_tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "llm_calls": self.llm_calls,
+                "tokens": self.tokens,
+                "seconds": round(self.elapsed(), 2),
+                "stopped_by": self.stopped_by,
+                "refused_calls": self.refused,
+            }
+
+    def report_stats(self) -> dict:
+        """Attach the budget stats to the current Langfuse trace (if any)."""
+        stats = self.stats()
+        report_metadata("run_budget", stats)
+        return stats
+
+
+def partial_answer(agent, reason: str, max_chars: int = 3000) -> str:
+    """The best answer `agent` has so far: its last step output or observation."""
+    found = None
+    for step in reversed(getattr(getattr(agent, "memory", None), "steps", [])):
+        output = getattr(step, "action_output", None)
+        observations = getattr(step, "observations", None)
+        if output is not None:
+            found = str(output)
+        elif observations:
+            found = _NO_OUTPUT.sub("", observations.replace("Execution logs:\n", "", 1)).strip()
+        if found:
+            break
+    return f"[Partial answer, budget exhausted ({reason})] " + (found[:max_chars] if found else "no result yet.")
+
+
+@deferred
+def _budgeted_model():
+    from smolagents.models import ChatMessage, ChatMessageToolCall, ChatMessageToolCallFunction, MessageRole, Model
+
+    class BudgetedModel(Model):
+        """The model of one agent, with the calls counted against a shared RunBudget."""
+
+        def __init__(self, model: Model, budget: RunBudget, agent):
+            super().__init__(model_id=model.model_id)
+            self.model = model
+            self.budget = budget
+            self.agent = agent
+
+        def _final_answer(self, reason: str, stop_sequences, tools_to_call_from) -> ChatMessage:
+            if stop_sequences and PLAN_STOP in stop_sequences:
+                return ChatMessage(role=MessageRole.ASSISTANT, content=f"Budget exhausted ({reason}): answer now.")
+            answer = partial_answer(self.agent, reason)
+            if tools_to_call_from is not None:  # ToolCallingAgent
+                call = ChatMessageToolCall(
+                    function=ChatMessageToolCallFunction(name="final_answer", arguments={"answer": answer}),
+                    id="budget-exhausted", type="function",
+                )
+                return ChatMessage(role=MessageRole.ASSISTANT, content="", tool_calls=[call])
+            tags = getattr(self.agent, "code_block_tags", None) or ("<code>", "</code>")
+            opening, closing = ("```python", "```") if tags[0].startswith("```") else tags
+            return ChatMessage(role=MessageRole.ASSISTANT, content=f"{opening}\nfinal_answer({answer!r})\n{closing}")
+
+        def generate(self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs):
+            reason = self.budget.acquire()
+            if reason:
+                return self._final_answer(reason, stop_sequences, tools_to_call_from)
+            message = self.model.generate(messages, stop_sequences=stop_sequences, response_format=response_format,
+                                          tools_to_call_from=tools_to_call_from, **kwargs)
+            self.budget.charge(message)
+            return message
+    return BudgetedModel
+
+
+__getattr__ = module_getattr(__name__, BudgetedModel=_budgeted_model)
+
+
+def apply_budget(agent, budget: RunBudget):
+    """Count `agent`'s and all its managed agents' LLM calls against `budget`."""
+    budgeted_model = _budgeted_model()
+    model = agent.model.model if isinstance(agent.model, budgeted_model) else agent.model
+    agent.model = budgeted_model(model, budget, agent)
+    for sub_agent in (getattr(agent, "managed_agents", {}) or {}).values():
+        if hasattr(sub_agent, "model"):
+            apply_budget(sub_agent, budget)
+    return agent
@@ -0,0 +1,210 @@
+"""
+Tool Memoization
+================
+Agents call the same pure lookup tools over and over (the nutritionist and
+the chef both asking about "crème fraîche"). Each tool can declare how its
+results are cached:
+
+    @tool
+    @memoize_tool(ttl=600, maxsize=128)
+    def check_dietary_info_tool(ingredient: str) -> str:
+        ...
+
+- the key is the arguments as given; a tool whose body normalizes its input
+  declares the same normalization (``normalize=lower_arg`` for a tool that
+  only uses ``arg.lower()``), so that equivalent calls share an entry. A
+  coarser key would return the result of another input
+- entries expire after ``ttl`` seconds (``None`` = never)
+- each tool keeps at most ``maxsize`` entries (least recently used evicted)
+- tools reading a mutable source declare it (``source="fridge"``) and are
+  flushed with ``invalidate("fridge")`` when that source changes
+
+``report_cache_stats()`` sends the hit ratios to the current Langfuse trace.
+"""
+
+import functools
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from chefkit.lazy import report_metadata
+
+_MISSING = object()
+
+# Every memoized tool, by name (used for stats and invalidation)
+_REGISTRY = {}
+
+
+# =============================================================================
+# ARGUMENT NORMALIZATION
+# =============================================================================
+
+def normalize_arg(value):
+    """Case, accents form and spaces: 'Crème  Fraîche ' and 'crème fraîche' share a key."""
+    if isinstance(value, str):
+        value = unicodedata.normalize("NFC", value)
+        return " ".join(value.split()).casefold()
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_arg(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize_arg(v)) for k, v in value.items()))
+    return value
+
+
+def strip_arg(value):
+    """For a tool that only uses ``arg.strip()``."""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple)):
+        return tuple(strip_arg(v) for v in value)
+    return value
+
+
+def lower_arg(value):
+    """For a tool that only uses ``arg.lower()``."""
+    if isinstance(value, str):
+        return value.lower()
+    if isinstance(value, (list, tuple)):
+        return tuple(lower_arg(v) for v in value)
+    return value
+
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+class ToolCache:
+    """Bounded LRU cache with optional TTL and hit/miss counters."""
+
+    def __init__(self, name: str, ttl: float = None, maxsize: int = 256, source: str = None):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.source = source
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return _MISSING
+
+    def put(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        calls = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "hit_ratio": self.hits / calls if calls else 0.0,
+        }
+
+
+def memoize_tool(ttl: float = None, maxsize: int = 256, normalize=None,
+                 source: str = None, name: str = None):
+    """
+    Memoize a pure tool function (or a Tool.forward method).
+
+    Put it *under* ``@tool`` so smolagents still sees the original signature
+    and docstring. On a method, ``self`` is part of the key, so two tool
+    instances never share entries.
+
+    Args:
+        ttl: Seconds before an entry expires. None keeps entries until evicted.
+        maxsize: Maximum number of entries kept for this tool.
+        normalize: Applied to every argument to build the key (None = raw args).
+            Only pass what the tool itself applies to its input: two arguments
+            with the same key must give the same result.
+        source: Name of the mutable data source the tool reads, for invalidate().
+        name: Cache name in the stats (defaults to the function's qualified name).
+    """
+
+    def decorator(func):
+        cache = ToolCache(name or func.__qualname__, ttl=ttl, maxsize=maxsize, source=source)
+        _REGISTRY[cache.name] = cache
+        norm = normalize or (lambda v: v)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (tuple(norm(a) for a in args), tuple(sorted((k, norm(v)) for k, v in kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                # Unhashable argument: don't cache, just call through
+                return func(*args, **kwargs)
+
+            value = cache.get(key)
+            if value is _MISSING:
+                value = func(*args, **kwargs)
+                cache.put(key, value)
+            return value
+
+        wrapper.cache = cache
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
+
+
+# =============================================================================
+# INVALIDATION & STATS
+# =============================================================================
+
+def invalidate(source: str) -> int:
+    """Flush every tool cache reading `source` (e.g. after the fridge changed).
+
+    Returns the number of caches flushed.
+    """
+    flushed = 0
+    for cache in _REGISTRY.values():
+        if cache.source == source:
+            cache.clear()
+            flushed += 1
+    return flushed
+
+
+def clear_all():
+    for cache in _REGISTRY.values():
+        cache.clear()
+
+
+def cache_stats() -> dict:
+    """Per-tool stats plus an ``overall`` entry."""
+    stats = {name: cache.stats() for name, cache in _REGISTRY.items()}
+    hits = sum(c.hits for c in _REGISTRY.values())
+    calls = hits + sum(c.misses for c in _REGISTRY.values())
+    stats["overall"] = {"hits": hits, "calls": calls, "hit_ratio": hits / calls if calls else 0.0}
+    return stats
+
+
+def report_cache_stats() -> dict:
+    """Attach the cache stats to the current Langfuse trace and score the hit ratio.
+
+    Must be called inside an @observe()-decorated function. Does nothing
+    (apart from returning the stats) when Langfuse is not available.
+    """
+    stats = cache_stats()
+    report_metadata("tool_cache", stats, scores={"tool_cache_hit_ratio": stats["overall"]["hit_ratio"]})
+    return stats
@@ -0,0 +1,356 @@
+"""
+ChefBot Command Line
+====================
+One command for the ChefBot workflows, instead of one script per TP with its
+flow hard-coded in ``if __name__ == "__main__"``:
+
+    chefbot ask "Que puis-je cuisiner avec le contenu du frigo ?"     # ChefAgent (TP/chefbot.py)
+    chefbot plan "Végétarien, budget étudiant, produits d'hiver."      # plan_weekly_menu (TP/chefbot 2.py)
+    chefbot restaurant --session table-4 "Deux menus sans gluten"     # one turn at a table
+    chefbot multi-agent                                               # TP/chefbot 6.py
+    chefbot eval [--spec SPEC] [--shard 0/4 | --workers 4] [--refresh]   # TP/chefbot 7.py
+    chefbot bench ask "..." -n 10 -c 2                                # p50 / p95 latency
+
+    chefbot daemon &            # keeps scripts, models, tool indexes and HTTP connections loaded
+    chefbot status | stop
+
+The scripts are loaded with ``load_script`` (their ``__main__`` blocks do not
+run) and their functions are called directly. A ``chefbot daemon`` does it
+once and serves the commands over a local socket (``CHEFBOT_SOCKET``,
+default ``.cache/chefbot.sock``; ``host:port`` where Unix sockets are
+missing): while it runs, every command is sent to it and only pays the
+round trip, ``--local`` runs in the calling process instead. Restaurant
+sessions live in ``CHEFBOT_SESSIONS`` (a ``chefkit.sessions`` URL, SQLite
+by default) so that a table survives between two local commands.
+
+Install the command with ``uv sync`` or ``pip install -e .`` (editable: the
+workflows stay in TP/), or run ``python -m chefkit.cli``.
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from chefkit.scripts import ROOT, load_script
+
+DEFAULT_SOCKET = str(ROOT / ".cache" / "chefbot.sock") if hasattr(socket, "AF_UNIX") else "127.0.0.1:8765"
+DEFAULT_SESSIONS = f"sqlite:///{ROOT / '.cache' / 'chefbot_sessions.db'}"
+
+
+# =============================================================================
+# WORKFLOWS
+# =============================================================================
+
+class Workflows:
+    """The ChefBot workflows; scripts and models are loaded on first use, then kept."""
+
+    def __init__(self, sessions_url: str = None):
+        self.sessions_url = sessions_url or os.getenv("CHEFBOT_SESSIONS", DEFAULT_SESSIONS)
+        self._service = None
+        self._lock = threading.Lock()
+
+    @property
+    def service(self):
+        """ChefService of TP/chefbot_server.py: one model client, chefbot / chefbot 2 / chefbot 6 loaded."""
+        with self._lock:
+            if self._service is None:
+                if self.sessions_url.startswith("sqlite:"):
+                    (ROOT / ".cache").mkdir(exist_ok=True)
+                self._service = load_script("TP/chefbot_server.py").ChefService(sessions_url=self.sessions_url)
+            return self._service
+
+    def warm(self) -> bool:
+        """True once the scripts and the model are loaded."""
+        return self._service is not None
+
+    def ask(self, question: str) -> dict:
+        return self.service.ask({"question": question})
+
+    def plan(self, constraints: str) -> dict:
+        return self.service.plan({"constraints": constraints})
+
+    def restaurant(self, session: str, message: str) -> dict:
+        return self.service.restaurant_chat({"session_id": session, "message": message})
+
+    # The two scripts below also print a console report as they go: in a daemon it goes to the
+    # daemon's output, the caller only gets the returned result
+
+    def multi_agent(self) -> dict:
+        self.service  # the model and chefbot 6 are loaded with the service
+        return load_script("TP/chefbot 6.py").run_multi_agent_system()
+
+    def eval(self, shard=(0, 1), spec: str = None, refresh: bool = False) -> dict:
+        from chefkit.experiments import summarize
+
+        script = load_script("TP/chefbot 7.py")
+        results = script.compare_configurations(tuple(shard), spec or script.SPEC, refresh=refresh)
+        return {"summary": summarize(results), "results": results}
+
+    def call(self, command: str, args: dict) -> dict:
+        handlers = {"ask": self.ask, "plan": self.plan, "restaurant": self.restaurant,
+                    "multi-agent": self.multi_agent, "eval": self.eval}
+        if command not in handlers:
+            raise ValueError(f"Unknown command {command!r}, available: {list(handlers)}")
+        return handlers[command](**args)
+
+
+# =============================================================================
+# DAEMON
+# =============================================================================
+
+def _address(address: str):
+    """(family, address) of a socket path or host:port."""
+    if ":" in address and "/" not in address and "\\" not in address:
+        host, _, port = address.rpartition(":")
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    return socket.AF_UNIX, address
+
+
+def request(address: str, command: str, args: dict = None, timeout: float = None) -> dict:
+    """Send one command to the daemon at `address`; returns its response."""
+    family, target = _address(address)
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(target)
+        with sock.makefile("rw", encoding="utf-8") as stream:
+            stream.write(json.dumps({"command": command, "args": args or {}}, ensure_ascii=False) + "\n")
+            stream.flush()
+            line = stream.readline()
+    if not line:
+        raise ConnectionError("the daemon closed the connection")
+    return json.loads(line)
+
+
+def daemon_running(address: str) -> bool:
+    try:
+        return request(address, "status", timeout=1.0)["ok"]
+    except (OSError, ValueError):
+        return False
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        daemon = self.server.chefbot
+        for line in self.rfile:
+            try:
+                message = json.loads(line)
+                response = {"ok": True, "result": daemon.dispatch(message["command"], message.get("args") or {})}
+            except Exception as e:
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(response, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class Daemon:
+    """Serves Workflows over a local socket, one thread per connection."""
+
+    def __init__(self, address: str = DEFAULT_SOCKET, workflows: Workflows = None):
+        self.address = address
+        self.workflows = workflows or Workflows()
+        self.started = time.time()
+        self.requests = 0
+        family, target = _address(address)
+        if family == socket.AF_UNIX:
+            if os.path.exists(target):
+                if daemon_running(address):
+                    raise RuntimeError(f"A daemon is already running on {address}")
+                os.unlink(target)  # left by a daemon that did not stop cleanly
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            server_class = socketserver.ThreadingUnixStreamServer
+        else:
+            server_class = socketserver.ThreadingTCPServer
+        server_class = type("DaemonServer", (server_class,), {"daemon_threads": True, "allow_reuse_address": True})
+        self.server = server_class(target, _Handler)
+        self.server.chefbot = self
+
+    def dispatch(self, command: str, args: dict):
+        if command == "status":
+            return {"pid": os.getpid(), "uptime": round(time.time() - self.started, 1),
+                    "requests": self.requests, "warm": self.workflows.warm()}
+        if command == "stop":
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return {"stopped": True}
+        self.requests += 1
+        return self.workflows.call(command, args)
+
+    def serve(self, preload: bool = True):
+        # Tracing set up before the scripts create their Langfuse client (as in chefbot_server)
+        from chefkit.tracing import TracingPolicy, init_tracing
+        init_tracing(TracingPolicy.from_env())
+        if preload:
+            self.workflows.service
+        print(f"chefbot daemon {os.getpid()} listening on {self.address}", flush=True)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            family, target = _address(self.address)
+            if family == socket.AF_UNIX and os.path.exists(target):
+                os.unlink(target)
+            from chefkit.lazy import get_client
+            get_client().flush()
+
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def _percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def bench(run, args: dict, count: int, concurrency: int) -> dict:
+    """Latencies of `count` calls of run(args), `concurrency` at a time."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def timed(_):
+        started = time.perf_counter()
+        try:
+            run(args)
+            return time.perf_counter() - started, None
+        except Exception as e:
+            return time.perf_counter() - started, f"{type(e).__name__}: {e}"
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(count)))
+    seconds = [s for s, _ in results]
+    return {"calls": count, "errors": sum(e is not None for _, e in results), "wall": time.perf_counter() - started,
+            "p50": _percentile(seconds, 0.5), "p95": _percentile(seconds, 0.95), "max": max(seconds)}
+
+
+def _print_result(command: str, result: dict, as_json: bool):
+    if as_json:
+        print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+    elif command == "ask":
+        print(result["answer"])
+    elif command == "plan":
+        print(result["menu"])
+    elif command == "restaurant":
+        print(result["reply"])
+        print(f"\nOrder: {', '.join(d['nom'] for d in result['order']) or '-'} (total {result['total']} €)")
+    elif command == "multi-agent":
+        print(result["response"] if result["error"] is None else f"Error: {result['error']}")
+        cache, shared, budget = result["cache"], result["shared"], result["budget"]
+        print(f"\nTool cache: {cache['hits']}/{cache['calls']} hits")
+        for model_id, usage in result["models"].items():
+            print(f"Model {model_id}: {usage['calls']} calls, {usage['seconds']:.1f}s, "
+                  f"{usage['escalations']} escalations")
+        print(f"Blackboard: {shared['tool_calls']} tool calls for {shared['calls']} requests "
+              f"({shared['shared_hits']} shared)")
+        print(f"Budget: {budget['llm_calls']} LLM calls, {budget['tokens']} tokens, {budget['seconds']}s"
+              + (f" (stopped by {budget['stopped_by']})" if budget["stopped_by"] else ""))
+    elif command == "eval":
+        for name, cell in result["summary"].items():
+            scores = ", ".join(f"{k} {v}" for k, v in cell.items() if k not in ("runs", "errors"))
+            print(f"{name}: {cell['runs']} runs, {cell['errors']} errors" + (f", {scores}" if scores else ""))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="chefbot", description="ChefBot workflows")
+    parser.add_argument("--socket", default=os.getenv("CHEFBOT_SOCKET", DEFAULT_SOCKET),
+                        help="daemon socket (path, or host:port)")
+    parser.add_argument("--local", action="store_true", help="run in this process even if a daemon is running")
+    parser.add_argument("--json", action="store_true", help="print the raw result as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("ask", help="question to ChefAgent").add_argument("question")
+    commands.add_parser("plan", help="weekly menu for constraints").add_argument("constraints")
+    restaurant = commands.add_parser("restaurant", help="one turn of a restaurant table")
+    restaurant.add_argument("message")
+    restaurant.add_argument("--session", default="table-1", help="table / session id")
+    commands.add_parser("multi-agent", help="multi-agent restaurant scenario (chefbot 6)")
+    evaluation = commands.add_parser("eval", help="multi-agent evaluation (chefbot 7)")
+    evaluation.add_argument("--shard", default="0/1", help="only part i/N of the runs")
+    evaluation.add_argument("--workers", type=int, default=1, help="N processes, then merge their journals")
+    evaluation.add_argument("--spec", help="experiment spec (chefkit.experiments), default: the script's SPEC")
+    evaluation.add_argument("--refresh", action="store_true", help="run the agents again (ignore cached outputs)")
+
+    benchmark = commands.add_parser("bench", help="latency of repeated ask / plan calls")
+    benchmark.add_argument("target", choices=["ask", "plan"])
+    benchmark.add_argument("text", help="question or constraints")
+    benchmark.add_argument("-n", "--count", type=int, default=5)
+    benchmark.add_argument("-c", "--concurrency", type=int, default=1)
+
+    daemon = commands.add_parser("daemon", help="serve the commands from a warm process")
+    daemon.add_argument("--no-preload", action="store_true", help="load the scripts at the first request")
+    commands.add_parser("status", help="daemon status")
+    commands.add_parser("stop", help="stop the daemon")
+    return parser
+
+
+def _arguments(args) -> dict:
+    if args.command == "ask":
+        return {"question": args.question}
+    if args.command == "plan":
+        return {"constraints": args.constraints}
+    if args.command == "restaurant":
+        return {"session": args.session, "message": args.message}
+    if args.command == "eval":
+        from chefkit.journal import parse_shard
+        return {"shard": parse_shard(args.shard), "spec": args.spec and os.path.abspath(args.spec),
+                "refresh": args.refresh}
+    return {}
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.command == "daemon":
+        Daemon(args.socket).serve(preload=not args.no_preload)
+        return 0
+    if args.command in ("status", "stop"):
+        if not daemon_running(args.socket):
+            print(f"No daemon on {args.socket}")
+            return 1
+        print(json.dumps(request(args.socket, args.command)["result"], indent=2))
+        return 0
+    if args.command == "eval" and args.workers > 1:
+        from chefkit.journal import run_shards
+        script = load_script("TP/chefbot 7.py")
+        spec = os.path.abspath(args.spec) if args.spec else str(script.SPEC)
+        code = run_shards(str(ROOT / "TP" / "chefbot 7.py"), args.workers,
+                          ["--spec", spec] + (["--refresh"] if args.refresh else []))
+        # The shards only write their journals: the report (Langfuse dataset, results file) is made once
+        script.report_results(script.merged_results(spec))
+        return code
+
+    remote = not args.local and daemon_running(args.socket)
+    workflows = None if remote else Workflows()
+
+    def run(command: str, arguments: dict) -> dict:
+        if workflows is not None:
+            return workflows.call(command, arguments)
+        response = request(args.socket, command, arguments)
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    try:
+        if args.command == "bench":
+            arguments = {"question" if args.target == "ask" else "constraints": args.text}
+            stats = bench(lambda a: run(args.target, a), arguments, args.count, args.concurrency)
+            where = f"daemon {args.socket}" if remote else "this process"
+            print(f"{args.target} x{stats['calls']} ({args.concurrency} at a time, {where}): "
+                  f"p50 {stats['p50']:.2f}s, p95 {stats['p95']:.2f}s, max {stats['max']:.2f}s, "
+                  f"wall {stats['wall']:.2f}s, {stats['errors']} errors")
+        else:
+            _print_result(args.command, run(args.command, _arguments(args)), args.json)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if "langfuse" in sys.modules:  # traces of the local run
+            from chefkit.lazy import get_client
+            get_client().flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
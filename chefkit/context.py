@@ -0,0 +1,165 @@
+"""
+Step Context for Multi-Step Pipelines
+=====================================
+``context += f"- {step}: {result}"`` sends the raw text of every earlier step
+to every later one: prompt size grows quadratically with the pipeline.
+``StepContext`` keeps one structured record per step (full output, short
+summary, token counts) and hands each new step only what fits a token budget:
+
+- pinned items (task, constraints) always, first
+- the context only grows by appending: an item keeps the form (full or
+  summary) and the place it had when first sent, so each step's context is
+  a prefix of the next one's and the provider's prefix cache keeps working
+  (chefkit.prompts.PromptLayout)
+- a new step output is appended in full when it fits in half of the
+  remaining budget, otherwise as its summary
+- outputs that did not fit wait, and are appended later as summaries, most
+  relevant to the new instruction first, when there is room
+
+    ctx = StepContext(budget_tokens=1200)
+    ctx.pin(f"Constraints: {constraints}")
+    for step in steps:
+        result = ask(step, context=ctx.select(step))
+        ctx.add(step, result)
+    ctx.stats()   # tokens actually sent vs. cumulative concatenation
+"""
+
+import re
+from dataclasses import dataclass
+
+TRUNCATED = " […]"
+_WORD = re.compile(r"\w{4,}")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def _cut(text: str, max_tokens: int, count_tokens=estimate_tokens) -> str:
+    """Longest prefix of `text` (whole words if possible) that fits `max_tokens` with the marker."""
+    if count_tokens(TRUNCATED) > max_tokens:
+        return ""
+    low, high = 0, len(text)  # binary search on the length: counts grow with it
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle] + TRUNCATED) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    head = text[:low]
+    if low < len(text) and " " in head:
+        head = head.rsplit(" ", 1)[0]
+    return head + TRUNCATED
+
+
+def summarize(text: str, max_tokens: int, count_tokens=estimate_tokens, cut=None) -> str:
+    """
+    First sentences / lines of `text` up to `max_tokens` (deterministic, no LLM call).
+
+    The " […]" marker counts in the budget. A first sentence too long to fit is
+    cut by `cut(text, max_tokens)` (e.g. chefkit.tokens.truncate, with the
+    model's tokenizer), by default at a word boundary using `count_tokens`.
+    """
+    text = text.strip()
+    if count_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - count_tokens(TRUNCATED)
+    summary = ""
+    for sentence in _SENTENCE_END.split(text):
+        sentence = " ".join(sentence.split())
+        if not sentence:
+            continue
+        candidate = f"{summary} {sentence}".strip()
+        if count_tokens(candidate) > budget:
+            break
+        summary = candidate
+    if not summary:  # a single very long sentence
+        return cut(text, max_tokens) if cut else _cut(text, max_tokens, count_tokens)
+    return summary + TRUNCATED
+
+
+@dataclass
+class StepRecord:
+    index: int
+    step: str
+    output: str
+    summary: str
+    tokens: int
+    summary_tokens: int
+
+
+class StepContext:
+    def __init__(self, budget_tokens: int = 1200, summary_tokens: int = 120,
+                 count_tokens=estimate_tokens, summarizer=None):
+        """
+        Args:
+            budget_tokens: Max tokens of context handed to a step (pinned items included).
+            summary_tokens: Length of the per-step summaries.
+            count_tokens: Token counter (text -> int).
+            summarizer: Optional (text, max_tokens) -> summary, e.g. an LLM call.
+        """
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = summary_tokens
+        self.count_tokens = count_tokens
+        self.summarizer = summarizer or (lambda text, n: summarize(text, n, count_tokens))
+        self.pinned = []
+        self.records = []
+        self._sent = []   # [(record index, text)], in the order first sent
+        self.sent_tokens = 0
+        self.naive_tokens = 0
+
+    def pin(self, item: str):
+        """Context every step gets (task, constraints)."""
+        self.pinned.append(item)
+
+    def add(self, step: str, output) -> StepRecord:
+        output = str(output)
+        summary = self.summarizer(output, self.summary_tokens)
+        record = StepRecord(len(self.records), step, output, summary,
+                            self.count_tokens(output), self.count_tokens(summary))
+        self.records.append(record)
+        return record
+
+    def _relevance(self, record: StepRecord, query_words: set) -> float:
+        words = set(_WORD.findall(f"{record.step} {record.summary}".lower()))
+        overlap = len(words & query_words) / len(query_words) if query_words else 0.0
+        recency = (record.index + 1) / len(self.records)
+        return overlap + 0.5 * recency
+
+    def select(self, instruction: str = "") -> list:
+        """Context items for the next step, within the token budget: the items already sent, then new ones."""
+        sent = {index for index, _ in self._sent}
+        remaining = (self.budget_tokens - sum(self.count_tokens(p) for p in self.pinned)
+                     - sum(self.count_tokens(text) for _, text in self._sent))
+        new = {}  # record index -> "step: text", charged as sent (step label included)
+        if self.records and self.records[-1].index not in sent:
+            last = self.records[-1]
+            text = f"{last.step}: {last.output}"
+            tokens = self.count_tokens(text)
+            if tokens <= remaining // 2:
+                new[last.index] = text
+                remaining -= tokens
+        query_words = set(_WORD.findall(instruction.lower()))
+        waiting = [r for r in self.records if r.index not in sent and r.index not in new]
+        for record in sorted(waiting, key=lambda r: self._relevance(r, query_words), reverse=True):
+            text = f"{record.step}: {record.summary}"
+            tokens = self.count_tokens(text)
+            if tokens <= remaining:
+                new[record.index] = text
+                remaining -= tokens
+        self._sent += [(i, new[i]) for i in sorted(new)]
+
+        selected = list(self.pinned) + [text for _, text in self._sent]
+        self.sent_tokens += sum(self.count_tokens(s) for s in selected)
+        self.naive_tokens += sum(self.count_tokens(p) for p in self.pinned) + sum(r.tokens for r in self.records)
+        return selected
+
+    def stats(self) -> dict:
+        return {
+            "steps": len(self.records),
+            "context_tokens_sent": self.sent_tokens,
+            "context_tokens_cumulative": self.naive_tokens,
+            "steps_left_out": len(self.records) - len(self._sent),
+        }
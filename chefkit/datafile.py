@@ -0,0 +1,295 @@
+"""
+Compiled Data Tables
+====================
+Reference data (menu, recipes, fridge, ingredients) lives in ``data/*.json``
+or ``data/*.csv`` and is compiled into a small binary table that is
+memory-mapped read-only. Opening a table only parses a header; rows are
+decoded on access, and every process mapping the same file shares the
+same pages of the OS page cache (no per-process copy).
+
+Layout (little-endian):
+
+    header   "<4sHHIIQ"  magic, version, n_fields, n_records, record_size, strings_offset
+    fields   n_fields x (type code: 1 byte, name length: u16, name: utf-8)
+    records  n_records x n_fields x 8 bytes, 8-byte aligned
+               s/l/j -> u32 offset + u32 length in the string table
+               i/b   -> int64,  f -> float64
+    strings  utf-8 string table (identical strings stored once)
+
+Field types: s=str, i=int, b=bool, f=float, l=list of str, j=any JSON value.
+
+Build from the command line:
+
+    python -m chefkit.datafile build data/menu.json data/recipes.json
+
+``load_table("menu")`` also (re)builds the table when the source is newer.
+"""
+
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from pathlib import Path
+
+MAGIC = b"CHTB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIQ")
+SLOT = 8
+LIST_SEP = "\x1f"
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+TABLE_SUFFIX = ".tbl"
+
+_SLOT_FORMATS = {"s": "II", "l": "II", "j": "II", "i": "q", "b": "q", "f": "d"}
+
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def _infer_type(values) -> str:
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, bool) for v in present):
+        return "b"
+    if present and all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return "i"
+    if present and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return "f"
+    if present and all(isinstance(v, list) and all(isinstance(x, str) for x in v) for v in present):
+        return "l"
+    if all(isinstance(v, str) for v in present):
+        return "s"
+    return "j"
+
+
+def build_table(records: list, out_path) -> Path:
+    """Compile a list of flat dicts into a table file (written atomically)."""
+    out_path = Path(out_path)
+    names = []
+    for record in records:
+        names.extend(k for k in record if k not in names)
+    types = [_infer_type([r.get(n) for r in records]) for n in names]
+
+    strings = bytearray()
+    interned = {}
+
+    def intern(text: str):
+        data = text.encode("utf-8")
+        if data not in interned:
+            interned[data] = len(strings)
+            strings.extend(data)
+        return interned[data], len(data)
+
+    record_struct = struct.Struct("<" + "".join(_SLOT_FORMATS[t] for t in types))
+    body = bytearray()
+    for record in records:
+        slots = []
+        for name, code in zip(names, types):
+            value = record.get(name)
+            if code == "s":
+                slots.extend(intern("" if value is None else value))
+            elif code == "l":
+                slots.extend(intern(LIST_SEP.join(value or [])))
+            elif code == "j":
+                slots.extend(intern(json.dumps(value, ensure_ascii=False)))
+            elif code == "f":
+                slots.append(float(value or 0))
+            else:
+                slots.append(int(value or 0))
+        body.extend(record_struct.pack(*slots))
+
+    fields = bytearray()
+    for name, code in zip(names, types):
+        encoded = name.encode("utf-8")
+        fields.extend(code.encode("ascii") + struct.pack("<H", len(encoded)) + encoded)
+
+    records_offset = HEADER.size + len(fields)
+    records_offset += -records_offset % SLOT
+    strings_offset = records_offset + len(body)
+    header = HEADER.pack(MAGIC, VERSION, len(names), len(records), SLOT * len(names), strings_offset)
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=out_path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(header)
+        f.write(fields)
+        f.write(b"\0" * (records_offset - HEADER.size - len(fields)))
+        f.write(body)
+        f.write(strings)
+    os.replace(tmp, out_path)
+    return out_path
+
+
+def read_source(path) -> list:
+    """Records from a JSON list of objects, or a CSV with optional typed headers.
+
+    CSV headers can carry a type: ``prix:int``, ``allergenes:list`` ("|"-separated),
+    ``vegan:bool``, ``note:float``, ``nutrition:json``. Untyped columns are strings.
+    """
+    path = Path(path)
+    if path.suffix == ".json":
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    casts = {
+        "int": int,
+        "float": float,
+        "bool": lambda v: v.strip().lower() in ("1", "true", "oui", "yes"),
+        "list": lambda v: [x.strip() for x in v.split("|") if x.strip()],
+        "json": json.loads,
+        "str": str,
+    }
+    records = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            record = {}
+            for column, value in row.items():
+                name, _, kind = column.partition(":")
+                if (kind or "str") not in casts:
+                    raise ValueError(f"{path}: column {column!r} has unknown type {kind!r} "
+                                     f"(expected one of {', '.join(casts)})")
+                record[name] = casts[kind or "str"](value)
+            records.append(record)
+    return records
+
+
+def build(source, out_path=None) -> Path:
+    source = Path(source)
+    return build_table(read_source(source), out_path or source.with_suffix(TABLE_SUFFIX))
+
+
+# =============================================================================
+# READ
+# =============================================================================
+
+class MappedTable:
+    """Read-only, memory-mapped table. Rows are decoded lazily as dicts."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_fields, self._n_records, self._record_size, self._strings_offset = \
+            HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} table")
+
+        pos = HEADER.size
+        self.fields, self.types = [], []
+        for _ in range(n_fields):
+            code = chr(self._mm[pos])
+            (length,) = struct.unpack_from("<H", self._mm, pos + 1)
+            self.fields.append(bytes(self._mm[pos + 3:pos + 3 + length]).decode("utf-8"))
+            self.types.append(code)
+            pos += 3 + length
+        self._records_offset = pos + (-pos % SLOT)
+        self._record = struct.Struct("<" + "".join(_SLOT_FORMATS[t] for t in self.types))
+
+    def __len__(self):
+        return self._n_records
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_offset + offset
+        return self._mm[start:start + length].decode("utf-8")
+
+    def _decode(self, code, slots):
+        if code == "s":
+            return self._string(*slots)
+        if code == "l":
+            text = self._string(*slots)
+            return text.split(LIST_SEP) if text else []
+        if code == "j":
+            return json.loads(self._string(*slots))
+        if code == "b":
+            return bool(slots[0])
+        return slots[0]
+
+    def __getitem__(self, index: int) -> dict:
+        if index < 0:
+            index += self._n_records
+        if not 0 <= index < self._n_records:
+            raise IndexError(index)
+        raw = self._record.unpack_from(self._mm, self._records_offset + index * self._record_size)
+        row, i = {}, 0
+        for name, code in zip(self.fields, self.types):
+            width = 2 if _SLOT_FORMATS[code] == "II" else 1
+            row[name] = self._decode(code, raw[i:i + width])
+            i += width
+        return row
+
+    def __iter__(self):
+        for index in range(self._n_records):
+            yield self[index]
+
+    def column(self, name: str) -> list:
+        return [row[name] for row in self]
+
+    def close(self):
+        self._mm.close()
+
+
+_open_tables = {}
+
+
+def load_table(name_or_path) -> MappedTable:
+    """
+    Open a compiled table, once per process.
+
+    Accepts a table name ("menu" -> data/menu.tbl) or a source/table path.
+    The table is rebuilt when missing or older than its JSON/CSV source; the
+    table returned before the rebuild is then closed (its mapping released).
+    """
+    path = Path(name_or_path)
+    if path.suffix == "" and not path.parent.parts:
+        path = DATA_DIR / path
+    table_path = path.with_suffix(TABLE_SUFFIX)
+
+    sources = [p for p in (path.with_suffix(".json"), path.with_suffix(".csv")) if p.exists()]
+    if sources:
+        source = sources[0]
+        if not table_path.exists() or table_path.stat().st_mtime < source.stat().st_mtime:
+            build(source, table_path)
+            previous = _open_tables.pop(table_path, None)
+            if previous is not None:
+                previous.close()
+
+    if table_path not in _open_tables:
+        _open_tables[table_path] = MappedTable(table_path)
+    return _open_tables[table_path]
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m chefkit.datafile", description="Compile data tables")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="compile JSON/CSV sources into .tbl files")
+    build_cmd.add_argument("sources", nargs="+", type=Path)
+    build_cmd.add_argument("-o", "--out-dir", type=Path, help="output directory (default: next to source)")
+    show_cmd = sub.add_parser("show", help="print the rows of a compiled table")
+    show_cmd.add_argument("table", type=Path)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        for source in args.sources:
+            out = (args.out_dir / source.with_suffix(TABLE_SUFFIX).name) if args.out_dir else None
+            table_path = build(source, out)
+            table = MappedTable(table_path)
+            print(f"{source} -> {table_path} ({len(table)} rows, {table_path.stat().st_size} bytes)")
+            table.close()
+    else:
+        table = MappedTable(args.table)
+        print(f"fields: {dict(zip(table.fields, table.types))}")
+        for row in table:
+            print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+"""
+Dataset Upload and Local Cache
+==============================
+``create_dataset_item`` in a loop is one blocking HTTP round-trip per item,
+and re-running a setup script inserts every item a second time. Here:
+
+- items come from a list, a JSONL file or a CSV file
+- each item gets a content hash (input + expected output); items already in
+  the dataset with the same content are skipped, and the hash is used as the
+  item id so a concurrent re-run upserts instead of duplicating
+- uploads run concurrently, in batches, with a short retry on errors
+
+    upload_items(get_client(), "chefbot-menu-eval", read_items("data/datasets/menu-eval.jsonl"))
+
+    python -m chefkit.datasets upload chefbot-menu-eval data/datasets/menu-eval.jsonl
+
+JSONL lines are objects ``{"input": ..., "expected_output": ..., "metadata": ...}``
+(``expected`` is accepted for ``expected_output``). CSV columns use dotted names
+to build nested objects, with the typed headers of ``chefkit.datafile``:
+``input.constraints``, ``expected_output.must_avoid:list``.
+
+Experiments load datasets through ``load_dataset`` instead of
+``get_dataset``: items are kept as content-hashed snapshots on disk
+(.cache/datasets/<name>/<version>.json).
+
+- a run starts from the local snapshot; the server is only asked whether the
+  dataset changed (dataset updated-at, item count, newest item), and the
+  items are fetched again only if it did
+- ``version="3f2a9c1b7e4d"`` pins a snapshot: the run is reproducible even if
+  the dataset was edited since
+- offline mode (``offline=True`` or CHEFKIT_OFFLINE=1) never calls the server
+- the items keep their ids, so ``run_experiment`` still links the traces to
+  the Langfuse dataset run
+
+    python -m chefkit.datasets versions chefbot-menu-eval
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+from chefkit.datafile import read_source
+
+
+def content_hash(input, expected_output=None) -> str:
+    canonical = json.dumps({"input": input, "expected_output": expected_output},
+                           sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _normalize(item: dict) -> dict:
+    return {
+        "input": item.get("input"),
+        "expected_output": item.get("expected_output", item.get("expected")),
+        "metadata": item.get("metadata"),
+    }
+
+
+def _nest(record: dict) -> dict:
+    """{"input.constraints": x} -> {"input": {"constraints": x}}."""
+    nested = {}
+    for key, value in record.items():
+        target = nested
+        *parents, leaf = key.split(".")
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = value
+    return nested
+
+
+def read_items(path) -> list:
+    """Dataset items from a .jsonl or .csv file."""
+    path = Path(path)
+    if path.suffix == ".csv":
+        return [_normalize(_nest(record)) for record in read_source(path)]
+    with open(path, encoding="utf-8") as f:
+        return [_normalize(json.loads(line)) for line in f if line.strip()]
+
+
+def _is_not_found(error: Exception) -> bool:
+    """Langfuse's NotFoundError (any ApiError with a 404 status)."""
+    return getattr(error, "status_code", None) == 404
+
+
+def _ensure_dataset(client, name: str, description: str = None, metadata: dict = None) -> list:
+    """Items already in the dataset (the dataset is created if missing).
+
+    Any other error (auth, network, 5xx) is raised: creating the dataset then
+    would hide it, or duplicate a dataset that exists.
+    """
+    try:
+        return list(client.get_dataset(name).items)
+    except Exception as e:
+        if not _is_not_found(e):
+            raise
+    client.create_dataset(name=name, description=description, metadata=metadata)
+    return []
+
+
+def upload_items(client, dataset_name: str, items, batch_size: int = 50, concurrency: int = 8,
+                 retries: int = 2, description: str = None, metadata: dict = None) -> dict:
+    """
+    Upload `items` to a Langfuse dataset, skipping content already present.
+
+    Args:
+        client: A Langfuse client (``get_client()`` or ``Langfuse(...)``).
+        items: Dicts with input / expected_output (or expected) / metadata.
+        description, metadata: Used only if the dataset has to be created.
+
+    Returns:
+        Counts: total, duplicates (in `items`), existing (already in the dataset),
+        uploaded, failed, plus the errors.
+    """
+    existing = _ensure_dataset(client, dataset_name, description, metadata)
+    known = {content_hash(item.input, item.expected_output) for item in existing}
+    known |= {item.id for item in existing}
+
+    stats = {"total": 0, "duplicates": 0, "existing": 0, "uploaded": 0, "failed": 0, "errors": []}
+    pending, seen = [], set()
+    for item in map(_normalize, items):
+        stats["total"] += 1
+        digest = content_hash(item["input"], item["expected_output"])
+        item_id = hashlib.sha256(f"{dataset_name}:{digest}".encode()).hexdigest()[:32]
+        if digest in seen:
+            stats["duplicates"] += 1
+        elif digest in known or item_id in known:
+            stats["existing"] += 1
+        else:
+            seen.add(digest)
+            pending.append((item_id, item))
+
+    def upload(entry):
+        item_id, item = entry
+        for attempt in range(retries + 1):
+            try:
+                client.create_dataset_item(
+                    dataset_name=dataset_name,
+                    id=item_id,
+                    input=item["input"],
+                    expected_output=item["expected_output"],
+                    metadata=item["metadata"],
+                )
+                return None
+            except Exception as e:
+                if attempt == retries:
+                    return f"{item_id}: {type(e).__name__}: {e}"
+                time.sleep(0.5 * 2 ** attempt)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            errors = [e for e in pool.map(upload, batch) if e]
+            stats["uploaded"] += len(batch) - len(errors)
+            stats["failed"] += len(errors)
+            stats["errors"] += errors
+    return stats
+
+
+# =============================================================================
+# LOCAL CACHE
+# =============================================================================
+
+CACHE_DIR = Path(os.getenv("CHEFKIT_DATASET_CACHE", Path(__file__).resolve().parent.parent / ".cache" / "datasets"))
+
+
+@dataclass
+class CachedItem:
+    """Same attributes as Langfuse's DatasetItemClient that experiments use."""
+    id: str
+    dataset_id: str
+    input: object
+    expected_output: object = None
+    metadata: object = None
+
+
+@dataclass
+class CachedDataset:
+    name: str
+    version: str
+    items: list
+    fetched_at: float
+
+
+def _offline() -> bool:
+    return os.getenv("CHEFKIT_OFFLINE", "").lower() in ("1", "true", "yes")
+
+
+def _dataset_dir(name: str, cache_dir) -> Path:
+    return Path(cache_dir) / name.replace("/", "_")
+
+
+def _snapshot_version(items: list) -> str:
+    canonical = json.dumps(sorted((asdict(i) for i in items), key=lambda i: i["id"]),
+                           sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:12]
+
+
+def _read_json(path: Path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_json(path: Path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
+
+
+def _load_snapshot(directory: Path, version: str):
+    data = _read_json(directory / f"{version}.json")
+    if data is None:
+        return None
+    return CachedDataset(data["name"], data["version"], [CachedItem(**i) for i in data["items"]], data["fetched_at"])
+
+
+def _fingerprint(client, name: str):
+    """Cheap "did it change?" check: 2 small requests instead of every item page."""
+    dataset = client.api.datasets.get(dataset_name=name)
+    page = client.api.dataset_items.list(dataset_name=name, page=1, limit=1)
+    newest = page.data[0] if page.data else None
+    return [str(getattr(dataset, "updated_at", "")), page.meta.total_items,
+            getattr(newest, "id", None), str(getattr(newest, "updated_at", ""))]
+
+
+def _fetch(client, name: str, directory: Path) -> CachedDataset:
+    dataset = client.get_dataset(name)
+    items = [
+        CachedItem(item.id, getattr(item, "dataset_id", None), item.input, item.expected_output, item.metadata)
+        for item in dataset.items
+    ]
+    snapshot = CachedDataset(name, _snapshot_version(items), items, time.time())
+    _write_json(directory / f"{snapshot.version}.json",
+                {**asdict(snapshot), "items": [asdict(i) for i in items]})
+    return snapshot
+
+
+def load_dataset(client, name: str, version: str = None, offline: bool = None,
+                 refresh: bool = False, cache_dir=CACHE_DIR) -> CachedDataset:
+    """
+    Items of a Langfuse dataset, from the local cache when it is up to date.
+
+    Args:
+        version: A snapshot version to pin (12 hex chars, see `versions`).
+        offline: Never call the server (default: CHEFKIT_OFFLINE).
+        refresh: Fetch every item again even if the fingerprint did not change.
+    """
+    offline = _offline() if offline is None else offline
+    directory = _dataset_dir(name, cache_dir)
+    index = _read_json(directory / "index.json") or {}
+
+    if version:
+        snapshot = _load_snapshot(directory, version)
+        if snapshot is None and not offline:
+            snapshot = _fetch(client, name, directory)
+            if snapshot.version != version:
+                raise LookupError(f"dataset {name!r} version {version} is not cached "
+                                  f"and the server has version {snapshot.version}")
+        if snapshot is None:
+            raise LookupError(f"dataset {name!r} version {version} is not cached (offline)")
+        return snapshot
+
+    latest = _load_snapshot(directory, index["latest"]) if index.get("latest") else None
+    if offline:
+        if latest is None:
+            raise LookupError(f"dataset {name!r} is not cached (offline)")
+        return latest
+
+    fingerprint = None
+    try:
+        fingerprint = _fingerprint(client, name)
+    except Exception as e:
+        print(f"Could not revalidate dataset {name!r}: {e}")
+    if latest is not None and not refresh and fingerprint is not None and fingerprint == index.get("fingerprint"):
+        return latest
+
+    try:
+        snapshot = _fetch(client, name, directory)
+    except Exception:
+        if latest is None:
+            raise
+        print(f"Using cached dataset {name!r} version {latest.version}")
+        return latest
+    _write_json(directory / "index.json", {"latest": snapshot.version, "fingerprint": fingerprint,
+                                           "checked_at": time.time()})
+    return snapshot
+
+
+def versions(name: str, cache_dir=CACHE_DIR) -> list:
+    """Cached snapshots of a dataset, newest first: [(version, fetched_at, n_items)]."""
+    found = []
+    for path in _dataset_dir(name, cache_dir).glob("*.json"):
+        data = _read_json(path)
+        if path.name != "index.json" and data:
+            found.append((data["version"], data["fetched_at"], len(data["items"])))
+    return sorted(found, key=lambda v: v[1], reverse=True)
+
+
+def format_stats(stats: dict) -> str:
+    return (f"{stats['uploaded']} uploaded, {stats['existing']} already in dataset, "
+            f"{stats['duplicates']} duplicates, {stats['failed']} failed (of {stats['total']})")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Langfuse dataset upload and local cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    up = sub.add_parser("upload")
+    up.add_argument("dataset")
+    up.add_argument("files", nargs="+", help=".jsonl or .csv files")
+    up.add_argument("--concurrency", type=int, default=8)
+    up.add_argument("--batch-size", type=int, default=50)
+    ls = sub.add_parser("versions", help="list the cached snapshots of a dataset")
+    ls.add_argument("dataset")
+    args = parser.parse_args()
+
+    if args.command == "versions":
+        for version, fetched_at, n_items in versions(args.dataset):
+            print(f"{version}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(fetched_at))}  {n_items} items")
+        raise SystemExit(0)
+
+    from dotenv import load_dotenv
+    from langfuse import get_client
+
+    load_dotenv()
+    client = get_client()
+    items = [item for path in args.files for item in read_items(path)]
+    stats = upload_items(client, args.dataset, items, batch_size=args.batch_size, concurrency=args.concurrency)
+    print(f"{args.dataset}: {format_stats(stats)}")
+    for error in stats["errors"]:
+        print(f"  {error}")
+    client.flush()
@@ -0,0 +1,85 @@
+"""
+Parallel Delegation
+===================
+A manager CodeAgent calls its managed agents like functions, one after the
+other, even when the sub-tasks are independent (check the allergens / price
+the menu): the request takes the sum of the sub-agents' times.
+``enable_parallel_delegation`` gives the manager a ``delegate_parallel`` tool:
+
+    results = delegate_parallel(tasks={
+        "nutritionist": "Vérifie les allergènes de : ...",
+        "budget_manager": "Cherche les plats de toutes les catégories ...",
+    })
+    print(results["nutritionist"])
+
+The sub-agents run in threads and the call returns when all of them are done,
+so the manager's next step sees every result: the request takes about the
+slowest sub-agent's time. An agent that fails returns its error as its
+result instead of failing the others.
+
+Each managed agent keeps its own memory, so one agent appears at most once
+per call. The Langfuse context is copied into the threads: the sub-agents'
+spans stay under the manager's trace.
+"""
+
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from chefkit.lazy import deferred, module_getattr
+
+
+@deferred
+def _parallel_delegation_tool():
+    from smolagents import Tool
+
+    class ParallelDelegationTool(Tool):
+        name = "delegate_parallel"
+        inputs = {
+            "tasks": {
+                "type": "object",
+                "description": "Dict {agent_name: task}, one entry per managed agent to run at the same time",
+            }
+        }
+        output_type = "object"
+
+        def __init__(self, agents: dict, max_workers: int = None):
+            self.agents = agents
+            self.max_workers = max_workers or len(agents)
+            self.description = (
+                f"Runs several managed agents AT THE SAME TIME ({', '.join(agents)}) and returns "
+                "{agent_name: answer} once all are done. Use it when the sub-tasks do not depend on each "
+                "other's results, instead of calling the agents one after the other."
+            )
+            super().__init__()
+
+        def _delegate(self, name: str, task: str) -> str:
+            try:
+                return self.agents[name](task=task)
+            except Exception as e:
+                return f"Error: agent '{name}' failed: {type(e).__name__}: {e}"
+
+        def forward(self, tasks: dict) -> dict:
+            unknown = [name for name in tasks if name not in self.agents]
+            if unknown:
+                raise ValueError(f"Unknown agents {unknown}, available: {list(self.agents)}")
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks) or 1)) as pool:
+                futures = {
+                    name: pool.submit(contextvars.copy_context().run, self._delegate, name, str(task))
+                    for name, task in tasks.items()
+                }
+                return {name: future.result() for name, future in futures.items()}
+    return ParallelDelegationTool
+
+
+__getattr__ = module_getattr(__name__, ParallelDelegationTool=_parallel_delegation_tool)
+
+
+def enable_parallel_delegation(agent, max_workers: int = None):
+    """Add `delegate_parallel` to `agent` and to every manager below it."""
+    managed = getattr(agent, "managed_agents", {}) or {}
+    if len(managed) > 1:
+        tool = _parallel_delegation_tool()(managed, max_workers)
+        agent.tools[tool.name] = tool
+    for sub_agent in managed.values():
+        enable_parallel_delegation(sub_agent, max_workers)
+    return agent
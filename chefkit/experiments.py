@@ -0,0 +1,311 @@
+"""
+Experiment Matrix
+=================
+Comparing configurations meant editing a hard-coded list of configs in the
+evaluation script. An experiment is now a spec file (TOML, or YAML with
+PyYAML installed) whose ``matrix`` is expanded into the Cartesian product of
+its axes:
+
+    name = "compare-configurations"
+    target = "TP/chefbot 7.py"        # defines load_items, run_cell, score_cell
+    concurrency = 4
+    score_params = ["judge"]          # only used to score the outputs
+
+    [params]                          # the same for every cell
+    judge = "groq/llama-3.3-70b-versatile"
+
+    [matrix]
+    model = ["groq/llama-3.3-70b-versatile", "groq/llama-3.1-8b-instant"]
+    routing = ["default", "routed"]
+    planning_interval = [0, 2]
+    dataset = ["scenarios"]
+
+    [matrix.instructions]             # a table: labels in the cell names, values for the agents
+    none = ""
+    batch = "Envoie toute la liste d'ingrédients en un seul appel."
+
+    [[exclude]]                       # cells to skip (all the given axes match)
+    model = "groq/llama-3.1-8b-instant"
+    routing = "routed"
+
+    python -m chefkit.experiments cells spec.toml     # the cells, without running anything
+    python -m chefkit.experiments run spec.toml [--shard 0/4]
+
+- identical cells (same parameters under different names) run once; the
+  result lists every name
+- each (cell, item) run goes through ``run_cell`` at most once per agent
+  configuration: outputs are cached on disk by their parameters without the
+  ``score_params`` (changing the judge re-scores, it does not re-run the
+  agents), across runs and specs
+- runs are scheduled ``concurrency`` at a time, scores and outputs are
+  appended to a ``Journal`` as they come (a relaunch resumes), and the runs
+  are split into shards like ``shard_items``
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from chefkit.journal import EXPERIMENTS_DIR, Journal, shard_items
+
+OUTPUTS_DIR = Path(os.getenv("CHEFKIT_OUTPUT_CACHE", EXPERIMENTS_DIR / "_outputs"))
+_MISSING = object()
+
+
+# =============================================================================
+# SPEC
+# =============================================================================
+
+def load_spec(path) -> dict:
+    """An experiment spec from a .toml, .yaml or .yml file, with its defaults."""
+    path = Path(path)
+    if path.suffix == ".toml":
+        import tomllib
+        with open(path, "rb") as f:
+            spec = tomllib.load(f)
+    elif path.suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("YAML specs need PyYAML (pip install pyyaml); TOML specs need nothing")
+        with open(path, encoding="utf-8") as f:
+            spec = yaml.safe_load(f)
+    else:
+        raise ValueError(f"Unknown spec format: {path.name} (expected .toml, .yaml or .yml)")
+
+    if not isinstance(spec.get("matrix"), dict) or not spec["matrix"]:
+        raise ValueError(f"{path}: 'matrix' must map each axis to a list or a table of values")
+    spec.setdefault("name", path.stem)
+    spec.setdefault("concurrency", 1)
+    spec.setdefault("params", {})
+    spec.setdefault("score_params", [])
+    spec.setdefault("exclude", [])
+    spec["path"] = str(path)
+    return spec
+
+
+def _key(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()[:12]
+
+
+def _label(value) -> str:
+    if value is None or value == "":
+        return "none"
+    return str(value).rsplit("/", 1)[-1]  # groq/llama-3.1-8b-instant -> llama-3.1-8b-instant
+
+
+@dataclass
+class Cell:
+    name: str
+    params: dict
+    labels: dict
+    key: str                 # hash of the parameters: identical cells share it
+    aliases: list = field(default_factory=list)
+
+
+def _axis(values) -> list:
+    """[(label, value)] of an axis given as a list or a {label: value} table."""
+    if isinstance(values, dict):
+        return list(values.items())
+    if not isinstance(values, list):
+        values = [values]
+    return [(_label(v), v) for v in values]
+
+
+def _excluded(labels: dict, params: dict, exclude: list) -> bool:
+    return any(
+        all(labels.get(axis) == str(v) or params.get(axis) == v for axis, v in rule.items())
+        for rule in exclude
+    )
+
+
+def expand(spec: dict) -> list:
+    """The cells of the spec's matrix: Cartesian product minus excluded cells, duplicates merged."""
+    axes = {axis: _axis(values) for axis, values in spec["matrix"].items()}
+    named = [axis for axis, values in axes.items() if len(values) > 1] or list(axes)[:1]
+    cells = {}
+    for combination in itertools.product(*axes.values()):
+        labels = {axis: label for axis, (label, _) in zip(axes, combination)}
+        params = {**spec["params"], **{axis: value for axis, (_, value) in zip(axes, combination)}}
+        if _excluded(labels, params, spec["exclude"]):
+            continue
+        name = ",".join(f"{axis}={labels[axis]}" for axis in named)
+        key = _key(params)
+        if key in cells:
+            cells[key].aliases.append(name)
+        else:
+            cells[key] = Cell(name, params, labels, key)
+    return list(cells.values())
+
+
+# =============================================================================
+# OUTPUT CACHE
+# =============================================================================
+
+class OutputCache:
+    """Agent outputs on disk, one JSON file per (agent parameters, item)."""
+
+    def __init__(self, root=OUTPUTS_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str, default=_MISSING):
+        try:
+            with open(self.root / f"{key}.json", encoding="utf-8") as f:
+                return json.load(f)["output"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return default
+
+    def put(self, key: str, output, **info):
+        tmp = self.root / f"{key}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"output": output, "time": time.time(), **info}, f, ensure_ascii=False, default=str)
+        os.replace(tmp, self.root / f"{key}.json")
+
+
+def default_item_id(item) -> str:
+    return str(item["id"] if isinstance(item, dict) else getattr(item, "id"))
+
+
+# =============================================================================
+# RUNNING
+# =============================================================================
+
+def run_matrix(spec: dict, run, score, load_items, shard: tuple = (0, 1), item_id=default_item_id,
+               cache: OutputCache = None, refresh: bool = False, stats: dict = None,
+               journal_root=EXPERIMENTS_DIR) -> list:
+    """Run every (cell, item) of the spec; returns one result per run.
+
+    Args:
+        run: (params, item) -> agent output (JSON-serializable); a dict output
+            with "success": False is scored but not cached.
+        score: (params, item, output) -> scores (dict).
+        load_items: dataset name (the cell's "dataset" parameter, or None) -> items.
+        shard: (i, N): only this process' part of the runs.
+        refresh: Ignore cached outputs (they are rewritten).
+        stats: Dict filled with the counters of the run (cells, duplicates, cached outputs...).
+    """
+    cache = cache or OutputCache()
+    journal = Journal.for_run(spec["name"], shard=shard, root=journal_root)
+    cells = expand(spec)
+    datasets = {}
+    tasks = []
+    for cell in cells:
+        dataset = cell.params.get("dataset")
+        if dataset not in datasets:
+            datasets[dataset] = list(load_items(dataset))
+        tasks += [(cell, item) for item in datasets[dataset]]
+    tasks = shard_items(tasks, *shard, key=lambda task: f"{task[0].key}:{item_id(task[1])}")
+
+    agent_params = lambda params: {k: v for k, v in params.items() if k not in spec["score_params"]}
+    stats = stats if stats is not None else {}
+    stats.update({"cells": len(cells), "duplicates": sum(len(c.aliases) for c in cells), "runs": len(tasks),
+                  "resumed": 0, "cached_outputs": 0, "agent_runs": 0, "errors": 0})
+    stats_lock = threading.Lock()
+    key_locks, computed = {}, set()
+
+    def count(name):
+        with stats_lock:
+            stats[name] += 1
+
+    def agent_output(params: dict, item) -> tuple:
+        """(output, cached): one agent run per output key, concurrent cells with the same key wait for it."""
+        output_key = _key([agent_params(params), item_id(item)])
+        with stats_lock:
+            lock = key_locks.setdefault(output_key, threading.Lock())
+        with lock:
+            if not refresh or output_key in computed:
+                output = cache.get(output_key)
+                if output is not _MISSING:
+                    count("cached_outputs")
+                    return output, True
+            output = run(params, item)
+            count("agent_runs")
+            if not (isinstance(output, dict) and output.get("success") is False):
+                cache.put(output_key, output, params=agent_params(params), item=item_id(item))
+                computed.add(output_key)
+            return output, False
+
+    def execute(cell, item):
+        output, cached = agent_output(cell.params, item)
+        return {"cell": cell.name, "aliases": cell.aliases, "cell_key": cell.key, "params": cell.params,
+                "item": item_id(item), "output": output, "scores": score(cell.params, item, output),
+                "cached_output": cached}
+
+    def task(cell, item):
+        key = f"{cell.key}:{item_id(item)}"
+        if journal.is_done(key):
+            count("resumed")
+            return journal.records[key]["result"]
+        try:
+            result = execute(cell, item)
+            journal.append(key, status="success", result=result)
+        except Exception as e:
+            count("errors")
+            result = {"cell": cell.name, "aliases": cell.aliases, "cell_key": cell.key, "params": cell.params,
+                      "item": item_id(item), "error": f"{type(e).__name__}: {e}"}
+            journal.append(key, status="error", result=result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, int(spec["concurrency"]))) as pool:
+        return list(pool.map(lambda t: task(*t), tasks))
+
+
+def summarize(results: list) -> dict:
+    """{cell: {"runs", "errors", <mean of each numeric score>}}."""
+    summary = {}
+    for result in results:
+        cell = summary.setdefault(result["cell"], {"runs": 0, "errors": 0, "_sums": {}, "_counts": {}})
+        cell["runs"] += 1
+        if "error" in result:
+            cell["errors"] += 1
+            continue
+        for name, value in (result.get("scores") or {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                cell["_sums"][name] = cell["_sums"].get(name, 0) + value
+                cell["_counts"][name] = cell["_counts"].get(name, 0) + 1
+    for cell in summary.values():
+        sums, counts = cell.pop("_sums"), cell.pop("_counts")
+        cell.update({name: round(sums[name] / counts[name], 3) for name in sums})
+    return summary
+
+
+def run_spec(path, shard: tuple = (0, 1), refresh: bool = False, stats: dict = None) -> list:
+    """Run a spec with the load_items / run_cell / score_cell functions of its `target` script."""
+    from chefkit.scripts import load_script
+
+    spec = load_spec(path)
+    if "target" not in spec:
+        raise ValueError(f"{path}: 'target' (the script defining run_cell, score_cell, load_items) is missing")
+    target = load_script(spec["target"])
+    return run_matrix(spec, target.run_cell, target.score_cell, target.load_items, shard=shard,
+                      item_id=getattr(target, "item_id", default_item_id), refresh=refresh, stats=stats)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from chefkit.journal import parse_shard
+
+    parser = argparse.ArgumentParser(description="Experiment matrix from a TOML / YAML spec")
+    parser.add_argument("command", choices=["cells", "run"])
+    parser.add_argument("spec")
+    parser.add_argument("--shard", type=parse_shard, default=(0, 1), help="only part i/N of the runs")
+    parser.add_argument("--refresh", action="store_true", help="run the agents again (ignore cached outputs)")
+    args = parser.parse_args()
+
+    if args.command == "cells":
+        for cell in expand(load_spec(args.spec)):
+            print(f"{cell.key}  {cell.name}" + (f"  (= {', '.join(cell.aliases)})" if cell.aliases else ""))
+    else:
+        stats = {}
+        results = run_spec(args.spec, shard=args.shard, refresh=args.refresh, stats=stats)
+        for name, cell in summarize(results).items():
+            print(f"{name}: {cell}")
+        print(f"\n{stats}")
@@ -0,0 +1,195 @@
+"""
+Ingredient Knowledge Base
+=========================
+Structured replacement for the ``DIETARY_DB`` dicts of the TP scripts.
+
+``DIETARY_DB.get(ingredient.lower())`` misses on "Crème fraiche",
+"creme fraîche" or "crèmes fraîches", and every miss costs the agent another
+step. Here every name and synonym is indexed under a normalized key:
+
+- Unicode folding: accents removed, "œ" -> "oe", case folded
+- light French lemmatization: plural "s"/"x" dropped, "eaux" -> "eau"
+- ``lookup`` only answers exact names and synonyms: "beurre de cacahuète" is
+  not "beurre" (peanuts, not lactose), so a known name at the start of the
+  text is never returned as the answer
+- a prefix trie gives the uncertain candidates (``partial``: "beurre" for
+  "beurre de cacahuète", "épinards" for "épin") and completions, to be
+  shown as suggestions to confirm
+
+Each entry carries structured allergen / diet / nutrition fields, and
+``lookup_many`` checks a whole ingredient list in one call. The entries
+come from ``data/ingredients.json``.
+"""
+
+import unicodedata
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+
+# =============================================================================
+# KEY NORMALIZATION
+# =============================================================================
+
+_LIGATURES = {"œ": "oe", "æ": "ae", "Œ": "oe", "Æ": "ae"}
+
+
+def fold(text: str) -> str:
+    """'Crème  Fraîche' -> 'creme fraiche' (no accents, case folded, single spaces)."""
+    for lig, repl in _LIGATURES.items():
+        text = text.replace(lig, repl)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = "".join(c if c.isalnum() else " " for c in text.casefold())
+    return " ".join(text.split())
+
+
+def lemmatize(word: str) -> str:
+    """Singular form of a (folded) French word, good enough for ingredient names."""
+    if len(word) <= 3:
+        return word
+    if word.endswith("eaux"):
+        return word[:-1]
+    if word.endswith(("s", "x")) and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def normalize_key(text: str) -> str:
+    """Index key: folded, then every word lemmatized ('crèmes fraîches' -> 'creme fraiche')."""
+    return " ".join(lemmatize(w) for w in fold(text).split())
+
+
+# =============================================================================
+# DATA
+# =============================================================================
+
+@dataclass
+class Ingredient:
+    name: str
+    category: str
+    notes: str
+    allergens: List[str] = field(default_factory=list)
+    vegetarian: bool = True
+    vegan: bool = False
+    nutrition: Dict[str, str] = field(default_factory=dict)
+    synonyms: List[str] = field(default_factory=list)
+
+    def to_dict(self):
+        return asdict(self)
+
+    def describe(self) -> str:
+        """One-line summary in the style of the old DIETARY_DB values."""
+        allergens = ", ".join(self.allergens) if self.allergens else "aucun"
+        diet = "vegan" if self.vegan else ("végétarien" if self.vegetarian else "non végétarien")
+        return f"{self.name}: {self.notes} Allergènes: {allergens}. Régime: {diet}."
+
+
+def load_ingredients() -> List[Ingredient]:
+    """Ingredients from the compiled ``data/ingredients`` table (see chefkit.datafile)."""
+    from chefkit.datafile import load_table
+
+    return [Ingredient(**row) for row in load_table("ingredients")]
+
+
+# =============================================================================
+# INDEX
+# =============================================================================
+
+class _TrieNode:
+    __slots__ = ("children", "entry")
+
+    def __init__(self):
+        self.children = {}
+        self.entry = None
+
+
+class IngredientKB:
+    """Normalized-key index with a prefix trie over names and synonyms."""
+
+    def __init__(self, ingredients: List[Ingredient]):
+        self.ingredients = list(ingredients)
+        self._root = _TrieNode()
+        self._size = 0
+        # Names first: a synonym never shadows another ingredient's name
+        for ingredient in self.ingredients:
+            self._insert(normalize_key(ingredient.name), ingredient)
+        for ingredient in self.ingredients:
+            for alias in ingredient.synonyms:
+                self._insert(normalize_key(alias), ingredient)
+
+    def __len__(self):
+        return self._size
+
+    def _insert(self, key: str, ingredient: Ingredient):
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+        if node.entry is None:
+            self._size += 1
+            node.entry = ingredient
+
+    def _walk(self, key: str) -> Optional[_TrieNode]:
+        node = self._root
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Ingredient]:
+        """Distinct ingredients having a name or synonym starting with `prefix`."""
+        node = self._walk(normalize_key(prefix))
+        found = []
+        stack = [node] if node else []
+        while stack and len(found) < limit:
+            node = stack.pop()
+            if node.entry is not None and node.entry not in found:
+                found.append(node.entry)
+            stack.extend(node.children[c] for c in sorted(node.children, reverse=True))
+        return found
+
+    def lookup(self, text: str) -> Optional[Ingredient]:
+        """The ingredient whose normalized name or synonym is exactly `text`, else None."""
+        key = normalize_key(text)
+        node = self._walk(key) if key else None
+        return node.entry if node is not None else None
+
+    def partial(self, text: str) -> List[Ingredient]:
+        """
+        Uncertain candidates for a text `lookup` does not know, to be confirmed:
+        the longest known name the text starts with ('beurre' for 'beurre de
+        cacahuète'), else the unique completion of the text ('épin').
+        Never an answer: 'lait de coco' has none of the allergens of 'lait'.
+        """
+        key = normalize_key(text)
+        if not key or self.lookup(text) is not None:
+            return []
+        node = self._root
+        longest = None
+        for i, char in enumerate(key):
+            node = node.children.get(char)
+            if node is None:
+                break
+            # Only names ending on a word boundary
+            if node.entry is not None and i + 1 < len(key) and key[i + 1] == " ":
+                longest = node.entry
+        else:
+            candidates = self.complete(key, limit=2)
+            if len(candidates) == 1:
+                return candidates
+        return [longest] if longest is not None else []
+
+    def lookup_many(self, texts: List[str]) -> Dict[str, Optional[Ingredient]]:
+        """Batch exact lookup, keyed by the original strings."""
+        return {text: self.lookup(text) for text in texts}
+
+
+_default_kb = None
+
+
+def get_kb() -> IngredientKB:
+    """Shared knowledge base, built on first use."""
+    global _default_kb
+    if _default_kb is None:
+        _default_kb = IngredientKB(load_ingredients())
+    return _default_kb
@@ -0,0 +1,165 @@
+"""
+Experiment Journal
+==================
+Experiment loops used to keep their results in memory (or write one JSON
+file at the very end): a crash or a 429 storm lost the whole run. Here every
+item's output and scores are appended to a JSONL journal as soon as they are
+known:
+
+    journal = Journal.for_run("demo-experiment", shard=(0, 4))
+    for item in shard_items(dataset.items, 0, 4, key=lambda it: it.id):
+        if journal.is_done(item.id):
+            continue                      # resumed run: already scored
+        ...
+        journal.append(item.id, status="success", output=output, scores=scores)
+
+- resuming skips items whose last record is a success; errors are retried
+- a torn last line (killed mid-write) is ignored
+- ``shard_items`` assigns items to N shards by a stable hash of their key, so
+  N worker processes can split a dataset without coordinating
+- ``merge_journals`` combines the shard journals (last success wins)
+
+    python -m chefkit.journal merge experiments/demo-experiment
+    python -m chefkit.journal status experiments/demo-experiment
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from pathlib import Path
+
+EXPERIMENTS_DIR = Path(os.getenv("CHEFKIT_EXPERIMENTS_DIR", Path(__file__).resolve().parent.parent / "experiments"))
+
+
+def parse_shard(text: str) -> tuple:
+    """'2/4' -> (2, 4)."""
+    index, _, count = text.partition("/")
+    index, count = int(index), int(count or 1)
+    if not 0 <= index < count:
+        raise ValueError(f"invalid shard {text!r}: expected i/N with 0 <= i < N")
+    return index, count
+
+
+def shard_of(key, count: int) -> int:
+    return zlib.crc32(str(key).encode("utf-8")) % count
+
+
+def shard_items(items, index: int, count: int, key=lambda item: item):
+    """Items of shard `index` out of `count` (stable across runs and processes)."""
+    if count <= 1:
+        return list(items)
+    return [item for item in items if shard_of(key(item), count) == index]
+
+
+def read_journal(path) -> list:
+    records = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    pass  # torn write at the end of a crashed run
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def latest_records(records) -> dict:
+    """key -> last record, a success never being replaced by a later error."""
+    latest = {}
+    for record in records:
+        previous = latest.get(record["key"])
+        if previous is None or record["status"] == "success" or previous["status"] != "success":
+            latest[record["key"]] = record
+    return latest
+
+
+class Journal:
+    def __init__(self, path, durable: bool = True):
+        """
+        Args:
+            path: The JSONL file (created if missing, appended to otherwise).
+            durable: fsync after every record (survives a machine crash, not just a process crash).
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.durable = durable
+        self.records = latest_records(read_journal(self.path))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_run(cls, run_name: str, shard: tuple = (0, 1), root=EXPERIMENTS_DIR, **kwargs) -> "Journal":
+        index, count = shard
+        name = "journal.jsonl" if count <= 1 else f"shard-{index}-of-{count}.jsonl"
+        return cls(Path(root) / run_name.replace("/", "_") / name, **kwargs)
+
+    def is_done(self, key) -> bool:
+        record = self.records.get(str(key))
+        return record is not None and record["status"] == "success"
+
+    def append(self, key, status: str = "success", **fields) -> dict:
+        record = {"key": str(key), "status": status, "time": time.time(), **fields}
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                if self.durable:
+                    os.fsync(f.fileno())
+            if status == "success" or not self.is_done(key):
+                self.records[str(key)] = record
+        return record
+
+    def results(self) -> list:
+        return list(self.records.values())
+
+
+def merge_journals(run_dir, out: str = "merged.jsonl") -> list:
+    """Combine every *.jsonl journal of `run_dir` into `out` (one record per key)."""
+    run_dir = Path(run_dir)
+    records = []
+    for path in sorted(run_dir.glob("*.jsonl")):
+        if path.name != out:
+            records += read_journal(path)
+    merged = list(latest_records(records).values())
+    tmp = run_dir / (out + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for record in merged:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    os.replace(tmp, run_dir / out)
+    return merged
+
+
+def run_shards(script: str, workers: int, args=()) -> int:
+    """Run `script --shard i/N` in N processes, wait for all; returns the worst exit code."""
+    processes = [
+        subprocess.Popen([sys.executable, script, *args, "--shard", f"{i}/{workers}"])
+        for i in range(workers)
+    ]
+    return max(process.wait() for process in processes)
+
+
+def _summary(records) -> str:
+    done = sum(r["status"] == "success" for r in records)
+    return f"{done}/{len(records)} successful"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Experiment journals")
+    parser.add_argument("command", choices=["merge", "status"])
+    parser.add_argument("run_dir", help="e.g. experiments/demo-experiment")
+    args = parser.parse_args()
+
+    if args.command == "merge":
+        merged = merge_journals(args.run_dir)
+        print(f"{args.run_dir}/merged.jsonl: {_summary(merged)}")
+    else:
+        for path in sorted(Path(args.run_dir).glob("*.jsonl")):
+            print(f"{path.name}: {_summary(list(latest_records(read_journal(path)).values()))}")
@@ -0,0 +1,248 @@
+"""
+Lazy Imports and Clients
+========================
+``import litellm`` takes seconds, ``langfuse`` pulls in OpenTelemetry, and a
+script that creates its clients at the top (``langfuse = get_client()``) pays
+for all of it before parsing its arguments, when it is loaded by the server
+or the CLI, and in runs that never trace. The scripts import these through
+this module instead; nothing is imported or created before first use:
+
+    from chefkit.lazy import get_client, lazy_client, lazy_import, observe, propagate_attributes
+
+    litellm = lazy_import("litellm")          # imported at the first litellm.completion(...)
+    langfuse = lazy_client(get_client)        # client created at the first langfuse.xxx
+
+    @observe(name="1. Planification (JSON)")  # langfuse's @observe, applied at the first call
+    def get_planning_steps(constraints): ...
+
+- ``observe`` keeps the function's name, signature and async-ness, so the
+  traces are the same as with ``langfuse.observe``
+- ``get_client`` / ``propagate_attributes`` import langfuse when called
+- ``report_metadata("run_budget", stats)`` attaches stats to the current
+  trace and never raises: failures are logged (logger ``chefkit``)
+- attribute writes go to the real object (``litellm.callbacks = [...]``)
+
+A class built on a heavy base (``smolagents.Tool``, an OpenTelemetry
+``SpanProcessor``) is defined in a ``deferred`` function, run once at first
+use, and exposed under its name by the module's ``__getattr__``:
+
+    @deferred
+    def _shared_tool():
+        from smolagents import Tool
+
+        class SharedTool(Tool):
+            ...
+        return SharedTool
+
+    __getattr__ = module_getattr(__name__, SharedTool=_shared_tool)   # chefkit.blackboard.SharedTool
+
+What importing a script still costs:
+
+    python -m chefkit.lazy "TP/chefbot 2.py" [--top 15]
+
+imports it (without its ``__main__`` block) in a fresh interpreter with
+``-X importtime`` and lists the slowest top-level imports.
+"""
+
+import functools
+import importlib
+import inspect
+import logging
+import sys
+import threading
+
+_lock = threading.RLock()
+log = logging.getLogger("chefkit")
+
+
+class _Lazy:
+    """Proxy that creates its target on first attribute access."""
+
+    def __init__(self, factory, name: str):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_target", None)
+
+    def _resolve(self):
+        target = object.__getattribute__(self, "_target")
+        if target is None:
+            with _lock:
+                target = object.__getattribute__(self, "_target")
+                if target is None:
+                    target = object.__getattribute__(self, "_factory")()
+                    object.__setattr__(self, "_target", target)
+        return target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._resolve(), name, value)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        state = "loaded" if object.__getattribute__(self, "_target") is not None else "not loaded"
+        return f"<lazy {object.__getattribute__(self, '_name')} ({state})>"
+
+
+def lazy_import(name: str):
+    """Module `name`, imported at first use (the module itself if already imported)."""
+    if name in sys.modules:
+        return sys.modules[name]
+    return _Lazy(lambda: importlib.import_module(name), name)
+
+
+def lazy_client(factory, name: str = None):
+    """The object returned by `factory()`, created at first use."""
+    return _Lazy(factory, name or getattr(factory, "__name__", "client"))
+
+
+def deferred(factory):
+    """`factory()` run once, at the first call, then its result returned.
+
+    For classes defined inside the factory (to import their base lazily):
+    their qualified name is set to their name, as if defined at module level.
+    """
+    result = []
+
+    @functools.wraps(factory)
+    def get():
+        if not result:
+            with _lock:
+                if not result:
+                    value = factory()
+                    if isinstance(value, type):
+                        value.__qualname__ = value.__name__
+                    result.append(value)
+        return result[0]
+    return get
+
+
+def module_getattr(module_name: str, **factories):
+    """A module ``__getattr__`` (PEP 562): attribute `name` is ``factories[name]()``, built at first access."""
+    def __getattr__(name):
+        factory = factories.get(name)
+        if factory is None:
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+        value = factory()
+        setattr(sys.modules[module_name], name, value)
+        return value
+    return __getattr__
+
+
+def is_loaded(obj) -> bool:
+    """False for a lazy proxy that has not been used yet."""
+    return not isinstance(obj, _Lazy) or object.__getattribute__(obj, "_target") is not None
+
+
+# =============================================================================
+# LANGFUSE
+# =============================================================================
+
+def get_client(*args, **kwargs):
+    from langfuse import get_client
+    return get_client(*args, **kwargs)
+
+
+def propagate_attributes(*args, **kwargs):
+    from langfuse import propagate_attributes
+    return propagate_attributes(*args, **kwargs)
+
+
+def report_metadata(name: str, value, span: bool = False, scores: dict = None) -> bool:
+    """Attach {name: value} to the current Langfuse trace (or span), plus optional trace scores.
+
+    Returns False, with a warning in the log, if it could not be sent
+    (langfuse missing, no current trace, client error).
+    """
+    try:
+        client = get_client()
+        (client.update_current_span if span else client.update_current_trace)(metadata={name: value})
+        for score_name, score in (scores or {}).items():
+            client.score_current_trace(name=score_name, value=score)
+        return True
+    except Exception as e:
+        log.warning("Could not report %s to Langfuse: %s", name, e)
+        return False
+
+
+def observe(func=None, **kwargs):
+    """``langfuse.observe``, imported and applied when the function is first called."""
+    def decorate(func):
+        observed = []
+
+        def resolve():
+            if not observed:
+                with _lock:
+                    if not observed:
+                        from langfuse import observe as langfuse_observe
+                        observed.append(langfuse_observe(**kwargs)(func))
+            return observed[0]
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kw):
+                return await resolve()(*args, **kw)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kw):
+            return resolve()(*args, **kw)
+        return wrapper
+
+    return decorate(func) if func is not None else decorate
+
+
+# =============================================================================
+# IMPORT-TIME REPORT
+# =============================================================================
+
+def import_report(script: str, top: int = 15) -> dict:
+    """Import `script` in a fresh interpreter and measure its imports.
+
+    Returns {"seconds": wall time, "imports": [(module, cumulative seconds)]},
+    the top-level imports (those made by the script itself or chefkit) slowest first.
+    """
+    import os
+    import subprocess
+    import time
+    from pathlib import Path
+
+    root = Path(__file__).resolve().parent.parent
+    code = f"from chefkit.scripts import load_script; load_script({str(script)!r})"
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(root), os.getenv("PYTHONPATH")]))}
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=root, env=env,
+                            capture_output=True, text=True)
+    seconds = time.perf_counter() - started
+
+    imports, errors = [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        _, cumulative, module = (part for part in line[len("import time:"):].split("|"))
+        if cumulative.strip().isdigit() and not module.startswith("  "):  # top level: not indented
+            imports.append((module.strip(), int(cumulative) / 1e6))
+    imports.sort(key=lambda item: item[1], reverse=True)
+    return {"seconds": round(seconds, 3), "imports": imports[:top], "returncode": result.returncode,
+            "errors": "\n".join(errors[-20:]) if result.returncode else ""}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import time of a script (without running its __main__ block)")
+    parser.add_argument("scripts", nargs="+", help='e.g. "TP/chefbot 2.py"')
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level imports to list")
+    args = parser.parse_args()
+
+    for script in args.scripts:
+        report = import_report(script, args.top)
+        print(f"{script}: {report['seconds']:.2f}s (interpreter start included)")
+        if report["returncode"]:
+            print(f"  import failed:\n{report['errors']}")
+        for module, seconds in report["imports"]:
+            print(f"  {seconds:7.3f}s  {module}")
@@ -0,0 +1,126 @@
+"""
+Adaptive Planning
+=================
+With ``planning_interval=2`` a CodeAgent re-plans every two steps, even when
+the plan is on track: each re-plan is an extra LLM call over the whole memory.
+``AdaptivePlanningAgent`` plans at the first step, then only when:
+
+- the step failed (code error, tool exception), or
+- a tool call of the step failed: it returned None or one of the tools' own
+  failure answers (``failure_signals``: prefixes such as "Aucun plat trouvé",
+  "Recette introuvable"...). Only the tool results are checked, not the
+  printed text: a dish named "Soupe sans erreur" is not a failure, or
+- the verifier rejects a candidate answer, or
+- ``max_plan_age`` steps went by without a plan (optional safety net).
+
+The ``verifier`` is a deterministic function called on the output of each
+code snippet (the value of its last expression):
+
+    None        not a candidate (intermediate result): keep going
+    True        candidate accepted: it becomes the final answer right away,
+                without waiting for the model to call final_answer
+    "reason"    candidate rejected: the reason is added to the observations
+                and the next step re-plans
+
+    agent = AdaptivePlanningAgent(tools=[...], model=model, verifier=check_menu)
+    agent.run(task)
+    agent.plan_stats   # last run: {"plans": 1, "skipped": 3, "early_exits": 1}
+"""
+
+from chefkit.lazy import deferred, module_getattr
+
+# What the tools of this repo answer when they have nothing (the start of the answer)
+FAILURE_SIGNALS = (
+    "Aucun plat trouvé", "Recette introuvable", "Recette non trouvée", "Info inconnue",
+    "Info non disponible", "Error:", "Erreur:",
+)
+
+
+def tool_failed(result, signals=FAILURE_SIGNALS) -> bool:
+    """None, or a string starting with one of `signals` (case-insensitive)."""
+    if result is None:
+        return True
+    return isinstance(result, str) and result.lstrip().casefold().startswith(
+        tuple(s.casefold() for s in signals))
+
+
+@deferred
+def _adaptive_planning_agent():
+    from smolagents import CodeAgent
+    from smolagents.agents import ActionOutput
+
+    class AdaptivePlanningAgent(CodeAgent):
+        def __init__(self, *args, verifier=None, failure_signals=FAILURE_SIGNALS,
+                     max_plan_age: int = None, **kwargs):
+            kwargs["planning_interval"] = 1  # the first step always plans
+            super().__init__(*args, **kwargs)
+            self.verifier = verifier
+            self.failure_signals = tuple(failure_signals)
+            self.max_plan_age = max_plan_age
+            self._plan_age = 0
+            self._tools_watched = False
+            self._failed_calls = []
+            self.plan_stats = {}
+
+        def run(self, task: str, *args, **kwargs):
+            self.planning_interval = 1
+            self._plan_age = 0
+            self._tools_watched = False
+            self.plan_stats = {"plans": 0, "skipped": 0, "early_exits": 0}
+            return super().run(task, *args, **kwargs)
+
+        def _watch(self, name, tool):
+            def call(*args, **kwargs):
+                result = tool(*args, **kwargs)
+                if tool_failed(result, self.failure_signals):
+                    self._failed_calls.append(f"{name} -> {str(result)[:200]!r}")
+                return result
+            return call
+
+        def _watch_tools(self):
+            # run() sent the tools to the executor (whichever it is, e.g. a sandbox):
+            # send them again wrapped, to see what each call returns
+            tools = {**self.tools, **self.managed_agents}
+            self.python_executor.send_tools(
+                {name: tool if name == "final_answer" else self._watch(name, tool) for name, tool in tools.items()}
+            )
+            self._tools_watched = True
+
+        def _step_stream(self, memory_step):
+            # planning_interval is read by the run loop before each step:
+            # 1 = plan before the next step, None = don't
+            if self.planning_interval:
+                self.plan_stats["plans"] += 1
+                self._plan_age = 0
+            else:
+                self.plan_stats["skipped"] += 1
+            self._plan_age += 1
+            if not self._tools_watched:
+                self._watch_tools()
+            self._failed_calls = []
+
+            replan = True  # an exception (code or tool error) leaves it set
+            try:
+                for output in super()._step_stream(memory_step):
+                    if isinstance(output, ActionOutput):
+                        replan = False
+                        if not output.is_final_answer:
+                            verdict = self.verifier(output.output) if self.verifier else None
+                            if verdict is True:
+                                self.plan_stats["early_exits"] += 1
+                                output = ActionOutput(output=output.output, is_final_answer=True)
+                            elif isinstance(verdict, str):
+                                memory_step.observations = f"{memory_step.observations or ''}\nVerification failed: {verdict}"
+                                replan = True
+                            elif self._failed_calls:
+                                failed = "\n".join(self._failed_calls)
+                                memory_step.observations = f"{memory_step.observations or ''}\nTool call failed: {failed}"
+                                replan = True
+                    yield output
+            finally:
+                too_old = self.max_plan_age is not None and self._plan_age >= self.max_plan_age
+                self.planning_interval = 1 if (replan or too_old) else None
+    return AdaptivePlanningAgent
+
+
+__getattr__ = module_getattr(__name__, AdaptivePlanningAgent=_adaptive_planning_agent)
@@ -0,0 +1,102 @@
+"""
+Prefix-Cache Friendly Prompts
+=============================
+Providers cache the longest prompt prefix already seen (OpenAI, Groq,
+Anthropic via litellm...). A prompt that starts with the varying part
+("Execute this step: ...") followed by the constant context never hits the
+cache. ``PromptLayout`` always assembles messages in the same order, from the
+most stable to the most volatile:
+
+    1. system prompt            identical for every call of the pipeline
+    2. tool schemas             sorted, serialized deterministically
+    3. accumulated context      append-only: step N's context is a prefix of step N+1's
+    4. new instruction          the only part that changes every call
+
+    layout = PromptLayout("You are ChefBot.", context_title="Previous results")
+    response = litellm.completion(model=..., **layout.request(step, context=previous))
+    cache.record(response)   # PrefixCacheStats: prompt vs cached tokens
+"""
+
+import json
+import threading
+
+from chefkit.lazy import report_metadata
+
+
+class PromptLayout:
+    def __init__(self, system: str, tools: list = None, context_title: str = "Context"):
+        """
+        Args:
+            system: The constant system prompt.
+            tools: Optional tool JSON schemas (OpenAI format), sent as `tools=`
+                and sorted by name so their serialization never changes.
+            context_title: Header of the context message.
+        """
+        self.system = system
+        self.tools = sorted(tools, key=lambda t: json.dumps(t, sort_keys=True)) if tools else None
+        self.context_title = context_title
+
+    def messages(self, instruction: str, context=()) -> list:
+        messages = [{"role": "system", "content": self.system}]
+        if context:
+            items = "\n".join(f"- {item}" for item in context)
+            messages.append({"role": "user", "content": f"{self.context_title}:\n{items}"})
+        messages.append({"role": "user", "content": instruction})
+        return messages
+
+    def request(self, instruction: str, context=()) -> dict:
+        """Keyword arguments for a chat completion call (messages, tools)."""
+        request = {"messages": self.messages(instruction, context)}
+        if self.tools:
+            request["tools"] = self.tools
+        return request
+
+
+def _field(obj, name, default=None):
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def usage_tokens(response) -> tuple:
+    """(prompt_tokens, cached_tokens) of a chat completion response (litellm, openai, groq)."""
+    usage = _field(response, "usage")
+    prompt = _field(usage, "prompt_tokens", 0) or 0
+    details = _field(usage, "prompt_tokens_details")
+    cached = _field(details, "cached_tokens") or _field(usage, "cache_read_input_tokens") or 0
+    return prompt, cached
+
+
+class PrefixCacheStats:
+    """Counts prompt tokens and the part the provider served from its prefix cache."""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, response):
+        prompt, cached = usage_tokens(response)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt
+            self.cached_tokens += cached
+        return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+            }
+
+    def report(self) -> dict:
+        """Attach the stats to the current Langfuse span (if any)."""
+        stats = self.stats()
+        report_metadata("prompt_cache", stats, span=True)
+        return stats
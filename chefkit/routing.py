@@ -0,0 +1,187 @@
+"""
+Model Routing
+=============
+Every agent of a multi-agent system does not need the 70B model: the workers'
+steps are mostly tool dispatch (call menu_search, call calculate_bill), which
+an 8B model handles faster and cheaper. ``ModelRouter`` picks a model per LLM
+call:
+
+- large: planning steps, agents in ``large_roles`` (the manager's synthesis),
+  prompts over ``max_small_tokens``, the step right after an error, and any
+  role whose recent success rate on the small model fell under ``min_success``
+- small: everything else
+
+A small-model call that raises or returns no code block (CodeAgent) is
+retried on the large model right away (escalation).
+
+    router = ModelRouter(small=LiteLLMModel("groq/llama-3.1-8b-instant"),
+                         large=LiteLLMModel("groq/llama-3.3-70b-versatile"))
+    route_agents(manager, router)   # manager + all its managed agents
+    manager.run(task)
+    router.stats()
+"""
+
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from chefkit.lazy import deferred, module_getattr, report_metadata
+
+if TYPE_CHECKING:
+    from smolagents.models import Model
+
+PLAN_STOP = "<end_plan>"
+ERROR_MARKERS = ("Error:", "Error executing", "Code execution failed")
+
+
+def _text(message) -> str:
+    content = message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _role(message) -> str:
+    role = message.get("role") if isinstance(message, dict) else getattr(message, "role", "")
+    return str(getattr(role, "value", role))
+
+
+class ModelRouter:
+    def __init__(self, small: "Model", large: "Model", max_small_tokens: int = 6000,
+                 min_success: float = 0.6, large_roles=("manager",), smoothing: float = 0.2):
+        self.small = small
+        self.large = large
+        self.max_small_tokens = max_small_tokens
+        self.min_success = min_success
+        self.large_roles = set(large_roles)
+        self.smoothing = smoothing
+        self._success = {}  # role -> moving average of small-model successes
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def for_agent(self, role: str, code_tag: str = None) -> "RoutedModel":
+        return _routed_model()(self, role, code_tag)
+
+    # --- decision -------------------------------------------------------------
+
+    def choose(self, role: str, messages: list, stop_sequences=None, after_error: bool = False):
+        """Returns (model, reason)."""
+        if stop_sequences and PLAN_STOP in stop_sequences:
+            return self.large, "planning"
+        if role in self.large_roles:
+            return self.large, "role"
+        if after_error:
+            return self.large, "after_error"
+        tokens = sum(len(_text(m)) for m in messages) // 4
+        if tokens > self.max_small_tokens:
+            return self.large, "long_prompt"
+        if self._success.get(role, 1.0) < self.min_success:
+            return self.large, "low_success"
+        return self.small, "default"
+
+    def record(self, role: str, success: bool):
+        with self._lock:
+            previous = self._success.get(role, 1.0)
+            self._success[role] = (1 - self.smoothing) * previous + self.smoothing * (1.0 if success else 0.0)
+
+    def _count(self, model: "Model", reason: str, seconds: float, message=None, escalated=False):
+        with self._lock:
+            s = self._stats.setdefault(model.model_id, {"calls": 0, "seconds": 0.0, "input_tokens": 0,
+                                                        "output_tokens": 0, "escalations": 0, "reasons": {}})
+            s["calls"] += 1
+            s["seconds"] += seconds
+            s["escalations"] += int(escalated)
+            s["reasons"][reason] = s["reasons"].get(reason, 0) + 1
+            usage = getattr(message, "token_usage", None)
+            if usage is not None:
+                s["input_tokens"] += usage.input_tokens
+                s["output_tokens"] += usage.output_tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "models": {k: {**v, "reasons": dict(v["reasons"])} for k, v in self._stats.items()},
+                "small_success": dict(self._success),
+            }
+
+    def report_stats(self) -> dict:
+        """Attach the routing stats to the current Langfuse trace (if any)."""
+        stats = self.stats()
+        report_metadata("model_routing", stats)
+        return stats
+
+
+@deferred
+def _routed_model():
+    from smolagents.models import Model
+
+    class RoutedModel(Model):
+        """The model of one agent: asks the router which model serves each call."""
+
+        def __init__(self, router: ModelRouter, role: str, code_tag: str = None):
+            super().__init__(model_id=router.large.model_id)
+            self.router = router
+            self.role = role
+            self.code_tag = code_tag
+            self._last_small = False
+
+        def _after_error(self, messages) -> bool:
+            """The last observation (the previous step's result) reports an error."""
+            for message in reversed(messages):
+                if _role(message) != "assistant":
+                    return any(marker in _text(message) for marker in ERROR_MARKERS)
+                break
+            return False
+
+        def _usable(self, message, stop_sequences) -> bool:
+            if self.code_tag is None or (stop_sequences and PLAN_STOP in stop_sequences):
+                return True
+            return self.code_tag in (message.content or "")
+
+        def generate(self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs):
+            after_error = self._after_error(messages)
+            if self._last_small and after_error:
+                # The previous small-model step led to an error
+                self.router.record(self.role, False)
+            model, reason = self.router.choose(self.role, messages, stop_sequences, after_error)
+            self._last_small = model is self.router.small
+
+            started = time.monotonic()
+            try:
+                message = model.generate(messages, stop_sequences=stop_sequences, response_format=response_format,
+                                         tools_to_call_from=tools_to_call_from, **kwargs)
+                ok = self._usable(message, stop_sequences)
+            except Exception:
+                if model is self.router.large:
+                    raise
+                message, ok = None, False
+            self.router._count(model, reason, time.monotonic() - started, message)
+            if model is self.router.large or ok:
+                if model is self.router.small:
+                    self.router.record(self.role, True)
+                return message
+
+            # Escalation: the small model failed this call, the large one retries it
+            self.router.record(self.role, False)
+            self._last_small = False
+            started = time.monotonic()
+            message = self.router.large.generate(messages, stop_sequences=stop_sequences, response_format=response_format,
+                                                 tools_to_call_from=tools_to_call_from, **kwargs)
+            self.router._count(self.router.large, "escalation", time.monotonic() - started, message, escalated=True)
+            return message
+    return RoutedModel
+
+
+__getattr__ = module_getattr(__name__, RoutedModel=_routed_model)
+
+
+def route_agents(agent, router: ModelRouter):
+    """Give `agent` and all its managed agents a routed model (role = agent name)."""
+    managed = getattr(agent, "managed_agents", {}) or {}
+    role = "manager" if managed else (getattr(agent, "name", None) or "worker")
+    code_tags = getattr(agent, "code_block_tags", None)
+    agent.model = router.for_agent(role, code_tags[0] if code_tags else None)
+    for sub_agent in managed.values():
+        if hasattr(sub_agent, "model"):
+            route_agents(sub_agent, router)
+    return agent
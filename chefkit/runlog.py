@@ -0,0 +1,230 @@
+"""
+Run Logs
+========
+Copying every line the agents print (Rich boxes, code, observations) to a
+file from inside ``sys.stdout.write`` makes each print wait for the disk, and
+whatever is still buffered at exit can be lost. ``RunLog`` keeps the terminal
+output as it is and hands the file side to a background thread:
+
+- writes go to a bounded in-memory queue; when it is full (disk much slower
+  than the agent), lines are dropped and counted, the agent never blocks
+- an existing file is appended to, never truncated; it rotates past
+  ``max_bytes`` (run.txt -> run.txt.1.gz -> ...), keeping ``backups`` old
+  files, gzip-compressed if ``compress``
+- ANSI colour codes are kept for the terminal, stripped from the file
+- machine-readable events go to a JSONL file next to the log
+  (run.txt -> run.events.jsonl): run start / end and, with
+  ``step_callbacks()``, one record per agent step (duration, tokens, tools)
+- ``close()`` (also at exit) drains the queue before returning
+
+    run_log = RunLog("run_20250101_120000.txt").install()   # tees sys.stdout
+    agent = CodeAgent(..., step_callbacks=step_callbacks())
+    agent.run(task)
+"""
+
+import atexit
+import gzip
+import json
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+
+_ANSI = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+_STOP = object()
+
+
+class _RotatingFile:
+    def __init__(self, path: Path, max_bytes: int, backups: int, compress: bool):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self.rotations = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # An existing log (same name, or the events file of an earlier run) is continued, never erased
+        self.file = open(self.path, "a", encoding="utf-8")
+        if self.max_bytes and self.file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def _backup(self, index: int) -> Path:
+        return self.path.with_name(f"{self.path.name}.{index}" + (".gz" if self.compress else ""))
+
+    def write(self, text: str):
+        self.file.write(text)
+        if self.max_bytes and self.file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.file.close()
+        self._backup(self.backups).unlink(missing_ok=True)
+        for index in range(self.backups - 1, 0, -1):
+            if self._backup(index).exists():
+                os.replace(self._backup(index), self._backup(index + 1))
+        if self.backups == 0:
+            self.path.unlink()
+        elif self.compress:
+            with open(self.path, "rb") as src, gzip.open(self._backup(1), "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            self.path.unlink()
+        else:
+            os.replace(self.path, self._backup(1))
+        self.rotations += 1
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class RunLog:
+    active = None  # the installed RunLog, used by step_callbacks()
+
+    def __init__(self, path, events: bool = True, max_bytes: int = 20_000_000, backups: int = 5,
+                 compress: bool = True, buffer_size: int = 10_000, echo: bool = True):
+        """
+        Args:
+            path: The human-readable log (the JSONL events go next to it, in <stem>.events.jsonl).
+            events: Write the JSONL event file.
+            max_bytes: Rotate a file when it gets bigger than this (0: never).
+            backups: Rotated files kept.
+            compress: Gzip rotated files.
+            buffer_size: Writes queued for the background thread before new ones are dropped.
+            echo: Also write to the terminal (the stdout replaced by `install`).
+        """
+        self.path = Path(path)
+        self.echo = echo
+        self.terminal = sys.stdout
+        self.dropped = 0
+        self.writes = 0
+        self._installed = False
+        self._closed = False
+        self._queue = queue.Queue(maxsize=buffer_size)
+        self._log = _RotatingFile(self.path, max_bytes, backups, compress)
+        self._events = _RotatingFile(self.path.with_name(f"{self.path.stem}.events.jsonl"),
+                                     max_bytes, backups, compress) if events else None
+        self._thread = threading.Thread(target=self._writer, name="runlog-writer", daemon=True)
+        self._thread.start()
+
+    # --- stream interface (replaces sys.stdout) ---
+
+    def write(self, text: str) -> int:
+        if self.echo:
+            self.terminal.write(text)
+        if text and not self._closed:
+            self._put((self._log, text))
+        return len(text)
+
+    def flush(self):
+        if self.echo:
+            self.terminal.flush()
+
+    def __getattr__(self, name):
+        # isatty, encoding, fileno...: Rich sizes and colours its output from the real terminal
+        if name == "terminal":
+            raise AttributeError(name)
+        return getattr(self.terminal, name)
+
+    # --- events ---
+
+    def event(self, kind: str, **fields):
+        if self._events is not None and not self._closed:
+            record = {"event": kind, "time": time.time(), **fields}
+            self._put((self._events, json.dumps(record, ensure_ascii=False, default=str) + "\n"))
+
+    def step_callback(self, step, agent=None):
+        """smolagents step callback: one "step" event per ActionStep."""
+        usage = getattr(step, "token_usage", None)
+        timing = getattr(step, "timing", None)
+        self.event(
+            "step",
+            agent=getattr(agent, "name", None) or type(agent).__name__,
+            step=getattr(step, "step_number", None),
+            duration=getattr(timing, "duration", None),
+            input_tokens=getattr(usage, "input_tokens", None),
+            output_tokens=getattr(usage, "output_tokens", None),
+            tool_calls=[call.name for call in getattr(step, "tool_calls", None) or []],
+            error=str(step.error) if getattr(step, "error", None) else None,
+            final=getattr(step, "is_final_answer", False),
+        )
+
+    # --- background writer ---
+
+    def _put(self, entry):
+        self.writes += 1
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _writer(self):
+        reported = 0
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < 1000:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            for entry in batch:
+                if entry is _STOP:
+                    break
+                target, text = entry
+                target.write(_ANSI.sub("", text) if target is self._log else text)
+            if self.dropped > reported:
+                self._log.write(f"\n[run log: {self.dropped - reported} writes dropped, buffer full]\n")
+                reported = self.dropped
+            self._log.flush()
+            if self._events is not None:
+                self._events.flush()
+            if _STOP in batch:
+                return
+
+    # --- lifecycle ---
+
+    def install(self) -> "RunLog":
+        """Tee sys.stdout into this log until `close` (called at exit at the latest)."""
+        self.terminal = sys.stdout
+        sys.stdout = self
+        self._installed = True
+        RunLog.active = self
+        atexit.register(self.close)
+        self.event("run_start", log=str(self.path), argv=sys.argv)
+        return self
+
+    def stats(self) -> dict:
+        return {"writes": self.writes, "dropped": self.dropped,
+                "rotations": self._log.rotations + (self._events.rotations if self._events else 0)}
+
+    def close(self):
+        if self._closed:
+            return
+        self.event("run_end", **self.stats())
+        self._closed = True
+        self._queue.put(_STOP)  # blocking: everything queued before is written
+        self._thread.join()
+        self._log.close()
+        if self._events is not None:
+            self._events.close()
+        if self._installed and sys.stdout is self:
+            sys.stdout = self.terminal
+        if RunLog.active is self:
+            RunLog.active = None
+        atexit.unregister(self.close)
+
+    def __enter__(self) -> "RunLog":
+        return self.install()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def step_callbacks() -> list:
+    """Step callbacks for an agent: log its steps to the installed RunLog, if any."""
+    return [RunLog.active.step_callback] if RunLog.active is not None else []
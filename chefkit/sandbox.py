@@ -0,0 +1,427 @@
+"""
+Process-Pool Sandbox for CodeAgent
+==================================
+By default every CodeAgent runs its generated Python in-process, serially:
+one slow or runaway snippet blocks the whole interpreter. Here snippets are
+dispatched to a pool of warm worker processes:
+
+    pool = SandboxPool(workers=4, timeout=30, cpu_seconds=20, memory_mb=1024)
+    sandboxed(manager, pool)      # manager + all its managed agents
+
+- each worker runs smolagents' LocalPythonExecutor (same import whitelist)
+- per-snippet wall-clock timeout (worker killed and replaced) and CPU limit,
+  plus an address-space limit per worker (RLIMIT_AS, Unix only)
+- tool calls made by a snippet are proxied back to the parent process, so
+  managed agents, Langfuse spans and tool caches keep working unchanged
+- workers start from a ``forkserver`` (``spawn`` where there is none),
+  never as a fork of the calling process: the pool is created, and broken
+  workers are replaced, while Langfuse / OpenTelemetry exporter threads run,
+  and a fork can inherit a lock one of them holds. The fork server imports
+  this module once, so new workers start warm
+- a session sticks to its last worker when it is idle, so functions the
+  agent defined in earlier steps stay available; only the variables that
+  changed cross the pipe, in both directions. When it moves to another
+  worker, all its (picklable) variables are shipped there
+
+If no worker frees up within ``acquire_timeout`` (e.g. every worker is held
+by a manager waiting on its sub-agents), the step runs in an extra worker
+started for it, with the same limits, instead of deadlocking; at most
+``max_overflow`` of them at a time, beyond that the step fails. Agent code
+never runs in the calling process.
+"""
+
+import atexit
+import hashlib
+import itertools
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from chefkit.lazy import deferred, module_getattr
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits
+    resource = None
+
+_session_ids = itertools.count(1)
+_IMMUTABLE = (str, bytes, int, float, complex, bool, type(None), frozenset)
+
+
+# =============================================================================
+# WORKER SIDE
+# =============================================================================
+
+class _CpuLimitExceeded(Exception):
+    pass
+
+
+def _picklable(value):
+    try:
+        pickle.dumps(value)
+        return value
+    except Exception:
+        return repr(value)
+
+
+def _picklable_state(state: dict) -> dict:
+    clean = {}
+    for key, value in state.items():
+        try:
+            pickle.dumps(value)
+            clean[key] = value
+        except Exception:
+            pass
+    return clean
+
+
+def _digest(value) -> bytes:
+    return hashlib.blake2b(pickle.dumps(value), digest_size=16).digest()
+
+
+def _record(variables: dict, seen: dict):
+    """Note in `seen` the variables received from the parent (a delta: nothing is removed)."""
+    for key, value in variables.items():
+        try:
+            seen[key] = (value, _digest(value))
+        except Exception:
+            seen.pop(key, None)
+
+
+def _state_changes(state: dict, seen: dict) -> tuple:
+    """(changed picklable entries, removed keys) of the executor's whole `state` since `seen`, which is updated.
+
+    `seen` maps each key to (value, digest of its pickle): the same immutable
+    object is skipped, anything else (lists appended to in place...) is
+    pickled and compared.
+    """
+    changes = {}
+    for key, value in state.items():
+        previous = seen.get(key)
+        if previous is not None and previous[0] is value and isinstance(value, _IMMUTABLE):
+            continue
+        try:
+            digest = _digest(value)
+        except Exception:
+            continue
+        if previous is None or previous[1] != digest:
+            changes[key] = value
+        seen[key] = (value, digest)
+    removed = [key for key in seen if key not in state]
+    for key in removed:
+        del seen[key]
+    return changes, removed
+
+
+def _tool_proxy(conn, name):
+    def call(*args, **kwargs):
+        conn.send(("call", name, args, kwargs))
+        status, value = conn.recv()
+        if status == "error":
+            raise RuntimeError(value)
+        return value
+
+    call.__name__ = name
+    return call
+
+
+def _mapped_bytes() -> int:
+    """Current virtual memory size of this process (0 if unknown)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _set_cpu_limit(seconds):
+    if resource is None or not seconds:
+        return
+    used = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(used.ru_utime + used.ru_stime + seconds) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+
+
+def _clear_cpu_limit():
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def _worker_main(conn, cpu_seconds, memory_mb, max_sessions=32):
+    import signal
+
+    from smolagents.local_python_executor import LocalPythonExecutor
+
+    if resource is not None and memory_mb:
+        # On top of what the forked interpreter already maps (litellm & co are large)
+        limit = _mapped_bytes() + memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if hasattr(signal, "SIGXCPU"):
+        def on_cpu_limit(signum, frame):
+            raise _CpuLimitExceeded(f"CPU limit of {cpu_seconds}s exceeded")
+        signal.signal(signal.SIGXCPU, on_cpu_limit)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C is handled by the parent
+
+    sessions = OrderedDict()
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message[0] == "stop":
+            break
+
+        _, session_id, code, variables, full, tool_names, imports, max_print = message
+        session = sessions.pop(session_id, None)
+        if session is None and not full:  # evicted: the parent sends all the variables again
+            conn.send(("resync",))
+            continue
+        if session is None:
+            session = (LocalPythonExecutor(imports, max_print_outputs_length=max_print), {})
+        sessions[session_id] = session
+        while len(sessions) > max_sessions:
+            sessions.popitem(last=False)
+
+        executor, seen = session
+        executor.send_variables(variables)
+        if full:
+            seen.clear()
+        _record(variables, seen)  # what the parent already has
+        executor.send_tools({name: _tool_proxy(conn, name) for name in tool_names})
+        _set_cpu_limit(cpu_seconds)
+        try:
+            result = executor(code)
+            reply = ("done", _picklable(result.output), result.logs, result.is_final_answer)
+        except BaseException as e:
+            logs = str(executor.state.get("_print_outputs", ""))
+            reply = ("error", f"{type(e).__name__}: {e}", logs, False)
+        finally:
+            _clear_cpu_limit()
+        conn.send(reply + _state_changes(executor.state, seen))
+
+
+# =============================================================================
+# POOL
+# =============================================================================
+
+class _Worker:
+    def __init__(self, ctx, cpu_seconds, memory_mb, overflow: bool = False):
+        self.overflow = overflow  # started because the pool was busy: stopped after one step
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child_conn, cpu_seconds, memory_mb), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+
+class SandboxPool:
+    """Pool of warm executor processes shared by every sandboxed agent."""
+
+    def __init__(self, workers: int = None, timeout: float = 30, cpu_seconds: float = 20,
+                 memory_mb: int = 1024, acquire_timeout: float = 10, max_overflow: int = None):
+        self.size = workers or max(2, os.cpu_count() or 2)
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.acquire_timeout = acquire_timeout
+        self.max_overflow = self.size if max_overflow is None else max_overflow
+        self.overflow = 0  # extra workers running now
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self._ctx = multiprocessing.get_context("forkserver")
+            # smolagents imported once, in the server
+            self._ctx.set_forkserver_preload([__name__, "smolagents.local_python_executor"])
+        else:
+            self._ctx = multiprocessing.get_context("spawn")
+        self._workers = [self._spawn() for _ in range(self.size)]
+        self._idle = list(self._workers)
+        self._cond = threading.Condition()
+        self._closed = False
+        atexit.register(self.close)
+
+    def _spawn(self, overflow: bool = False) -> _Worker:
+        return _Worker(self._ctx, self.cpu_seconds, self.memory_mb, overflow=overflow)
+
+    def acquire(self, preferred: _Worker = None):
+        """An idle worker; after `acquire_timeout`, an extra one (same limits), or None past `max_overflow`."""
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._cond:
+            while not self._idle:
+                remaining = deadline - time.monotonic()
+                if self._closed:
+                    return None
+                if remaining <= 0:
+                    if self.overflow >= self.max_overflow:
+                        return None
+                    self.overflow += 1
+                    break
+                self._cond.wait(remaining)
+            else:
+                worker = preferred if preferred in self._idle else self._idle[-1]
+                self._idle.remove(worker)
+                return worker
+        try:
+            return self._spawn(overflow=True)
+        except BaseException:
+            with self._cond:
+                self.overflow -= 1
+            raise
+
+    def release(self, worker: _Worker, broken: bool = False):
+        if worker.overflow:
+            worker.kill()
+            with self._cond:
+                self.overflow -= 1
+            return
+        with self._cond:
+            if broken:
+                worker.kill()
+                index = self._workers.index(worker)
+                worker = self._workers[index] = self._spawn()
+            self._idle.append(worker)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            for worker in self._workers:
+                try:
+                    worker.conn.send(("stop",))
+                except (OSError, BrokenPipeError):
+                    pass
+                worker.process.join(1)
+                if worker.process.is_alive():
+                    worker.kill()
+
+
+_default_pool = None
+
+
+def get_pool(**kwargs) -> SandboxPool:
+    """Process-wide pool, created on first use."""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = SandboxPool(**kwargs)
+    return _default_pool
+
+
+# =============================================================================
+# EXECUTOR (PARENT SIDE)
+# =============================================================================
+
+
+@deferred
+def _pooled_python_executor():
+    from smolagents.local_python_executor import CodeOutput, InterpreterError, PythonExecutor
+
+    class PooledPythonExecutor(PythonExecutor):
+        """Drop-in replacement for LocalPythonExecutor that runs code in the pool."""
+
+        def __init__(self, pool: SandboxPool, additional_authorized_imports: list, max_print_outputs_length: int = None):
+            self.pool = pool
+            self.additional_authorized_imports = list(additional_authorized_imports)
+            self.max_print_outputs_length = max_print_outputs_length
+            self.session_id = next(_session_ids)
+            self.state = {"__name__": "__main__"}
+            self.tools = {}
+            self._worker = None
+            self._synced = None   # worker whose copy of the session matches self.state, but for _dirty
+            self._dirty = set()   # keys set by the agent since
+
+        def send_variables(self, variables: dict):
+            self.state.update(variables)
+            self._dirty.update(variables)
+
+        def _message(self, code_action: str, worker: _Worker) -> tuple:
+            full = worker is not self._synced
+            variables = (_picklable_state(self.state) if full
+                         else _picklable_state({k: self.state[k] for k in self._dirty if k in self.state}))
+            return ("run", self.session_id, code_action, variables, full, list(self.tools),
+                    self.additional_authorized_imports, self.max_print_outputs_length)
+
+        def send_tools(self, tools: dict):
+            self.tools = dict(tools)
+
+        def __call__(self, code_action: str) -> CodeOutput:
+            worker = self.pool.acquire(preferred=self._worker)
+            if worker is None:
+                raise InterpreterError(f"No sandbox worker available: the {self.pool.size} workers and "
+                                       f"{self.pool.max_overflow} extra ones are all busy")
+
+            broken = False
+            try:
+                worker.conn.send(self._message(code_action, worker))
+                reply = self._serve(worker, code_action)
+                if reply[0] == "resync":
+                    self._synced = None
+                    worker.conn.send(self._message(code_action, worker))
+                    reply = self._serve(worker, code_action)
+            except InterpreterError:
+                broken = True
+                raise
+            except (EOFError, OSError) as e:
+                broken = True
+                raise InterpreterError(f"Sandbox worker crashed ({type(e).__name__}), memory limit exceeded?")
+            finally:
+                self.pool.release(worker, broken=broken)
+                self._worker = None if broken or worker.overflow else worker
+                self._synced = self._worker
+                self._dirty.clear()
+
+            status, output, logs, is_final_answer, changes, removed = reply
+            self.state.update(changes)
+            for key in removed:
+                self.state.pop(key, None)
+            if status == "error":
+                # The agent reads the print outputs from self.state["_print_outputs"]
+                raise InterpreterError(output)
+            return CodeOutput(output=output, logs=logs, is_final_answer=is_final_answer)
+
+        def _serve(self, worker: _Worker, code_action: str):
+            """Answer tool calls until the worker is done; time in tools is not counted."""
+            budget = self.pool.timeout
+            while True:
+                started = time.monotonic()
+                if not worker.conn.poll(budget):
+                    raise InterpreterError(f"Code execution timed out after {self.pool.timeout}s")
+                budget -= time.monotonic() - started
+                message = worker.conn.recv()
+                if message[0] != "call":
+                    return message
+
+                _, name, args, kwargs = message
+                try:
+                    worker.conn.send(("ok", _picklable(self.tools[name](*args, **kwargs))))
+                except Exception as e:
+                    worker.conn.send(("error", f"{type(e).__name__}: {e}"))
+    return PooledPythonExecutor
+
+
+__getattr__ = module_getattr(__name__, PooledPythonExecutor=_pooled_python_executor)
+
+
+def sandboxed(agent, pool: SandboxPool = None):
+    """Route the code execution of `agent` and of all its managed agents to the pool."""
+    pool = pool or get_pool()
+    agent.python_executor = _pooled_python_executor()(
+        pool,
+        agent.additional_authorized_imports,
+        max_print_outputs_length=getattr(agent, "max_print_outputs_length", None),
+    )
+    for managed in getattr(agent, "managed_agents", {}).values():
+        if hasattr(managed, "python_executor"):
+            sandboxed(managed, pool)
+    return agent
@@ -0,0 +1,31 @@
+"""
+Loading the TP scripts as modules
+=================================
+The TP scripts have spaces in their names ("TP/chefbot 6.py"), so they can't
+be imported with ``import``. ``load_script`` imports one by path, once, without
+running its ``if __name__ == "__main__"`` block.
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_loaded = {}
+
+
+def load_script(relative_path: str):
+    """Import e.g. ``load_script("TP/chefbot 6.py")`` and return the module."""
+    path = (ROOT / relative_path).resolve()
+    if path not in _loaded:
+        name = "tp_" + path.stem.replace(" ", "_")
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        # Sibling imports (e.g. `from chefbot import ChefAgent`) resolve like a direct run
+        if str(path.parent) not in sys.path:
+            sys.path.insert(0, str(path.parent))
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+        _loaded[path] = module
+    return _loaded[path]
@@ -0,0 +1,277 @@
+"""
+Async JSON HTTP Server
+======================
+A small asyncio HTTP/1.1 server (stdlib only) for serving agents:
+
+- handlers are blocking functions (agent.run) executed in a bounded thread pool
+- at most ``max_concurrency`` requests run at once, ``max_queue`` more may wait;
+  beyond that the server answers 429 immediately instead of letting latency grow
+- identical in-flight requests are coalesced: they share one execution
+- an ``LLMBudget`` token bucket caps upstream LLM usage; when it is exhausted
+  the server answers 429 with a ``Retry-After`` header; a failed request gets
+  its calls back, a timed-out one keeps its slot until its thread returns
+
+    server = JsonServer(max_concurrency=8, budget=LLMBudget(per_minute=30))
+    server.route("POST", "/ask", ask_handler, cost=4, coalesce_key=lambda b: b["question"])
+    asyncio.run(server.serve("127.0.0.1", 8000))
+"""
+
+import asyncio
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+
+class Overloaded(Exception):
+    """Raise from a handler (or the budget) to answer 429 with Retry-After."""
+
+    def __init__(self, retry_after: float, reason: str = "LLM budget exhausted"):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def require(body: dict, field: str, kind=str):
+    """Field of a request body, or a 400 error."""
+    value = body.get(field)
+    if not isinstance(value, kind) or value == "":
+        raise HTTPError(400, f"'{field}' ({kind.__name__}) is required")
+    return value
+
+
+# =============================================================================
+# LLM BUDGET
+# =============================================================================
+
+class LLMBudget:
+    """Token bucket: `per_minute` LLM calls per minute, bursts up to `burst`."""
+
+    def __init__(self, per_minute: float, burst: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or per_minute
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self, cost: float = 1):
+        """Reserve `cost` calls or raise Overloaded with the time to wait."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                raise Overloaded(self.blocked_until - now, "upstream rate limited")
+            self._refill(now)
+            if self.tokens < cost:
+                raise Overloaded((cost - self.tokens) / self.rate)
+            self.tokens -= cost
+
+    def refund(self, cost: float = 1):
+        """Give back the calls reserved by a request that failed."""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + cost)
+
+    def block(self, seconds: float):
+        """The upstream said 429: stop sending for `seconds`."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+def _is_rate_limit(error: BaseException) -> bool:
+    """litellm.RateLimitError, possibly wrapped by smolagents (AgentGenerationError)."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if "RateLimit" in type(error).__name__ or "rate limit" in str(error).lower():
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+# =============================================================================
+# SERVER
+# =============================================================================
+
+class _Route:
+    def __init__(self, handler, cost, coalesce_key):
+        self.handler = handler
+        self.cost = cost
+        self.coalesce_key = coalesce_key
+
+
+class JsonServer:
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 32, budget: LLMBudget = None,
+                 request_timeout: float = 300, max_body: int = 1 << 20, upstream_cooldown: float = 20):
+        self.routes = {}
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.budget = budget
+        self.request_timeout = request_timeout
+        self.max_body = max_body
+        self.upstream_cooldown = upstream_cooldown
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="agent")
+        self._slots = None
+        self._waiting = 0
+        self._inflight = {}
+        self.stats = {"requests": 0, "coalesced": 0, "rejected": 0, "errors": 0}
+
+    def route(self, method: str, path: str, handler, cost: float = 1, coalesce_key=None):
+        """
+        Register a blocking `handler(body: dict) -> dict`.
+
+        Args:
+            cost: LLM calls charged to the budget per execution.
+            coalesce_key: body -> hashable key; requests with the same key
+                while one is running share its result (None = no coalescing).
+        """
+        self.routes[(method, path)] = _Route(handler, cost, coalesce_key)
+
+    # --- request execution ---------------------------------------------------
+
+    async def _execute(self, route: _Route, body: dict):
+        if self._waiting >= self.max_queue:
+            raise Overloaded(1.0, "server busy")
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            if self.budget:
+                self.budget.take(route.cost)
+            future = asyncio.get_running_loop().run_in_executor(self._pool, route.handler, body)
+        except BaseException:
+            self._slots.release()
+            raise
+        # A thread can't be cancelled: after a timeout the handler keeps running, and keeps
+        # its slot until it really returns (shield: wait_for must not mark it done early)
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.request_timeout)
+        except asyncio.TimeoutError:
+            raise  # still running and still calling the LLM: its budget stays spent
+        except Exception as e:
+            if self.budget and not _is_rate_limit(e):
+                self.budget.refund(route.cost)
+            raise
+
+    async def _dispatch(self, route: _Route, body: dict):
+        if route.coalesce_key is None:
+            return await self._execute(route, body)
+        try:
+            key = (id(route), route.coalesce_key(body))
+        except (KeyError, TypeError) as e:
+            raise HTTPError(400, f"missing or invalid field: {e}")
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+        future = asyncio.ensure_future(self._execute(route, body))
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _respond(self, method: str, path: str, raw_body: bytes):
+        """Returns (status, payload, extra headers)."""
+        if (method, path) == ("GET", "/health"):
+            return 200, {"status": "ok", "waiting": self._waiting, **self.stats}, {}
+        route = self.routes.get((method, path))
+        if route is None:
+            return 404, {"error": f"no route {method} {path}"}, {}
+
+        self.stats["requests"] += 1
+        try:
+            body = json.loads(raw_body or b"{}")
+            if not isinstance(body, dict):
+                raise HTTPError(400, "body must be a JSON object")
+            return 200, await self._dispatch(route, body), {}
+        except Overloaded as e:
+            self.stats["rejected"] += 1
+            retry = max(1, math.ceil(e.retry_after))
+            return 429, {"error": str(e), "retry_after": retry}, {"Retry-After": str(retry)}
+        except HTTPError as e:
+            return e.status, {"error": str(e)}, {}
+        except json.JSONDecodeError as e:
+            return 400, {"error": f"bad request: {e}"}, {}
+        except asyncio.TimeoutError:
+            self.stats["errors"] += 1
+            return 504, {"error": f"timed out after {self.request_timeout}s"}, {}
+        except Exception as e:
+            if _is_rate_limit(e):
+                # The provider already refuses: stop everyone for a while instead of piling up retries
+                self.stats["rejected"] += 1
+                if self.budget:
+                    self.budget.block(self.upstream_cooldown)
+                retry = math.ceil(self.upstream_cooldown)
+                return 429, {"error": "upstream rate limited", "retry_after": retry}, {"Retry-After": str(retry)}
+            self.stats["errors"] += 1
+            return 500, {"error": f"{type(e).__name__}: {e}"}, {}
+
+    # --- HTTP plumbing -------------------------------------------------------
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    status, payload, extra = 400, {"error": "invalid Content-Length"}, {}
+                    keep_alive = False
+                elif length > self.max_body:
+                    status, payload, extra = 413, {"error": "body too large"}, {}
+                    keep_alive = False
+                else:
+                    raw_body = await reader.readexactly(length) if length else b""
+                    status, payload, extra = await self._respond(method, target.split("?")[0], raw_body)
+                    keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                head = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+                        "Content-Type: application/json; charset=utf-8",
+                        f"Content-Length: {len(data)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                head += [f"{k}: {v}" for k, v in extra.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000):
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        print(f"Serving on http://{host}:{port} ({', '.join(p for _, p in self.routes)})")
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,310 @@
+"""
+Restaurant Session Store
+========================
+``agent.run(turn, reset=False)`` keeps a conversation only in the memory of
+one in-process CodeAgent: it can't be shared between workers and is lost on
+restart. Here each session is a small JSON document:
+
+- a compact memory: the last turns (client message + agent answer, truncated)
+- the order state: dishes ordered so far
+
+Any worker can serve the next turn: it loads the session, builds a fresh
+agent, prefixes the task with ``state.context()``, then saves the session.
+
+Two workers may serve the same table at once. Each session carries a
+``version``: ``put`` only writes over the version it loaded (compare-and-swap)
+and raises ``SessionConflict`` otherwise; ``update`` reloads, reapplies the
+change and retries, so no turn or dish is lost:
+
+    store.update(session_id, lambda state: state.record_turn(message, answer))
+
+Stores (all evict sessions idle for more than ``max_idle`` seconds):
+
+    open_store("memory://?max_sessions=1000")     in-process LRU
+    open_store("sqlite:///sessions.db")           shared by processes on one host
+    open_store("redis://localhost:6379/0")        Redis or any compatible local server
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+from urllib.parse import urlparse, parse_qs
+
+MAX_TURNS = 6
+MAX_ANSWER_CHARS = 600
+
+
+# =============================================================================
+# SESSION STATE
+# =============================================================================
+
+@dataclass
+class SessionState:
+    session_id: str
+    turns: List[dict] = field(default_factory=list)
+    order: List[dict] = field(default_factory=list)
+    updated_at: float = field(default_factory=time.time)
+    version: int = 0  # bumped by each successful put
+
+    def record_turn(self, message: str, answer, max_turns: int = MAX_TURNS):
+        """Keep the last `max_turns` exchanges, answers truncated."""
+        answer = str(answer)
+        if len(answer) > MAX_ANSWER_CHARS:
+            answer = answer[:MAX_ANSWER_CHARS] + "…"
+        self.turns.append({"client": message, "agent": answer})
+        del self.turns[:-max_turns]
+        self.updated_at = time.time()
+
+    def add_to_order(self, dish: dict):
+        self.order.append({"nom": dish["nom"], "prix": dish["prix"]})
+        self.updated_at = time.time()
+
+    @property
+    def total(self) -> int:
+        return sum(d["prix"] for d in self.order)
+
+    def context(self) -> str:
+        """Prompt prefix restoring the conversation for a fresh agent."""
+        if not self.turns and not self.order:
+            return ""
+        lines = ["Historique de la conversation avec ce client :"]
+        lines += [f"- Client: {t['client']}\n  Toi: {t['agent']}" for t in self.turns]
+        if self.order:
+            dishes = ", ".join(f"{d['nom']} ({d['prix']}€)" for d in self.order)
+            lines.append(f"Commande en cours : {dishes}. Total : {self.total}€")
+        return "\n".join(lines) + "\n\nNouveau message du client :\n"
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data: str) -> "SessionState":
+        return cls(**json.loads(data))
+
+
+# =============================================================================
+# STORES
+# =============================================================================
+
+class SessionConflict(Exception):
+    """The session was saved by someone else since it was loaded."""
+
+
+class SessionStore(ABC):
+    """get / put / delete sessions by id; idle sessions are evicted."""
+
+    def __init__(self, max_idle: float = 3600):
+        self.max_idle = max_idle
+
+    def load(self, session_id: str) -> SessionState:
+        """Existing session, or a new empty one."""
+        return self.get(session_id) or SessionState(session_id)
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[SessionState]:
+        ...
+
+    def update(self, session_id: str, change, retries: int = 5) -> SessionState:
+        """Load, apply `change(state)` and put, again from a fresh load on conflict."""
+        for attempt in range(retries + 1):
+            state = self.load(session_id)
+            change(state)
+            try:
+                self.put(state)
+                return state
+            except SessionConflict:
+                if attempt == retries:
+                    raise
+
+    @abstractmethod
+    def put(self, state: SessionState):
+        """Save if the stored version is still `state.version`, then bump it; else SessionConflict."""
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+    def evict_idle(self) -> int:
+        """Drop sessions idle for more than max_idle. Returns how many."""
+        return 0
+
+
+class MemorySessionStore(SessionStore):
+    """In-process LRU: fastest, but one process only."""
+
+    def __init__(self, max_sessions: int = 1000, max_idle: float = 3600):
+        super().__init__(max_idle)
+        self.max_sessions = max_sessions
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            data = self._data.get(session_id)
+            if data is None:
+                return None
+            state = SessionState.from_json(data)
+            if time.time() - state.updated_at > self.max_idle:
+                del self._data[session_id]
+                return None
+            self._data.move_to_end(session_id)
+            return state
+
+    def put(self, state):
+        with self._lock:
+            current = self._data.get(state.session_id)
+            if current is not None:
+                current = json.loads(current)
+                alive = time.time() - current["updated_at"] <= self.max_idle
+                if alive and current.get("version", 0) != state.version:
+                    raise SessionConflict(state.session_id)
+            state.version += 1
+            self._data[state.session_id] = state.to_json()
+            self._data.move_to_end(state.session_id)
+            while len(self._data) > self.max_sessions:
+                self._data.popitem(last=False)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._data.pop(session_id, None)
+
+    def evict_idle(self):
+        limit = time.time() - self.max_idle
+        with self._lock:
+            stale = [k for k, v in self._data.items() if json.loads(v)["updated_at"] < limit]
+            for key in stale:
+                del self._data[key]
+        return len(stale)
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite file (WAL mode): shared by all the workers of one machine, survives restarts."""
+
+    def __init__(self, path: str = "sessions.db", max_idle: float = 3600):
+        super().__init__(max_idle)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL,"
+            " version INTEGER NOT NULL DEFAULT 0)"
+        )
+        if "version" not in {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at)")
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM sessions WHERE id = ? AND updated_at >= ?",
+                (session_id, time.time() - self.max_idle),
+            ).fetchone()
+        return SessionState.from_json(row[0]) if row else None
+
+    def put(self, state):
+        # One statement, atomic across processes: the update only applies over the expected
+        # version (or over an expired session, which get() no longer returns)
+        state.version += 1
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO sessions (id, data, updated_at, version) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at,"
+                " version = excluded.version WHERE sessions.version = ? OR sessions.updated_at < ?",
+                (state.session_id, state.to_json(), state.updated_at, state.version,
+                 state.version - 1, time.time() - self.max_idle),
+            )
+        if cursor.rowcount == 0:
+            state.version -= 1
+            raise SessionConflict(state.session_id)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def evict_idle(self):
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.max_idle,))
+        return cursor.rowcount
+
+
+class RedisSessionStore(SessionStore):
+    """Redis (or a compatible local server): idle eviction is the key TTL."""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", max_idle: float = 3600, prefix: str = "chefbot:session:"):
+        super().__init__(max_idle)
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("RedisSessionStore needs the 'redis' package: pip install redis")
+        self._client = redis.Redis.from_url(url)
+        self._watch_error = redis.WatchError
+        self.prefix = prefix
+
+    def get(self, session_id):
+        data = self._client.get(self.prefix + session_id)
+        return SessionState.from_json(data) if data else None
+
+    def put(self, state):
+        # WATCH / MULTI: the SET is dropped if the key changed after the version check
+        key = self.prefix + state.session_id
+        with self._client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                current = pipe.get(key)
+                if current and json.loads(current).get("version", 0) != state.version:
+                    raise SessionConflict(state.session_id)
+                pipe.multi()
+                pipe.set(key, json.dumps({**asdict(state), "version": state.version + 1}, ensure_ascii=False),
+                         ex=int(self.max_idle))
+                pipe.execute()
+            except self._watch_error:
+                raise SessionConflict(state.session_id)
+        state.version += 1
+
+    def delete(self, session_id):
+        self._client.delete(self.prefix + session_id)
+
+
+def open_store(url: str = "memory://", max_idle: float = 3600) -> SessionStore:
+    """Store from a URL: memory://, sqlite:///path/to.db or redis://host:port/db."""
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        options = parse_qs(parsed.query)
+        return MemorySessionStore(int(options.get("max_sessions", [1000])[0]), max_idle)
+    if parsed.scheme == "sqlite":
+        # sqlite:///relative.db, sqlite:////absolute/path.db (same convention as SQLAlchemy)
+        return SQLiteSessionStore(url[len("sqlite:///"):] or "sessions.db", max_idle)
+    if parsed.scheme in ("redis", "rediss"):
+        return RedisSessionStore(url, max_idle)
+    raise ValueError(f"Unknown session store: {url}")
+
+
+# =============================================================================
+# ORDER TOOL
+# =============================================================================
+
+def make_order_tool(state: SessionState, menu):
+    """Tool adding a dish of `menu` (iterable of {"nom", "prix", ...}) to the session's order."""
+    from smolagents import Tool
+
+    class OrderTool(Tool):
+        name = "add_to_order"
+        description = "Ajoute un plat du menu à la commande du client. Retourne la commande et le total."
+        inputs = {"dish_name": {"type": "string", "description": "Nom exact du plat (ex: 'Curry de Légumes')"}}
+        output_type = "string"
+
+        def forward(self, dish_name: str) -> str:
+            dish = next((d for d in menu if d["nom"].lower() == dish_name.strip().lower()), None)
+            if dish is None:
+                return f"Plat '{dish_name}' introuvable dans le menu."
+            state.add_to_order(dish)
+            dishes = ", ".join(d["nom"] for d in state.order)
+            return f"Commande: {dishes}. Total: {state.total}€"
+
+    return OrderTool()
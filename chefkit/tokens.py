@@ -0,0 +1,350 @@
+"""
+Token Counting
+==============
+Call sites only learn the size of their prompt from the API's usage, or from
+a context-length error. ``estimate_tokens`` (~4 characters per token) is too
+rough for a French menu sent to Llama 3, and useless to compare two prompt
+variants. This module counts locally, with the tokenizer of the model
+family:
+
+    count_tokens(text, "groq/llama-3.3-70b-versatile")        # Llama 3 tokenizer
+    count_messages(messages, MODEL_ID)                        # + per-message overhead
+    check_prompt(messages, MODEL_ID, site="synthesis")        # records the size, raises PromptTooLarge
+    fit_items(work_done, 2000, MODEL_ID)                      # shrink a list of inputs into a budget
+    StepContext(count_tokens=token_counter(MODEL_ID))
+
+    preload_tokenizers([MODEL_ID])                            # at startup: may download the tokenizer
+
+- the family comes from the model id (``FAMILIES``: Llama 3, GPT-4o / gpt-oss,
+  GPT-4, Mistral, Gemma); its tokenizer is tiktoken or Hugging Face
+  ``tokenizers``
+- loading a tokenizer can download it, so it is never done on the request
+  path: ``preload_tokenizers`` loads them at startup; a count that finds its
+  tokenizer missing starts loading it in a background thread and estimates
+  meanwhile. A failed load (offline, package missing) is retried after
+  ``RETRY_AFTER`` seconds, it is not remembered for the life of the process
+- without a tokenizer, or for an unknown family, counts fall back to a
+  per-family characters-per-token estimate; ``counter_name`` says which
+  (``CHEFKIT_TOKENIZERS=0`` never loads tokenizers)
+- ``prompt_sizes`` keeps a histogram of prompt sizes per call site;
+  ``prompt_sizes.report_stats()`` sends it to the current Langfuse trace
+"""
+
+import fnmatch
+import functools
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from chefkit.context import TRUNCATED, summarize
+from chefkit.lazy import report_metadata
+
+# (model id pattern, family, tokenizer, characters per token when it cannot be loaded)
+FAMILIES = [
+    ("*llama-3*", "llama3", "hf:Xenova/llama-3-tokenizer", 3.6),
+    ("*llama3*", "llama3", "hf:Xenova/llama-3-tokenizer", 3.6),
+    ("*gpt-oss*", "o200k", "tiktoken:o200k_base", 4.0),
+    ("*gpt-4o*", "o200k", "tiktoken:o200k_base", 4.0),
+    ("*gpt-4*", "cl100k", "tiktoken:cl100k_base", 3.8),
+    ("*gpt-3.5*", "cl100k", "tiktoken:cl100k_base", 3.8),
+    ("*mixtral*", "mistral", "hf:Xenova/mistral-tokenizer-v1", 3.3),
+    ("*mistral*", "mistral", "hf:Xenova/mistral-tokenizer-v1", 3.3),
+    ("*gemma*", "gemma", "hf:Xenova/gemma-tokenizer", 3.8),
+]
+DEFAULT_FAMILY = ("default", None, 3.5)
+
+# Context windows (tokens), for check_prompt
+CONTEXT_WINDOWS = {
+    "*llama-3.1-8b-instant*": 131_072,
+    "*llama-3.3-70b*": 131_072,
+    "*gpt-oss*": 131_072,
+    "*gpt-4o*": 128_000,
+}
+DEFAULT_CONTEXT_WINDOW = 8_192
+MESSAGE_OVERHEAD = 4  # role and separators, per message
+RETRY_AFTER = 60.0    # seconds before loading a tokenizer again after a failure
+
+_tokenizers = {}   # spec -> _Tokenizer (loaded ones only)
+_failed = {}       # spec -> time of the last failed load
+_loading = set()
+_lock = threading.Lock()
+
+
+class PromptTooLarge(ValueError):
+    pass
+
+
+# =============================================================================
+# TOKENIZERS
+# =============================================================================
+
+@functools.lru_cache(maxsize=None)
+def model_family(model_id: str = None) -> tuple:
+    """(family, tokenizer spec, characters per token) of a model id."""
+    model_id = (model_id or "").lower()
+    for pattern, family, spec, ratio in FAMILIES:
+        if fnmatch.fnmatch(model_id, pattern):
+            return family, spec, ratio
+    return DEFAULT_FAMILY
+
+
+class _Tokenizer:
+    def __init__(self, encode, decode, name: str):
+        self.encode = encode
+        self.decode = decode
+        self.name = name
+
+
+def _enabled(spec: str) -> bool:
+    return bool(spec) and os.getenv("CHEFKIT_TOKENIZERS", "1") != "0"
+
+
+def _load(spec: str) -> _Tokenizer:
+    kind, name = spec.split(":", 1)
+    if kind == "tiktoken":
+        import tiktoken
+        encoding = tiktoken.get_encoding(name)
+        return _Tokenizer(lambda text: encoding.encode(text, disallowed_special=()), encoding.decode, spec)
+    if kind == "hf":
+        from tokenizers import Tokenizer
+        tokenizer = Tokenizer.from_pretrained(name)
+        return _Tokenizer(lambda text: tokenizer.encode(text, add_special_tokens=False).ids,
+                          tokenizer.decode, spec)
+    raise ValueError(f"Unknown tokenizer spec: {spec}")
+
+
+def load_tokenizer(spec: str):
+    """The tokenizer for "tiktoken:<encoding>" or "hf:<repo>", loaded now (may download), or None.
+
+    Loaded tokenizers are kept; failures are not (the next call tries again).
+    """
+    if not _enabled(spec):
+        return None
+    with _lock:
+        if spec in _tokenizers:
+            return _tokenizers[spec]
+    try:
+        tokenizer = _load(spec)
+    except Exception:
+        with _lock:
+            _failed[spec] = time.monotonic()
+        return None
+    with _lock:
+        _failed.pop(spec, None)
+        return _tokenizers.setdefault(spec, tokenizer)
+
+
+def _load_in_background(spec: str):
+    with _lock:
+        if spec in _loading or time.monotonic() - _failed.get(spec, -RETRY_AFTER) < RETRY_AFTER:
+            return
+        _loading.add(spec)
+
+    def load():
+        try:
+            load_tokenizer(spec)
+        finally:
+            with _lock:
+                _loading.discard(spec)
+
+    threading.Thread(target=load, name=f"tokenizer {spec}", daemon=True).start()
+
+
+def preload_tokenizers(model_ids) -> dict:
+    """Load the tokenizers of `model_ids` (at startup, off the request path): {model_id: counter_name}."""
+    for model_id in model_ids:
+        load_tokenizer(model_family(model_id)[1])
+    return {model_id: counter_name(model_id) for model_id in model_ids}
+
+
+def tokenizer_for(model_id: str = None):
+    """`model_id`'s tokenizer if loaded; otherwise None, and it starts loading in the background."""
+    spec = model_family(model_id)[1]
+    tokenizer = _tokenizers.get(spec) if spec else None
+    if tokenizer is None and _enabled(spec):
+        _load_in_background(spec)
+    return tokenizer
+
+
+def counter_name(model_id: str = None) -> str:
+    """What count_tokens uses for `model_id`: the tokenizer spec, or "estimate"."""
+    tokenizer = tokenizer_for(model_id)
+    return tokenizer.name if tokenizer else "estimate"
+
+
+# =============================================================================
+# COUNTING
+# =============================================================================
+
+def count_tokens(text: str, model_id: str = None) -> int:
+    """Tokens of `text` for `model_id`'s tokenizer (estimate if it is not available)."""
+    if not text:
+        return 0
+    tokenizer = tokenizer_for(model_id)
+    if tokenizer is not None:
+        return len(tokenizer.encode(text))
+    return math.ceil(len(text) / model_family(model_id)[2])
+
+
+def token_counter(model_id: str = None):
+    """A (text -> int) counter for `model_id`, e.g. for StepContext(count_tokens=...)."""
+    return functools.partial(count_tokens, model_id=model_id)
+
+
+def _content_text(content) -> str:
+    if isinstance(content, list):  # [{"type": "text", "text": ...}, ...]
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def count_messages(messages: list, model_id: str = None) -> int:
+    """Prompt tokens of chat messages (dicts or objects with role / content)."""
+    total = 3  # reply priming
+    for message in messages:
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+        total += MESSAGE_OVERHEAD + count_tokens(_content_text(content), model_id)
+    return total
+
+
+def context_window(model_id: str = None) -> int:
+    model_id = (model_id or "").lower()
+    for pattern, size in CONTEXT_WINDOWS.items():
+        if fnmatch.fnmatch(model_id, pattern):
+            return size
+    return DEFAULT_CONTEXT_WINDOW
+
+
+# =============================================================================
+# FITTING INPUTS
+# =============================================================================
+
+def truncate(text: str, max_tokens: int, model_id: str = None) -> str:
+    """`text` cut to `max_tokens` tokens, the " […]" marker included."""
+    if count_tokens(text, model_id) <= max_tokens:
+        return text
+    keep = max_tokens - count_tokens(TRUNCATED, model_id)
+    if keep < 0:
+        return ""
+    tokenizer = tokenizer_for(model_id)
+    if tokenizer is None:
+        return text[:int(keep * model_family(model_id)[2])] + TRUNCATED
+    tokens = tokenizer.encode(text)
+    cut = tokenizer.decode(tokens[:keep]) + TRUNCATED
+    while keep > 0 and count_tokens(cut, model_id) > max_tokens:  # decoding can merge differently
+        keep -= 1
+        cut = tokenizer.decode(tokens[:keep]) + TRUNCATED
+    return cut
+
+
+def fit(text: str, max_tokens: int, model_id: str = None, summary: bool = False) -> str:
+    """`text` within `max_tokens`: cut, or with `summary` its first sentences (chefkit.context.summarize)."""
+    if summary:
+        return summarize(text, max_tokens, token_counter(model_id),
+                         cut=functools.partial(truncate, model_id=model_id))
+    return truncate(text, max_tokens, model_id)
+
+
+def fit_items(items, max_tokens: int, model_id: str = None, summary: bool = True) -> list:
+    """Texts of `items` within `max_tokens` together.
+
+    Short items are kept whole; the budget they leave is shared equally by the
+    long ones, so one long item never crowds out the others. The total never
+    exceeds `max_tokens` (truncation markers included).
+    """
+    texts = [str(item) for item in items]
+    sizes = [count_tokens(text, model_id) for text in texts]
+    budget, long = max_tokens, []
+    order = sorted(range(len(texts)), key=sizes.__getitem__)
+    for position, index in enumerate(order):
+        if sizes[index] > budget // (len(order) - position):
+            long = order[position:]  # this one and all the longer ones
+            break
+        budget -= sizes[index]
+    for index in long:
+        texts[index] = fit(texts[index], budget // len(long), model_id, summary)
+    return texts
+
+
+# =============================================================================
+# PROMPT SIZES PER CALL SITE
+# =============================================================================
+
+class PromptSizes:
+    """Prompt sizes (tokens) per call site: power-of-two histogram, percentiles of the last calls."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def record(self, site: str, tokens: int):
+        bucket = 1 << max(tokens - 1, 0).bit_length()  # smallest power of two >= tokens
+        with self._lock:
+            s = self._sites.setdefault(site, {"calls": 0, "tokens": 0, "max": 0, "buckets": {},
+                                              "recent": deque(maxlen=self.window)})
+            s["calls"] += 1
+            s["tokens"] += tokens
+            s["max"] = max(s["max"], tokens)
+            s["buckets"][bucket] = s["buckets"].get(bucket, 0) + 1
+            s["recent"].append(tokens)
+
+    def stats(self) -> dict:
+        with self._lock:
+            sites = {site: dict(s, recent=sorted(s["recent"]), buckets=dict(s["buckets"]))
+                     for site, s in self._sites.items()}
+        return {
+            site: {
+                "calls": s["calls"],
+                "mean": round(s["tokens"] / s["calls"]),
+                "p50": s["recent"][len(s["recent"]) // 2],
+                "p95": s["recent"][min(len(s["recent"]) - 1, int(0.95 * len(s["recent"])))],
+                "max": s["max"],
+                "histogram": {f"<={b}": n for b, n in sorted(s["buckets"].items())},
+            }
+            for site, s in sites.items()
+        }
+
+    def format(self, width: int = 30) -> str:
+        lines = []
+        for site, s in self.stats().items():
+            lines.append(f"{site}: {s['calls']} calls, p50 {s['p50']} / p95 {s['p95']} / max {s['max']} tokens")
+            top = max(s["histogram"].values())
+            for bucket, n in s["histogram"].items():
+                lines.append(f"  {bucket:>8} {'#' * max(1, n * width // top)} {n}")
+        return "\n".join(lines)
+
+    def report_stats(self) -> dict:
+        """Attach the prompt size stats to the current Langfuse trace (if any)."""
+        stats = self.stats()
+        report_metadata("prompt_sizes", stats)
+        return stats
+
+    def reset(self):
+        with self._lock:
+            self._sites.clear()
+
+
+prompt_sizes = PromptSizes()
+
+
+def check_prompt(messages, model_id: str = None, site: str = "default", max_tokens: int = None,
+                 reserve: int = 1024, sizes: PromptSizes = prompt_sizes) -> int:
+    """Count and record a prompt before sending it.
+
+    Args:
+        messages: Chat messages, or a prompt string.
+        site: Call site name, for the size histogram.
+        max_tokens: Prompt limit; default: the model's context window minus `reserve`.
+        reserve: Tokens left for the answer.
+
+    Raises:
+        PromptTooLarge: If the prompt is over the limit (nothing is sent, no API error).
+    """
+    tokens = count_tokens(messages, model_id) if isinstance(messages, str) else count_messages(messages, model_id)
+    sizes.record(site, tokens)
+    limit = max_tokens if max_tokens is not None else context_window(model_id) - reserve
+    if tokens > limit:
+        raise PromptTooLarge(f"{site}: prompt of {tokens} tokens for {model_id}, limit {limit}")
+    return tokens
@@ -0,0 +1,281 @@
+"""
+Tracing Policy
+==============
+``@observe()`` on every pipeline function sends every span, with its full
+input and output (whole menus, agent memories), to Langfuse. Fine for a demo,
+too much at production traffic. ``init_tracing`` builds the Langfuse client
+with a policy:
+
+- head sampling: a rate per trace name, decided when the root span starts;
+  a dropped trace is never recorded (no overhead at all)
+- tail sampling: a rate per trace name, decided when the root span ends; the
+  spans are buffered until then, and a trace with an error
+  (``level="ERROR"`` or an exception) is always kept
+- payloads: long strings and long lists / dicts are truncated before
+  serialization, and every span attribute is capped at ``max_bytes``
+- export: batched in a background thread, bounded queue (spans are dropped,
+  never blocking the request, when Langfuse is slower than the traffic)
+
+    langfuse = init_tracing(TracingPolicy(
+        head_rates={"*": 1.0},
+        tail_rates={"*": 0.1, "Planification Menu Hebdomadaire": 0.5},
+    ))
+    ...                       # @observe() functions, get_client() as before
+    policy.stats()
+
+Must run before the first ``get_client()``: the first client created owns the
+tracer. Rates match trace names exactly or with wildcards ("chefbot-*"),
+"*" being the default. Errors are only kept among head-sampled traces: keep
+head rates at 1 and lower the tail rates to never miss one.
+
+Environment (``TracingPolicy.from_env``): CHEFKIT_TRACE_HEAD="*=1",
+CHEFKIT_TRACE_TAIL="*=0.1,ask_chef=1", CHEFKIT_TRACE_MAX_CHARS,
+CHEFKIT_TRACE_MAX_BYTES, CHEFKIT_TRACE_QUEUE, CHEFKIT_TRACE_KEEP_ERRORS.
+"""
+
+import fnmatch
+import os
+import threading
+from collections import OrderedDict
+
+from chefkit.lazy import deferred, module_getattr
+
+LEVEL_ATTRIBUTE = "langfuse.observation.level"
+_MASK_64 = (1 << 64) - 1
+
+
+def parse_rates(text: str) -> dict:
+    """'*=0.1,ask_chef=1' -> {"*": 0.1, "ask_chef": 1.0}."""
+    rates = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, rate = part.rpartition("=")
+        rates[name.strip() or "*"] = float(rate)
+    return rates
+
+
+def truncate_payload(data, max_chars: int = 2000, max_items: int = 50, depth: int = 6):
+    """Copy of `data` with long strings / lists / dicts cut, as a Langfuse mask."""
+    if isinstance(data, str):
+        return data if len(data) <= max_chars else f"{data[:max_chars]}… [+{len(data) - max_chars} chars]"
+    if isinstance(data, dict):
+        if depth == 0:
+            return f"{{… {len(data)} keys}}"
+        out = {str(k): truncate_payload(v, max_chars, max_items, depth - 1)
+               for k, v in list(data.items())[:max_items]}
+        if len(data) > max_items:
+            out["…"] = f"+{len(data) - max_items} keys"
+        return out
+    if isinstance(data, (list, tuple)):
+        if depth == 0:
+            return f"[… {len(data)} items]"
+        out = [truncate_payload(v, max_chars, max_items, depth - 1) for v in data[:max_items]]
+        if len(data) > max_items:
+            out.append(f"… +{len(data) - max_items} items")
+        return out
+    return data
+
+
+class TracingPolicy:
+    def __init__(self, head_rates: dict = None, tail_rates: dict = None, keep_errors: bool = True,
+                 max_chars: int = 2000, max_items: int = 50, max_bytes: int = 32_000,
+                 queue_size: int = 2048, flush_at: int = 256, flush_interval: float = 2.0,
+                 max_pending_traces: int = 1000):
+        """
+        Args:
+            head_rates / tail_rates: Trace name (or pattern, "*" = default) -> rate in [0, 1].
+            keep_errors: Tail sampling always keeps traces with an error.
+            max_chars, max_items: Truncation of strings / lists and dicts in inputs, outputs, metadata.
+            max_bytes: Hard cap on any serialized span attribute.
+            queue_size: Spans waiting for export before new ones are dropped.
+            flush_at, flush_interval: Export batch size / max delay (seconds).
+            max_pending_traces: Traces buffered for the tail decision (oldest dropped first).
+        """
+        self.head_rates = head_rates or {"*": 1.0}
+        self.tail_rates = tail_rates or {"*": 1.0}
+        self.keep_errors = keep_errors
+        self.max_chars = max_chars
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.queue_size = queue_size
+        self.flush_at = flush_at
+        self.flush_interval = flush_interval
+        self.max_pending_traces = max_pending_traces
+        self._rate_cache = {}
+        self._lock = threading.Lock()
+        self._stats = {"head_sampled": 0, "head_dropped": 0, "tail_kept": 0, "tail_dropped": 0,
+                       "errors_kept": 0, "evicted": 0}
+
+    @classmethod
+    def from_env(cls, **overrides) -> "TracingPolicy":
+        env = os.environ
+        kwargs = {
+            "head_rates": parse_rates(env.get("CHEFKIT_TRACE_HEAD", "*=1")),
+            "tail_rates": parse_rates(env.get("CHEFKIT_TRACE_TAIL", "*=1")),
+            "keep_errors": env.get("CHEFKIT_TRACE_KEEP_ERRORS", "1").lower() not in ("0", "false", "no"),
+            "max_chars": int(env.get("CHEFKIT_TRACE_MAX_CHARS", 2000)),
+            "max_bytes": int(env.get("CHEFKIT_TRACE_MAX_BYTES", 32_000)),
+            "queue_size": int(env.get("CHEFKIT_TRACE_QUEUE", 2048)),
+        }
+        return cls(**{**kwargs, **overrides})
+
+    def rate(self, rates: dict, name: str) -> float:
+        key = (id(rates), name)
+        rate = self._rate_cache.get(key)
+        if rate is None:
+            rate = rates.get(name)
+            if rate is None:
+                patterns = [p for p in rates if p != "*" and fnmatch.fnmatchcase(name, p)]
+                rate = rates[max(patterns, key=len)] if patterns else rates.get("*", 1.0)
+            if len(self._rate_cache) < 10_000:  # span names are a small set; don't grow on garbage
+                self._rate_cache[key] = rate
+        return rate
+
+    @property
+    def tail_sampling(self) -> bool:
+        return any(rate < 1 for rate in self.tail_rates.values())
+
+    def mask(self, *, data, **kwargs):
+        return truncate_payload(data, self.max_chars, self.max_items)
+
+    def count(self, key: str, n: int = 1):
+        with self._lock:
+            self._stats[key] += n
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+@deferred
+def _policy_sampler():
+    from opentelemetry import trace as otel_trace
+    from opentelemetry.sdk.trace.sampling import Decision, Sampler, SamplingResult
+
+    class PolicySampler(Sampler):
+        """Head sampling: root spans by trace name, child spans follow their parent."""
+
+        def __init__(self, policy: TracingPolicy):
+            self.policy = policy
+
+        def should_sample(self, parent_context, trace_id, name, kind=None, attributes=None, links=None,
+                          trace_state=None):
+            parent = otel_trace.get_current_span(parent_context).get_span_context()
+            if parent.is_valid:
+                sampled = parent.trace_flags.sampled
+            else:
+                # Langfuse also asks with name="score" for scores: they follow the default rate
+                rate = self.policy.rate(self.policy.head_rates, name)
+                sampled = (trace_id & _MASK_64) < rate * _MASK_64
+                self.policy.count("head_sampled" if sampled else "head_dropped")
+            decision = Decision.RECORD_AND_SAMPLE if sampled else Decision.DROP
+            return SamplingResult(decision, attributes if sampled else None, trace_state)
+
+        def get_description(self) -> str:
+            return "ChefkitPolicySampler"
+    return PolicySampler
+
+
+def _is_error(span) -> bool:
+    from opentelemetry.trace import StatusCode
+    return (span.attributes or {}).get(LEVEL_ATTRIBUTE) == "ERROR" or span.status.status_code == StatusCode.ERROR
+
+
+@deferred
+def _tail_sampler():
+    from opentelemetry.sdk.trace import SpanProcessor
+
+    class TailSampler(SpanProcessor):
+        """Buffers the spans of each trace and forwards them to `processor` if the trace is kept."""
+
+        def __init__(self, processor: SpanProcessor, policy: TracingPolicy):
+            self.processor = processor
+            self.policy = policy
+            self._pending = OrderedDict()  # trace_id -> [spans, has_error]
+            self._lock = threading.Lock()
+
+        def on_start(self, span, parent_context=None):
+            self.processor.on_start(span, parent_context=parent_context)
+
+        def on_end(self, span):
+            trace_id = span.context.trace_id
+            with self._lock:
+                entry = self._pending.get(trace_id)
+                if entry is None:
+                    entry = self._pending[trace_id] = [[], False]
+                    if len(self._pending) > self.policy.max_pending_traces:
+                        self._pending.popitem(last=False)
+                        self.policy.count("evicted")
+                entry[0].append(span)
+                entry[1] = entry[1] or _is_error(span)
+                if span.parent is not None and not span.parent.is_remote:
+                    return  # wait for the root span
+                spans, has_error = self._pending.pop(trace_id)
+
+            # Independent of the head decision, which used the low 64 bits
+            keep = (has_error and self.policy.keep_errors) or \
+                (trace_id >> 64) < self.policy.rate(self.policy.tail_rates, span.name) * _MASK_64
+            if keep:
+                self.policy.count("errors_kept" if has_error else "tail_kept")
+                for buffered in spans:
+                    self.processor.on_end(buffered)
+            else:
+                self.policy.count("tail_dropped")
+
+        def shutdown(self):
+            self.processor.shutdown()
+
+        def force_flush(self, timeout_millis: int = 30000) -> bool:
+            return self.processor.force_flush(timeout_millis)
+    return TailSampler
+
+
+@deferred
+def _tail_sampling_processors():
+    from opentelemetry.sdk.trace import SpanProcessor, SynchronousMultiSpanProcessor
+
+    class _TailSamplingProcessors(SynchronousMultiSpanProcessor):
+        """Wraps every processor added to the provider (the Langfuse exporter) in a TailSampler."""
+
+        def __init__(self, policy: TracingPolicy):
+            super().__init__()
+            self.policy = policy
+
+        def add_span_processor(self, span_processor: SpanProcessor):
+            super().add_span_processor(_tail_sampler()(span_processor, self.policy))
+    return _TailSamplingProcessors
+
+
+__getattr__ = module_getattr(__name__, PolicySampler=_policy_sampler, TailSampler=_tail_sampler)
+
+
+def init_tracing(policy: TracingPolicy = None, **langfuse_kwargs):
+    """The Langfuse client, with sampling / truncation / export following `policy`."""
+    from langfuse import Langfuse
+    from opentelemetry import trace as otel_trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import SpanLimits, TracerProvider
+
+    policy = policy or TracingPolicy.from_env()
+    # Read by OpenTelemetry's BatchSpanProcessor, which the Langfuse exporter is built on
+    os.environ["OTEL_BSP_MAX_QUEUE_SIZE"] = str(policy.queue_size)
+
+    resource = {
+        "langfuse.environment": os.getenv("LANGFUSE_TRACING_ENVIRONMENT"),
+        "langfuse.release": os.getenv("LANGFUSE_RELEASE"),
+    }
+    provider = TracerProvider(
+        resource=Resource.create({k: v for k, v in resource.items() if v}),
+        sampler=_policy_sampler()(policy),
+        span_limits=SpanLimits(max_span_attribute_length=policy.max_bytes),
+        active_span_processor=_tail_sampling_processors()(policy) if policy.tail_sampling else None,
+    )
+    if isinstance(otel_trace.get_tracer_provider(), otel_trace.ProxyTracerProvider):
+        otel_trace.set_tracer_provider(provider)
+
+    return Langfuse(
+        tracer_provider=provider,
+        mask=policy.mask,
+        flush_at=policy.flush_at,
+        flush_interval=policy.flush_interval,
+        **langfuse_kwargs,
+    )
@@ -0,0 +1,228 @@
+"""
+Agent Transcript Analytics
+==========================
+Run transcripts (run_partie_5.txt and the files written by ``RunLog``) hold
+step counts, durations and token usage, but inside Rich boxes that nobody
+reads once there are hundreds of them. ``parse_transcript`` turns a
+transcript into step records, line by line (constant memory, .gz accepted),
+and ``summarize`` builds the per-file aggregates:
+
+    steps = list(parse_transcript("run_partie_5.txt"))
+    summarize(steps)   # runs, steps, tool calls, tokens, time per step (p50 / p95 / max)
+
+    python -m chefkit.transcripts run_partie_5.txt runs/          # one row per file
+    python -m chefkit.transcripts runs/ --slowest 10              # + the 10 slowest steps
+    python -m chefkit.transcripts runs/ --json > runs.json
+
+What a step record holds comes from smolagents' console output:
+
+- "━━ Step N ━━" starts a step, "[Step M: Duration 1.72 seconds| Input tokens:
+  2,711 | Output tokens: 445]" ends it; the token counts there are totals
+  since the agent's last reset, so per-step tokens are the differences
+- tool calls: "Calling tool: 'name'" (ToolCallingAgent), or the functions
+  called in the "Executing parsed code" box (CodeAgent), minus Python builtins
+- errors: lines starting with "Error" or "Code execution failed" inside the step
+
+``*.events.jsonl`` files (``RunLog`` step events) are read directly.
+"""
+
+import builtins
+import gzip
+import json
+import keyword
+import re
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+_ANSI = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+_NEW_RUN = re.compile(r"^╭─+ New run")
+_STEP = re.compile(r"^━+ Step (\d+) ━+$")
+_PLAN = re.compile(r"^─+ (Initial|Updated) plan ─+$")
+_FOOTER = re.compile(r"^\[Step (\d+): Duration ([\d.]+) seconds"
+                     r"(?:\| Input tokens: ([\d,]+) \| Output tokens: ([\d,]+))?\]")
+_CALLING_TOOL = re.compile(r"Calling tool: '([^']+)'")
+_CALL = re.compile(r"(?<![\w.])([A-Za-z_]\w*)\s*\(")
+_ERROR = re.compile(r"^(Error|Code execution failed|AgentExecutionError|AgentGenerationError)")
+_NOT_TOOLS = set(dir(builtins)) | set(keyword.kwlist)
+
+
+@dataclass
+class TranscriptStep:
+    source: str
+    run: int
+    step: int
+    duration: float = None
+    input_tokens: int = None
+    output_tokens: int = None
+    tool_calls: list = field(default_factory=list)
+    error: bool = False
+    final: bool = False
+    code: str = ""  # first line of the executed code, to recognise the step
+
+
+def _open(path: Path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+def _events(path: Path):
+    run = 0
+    with _open(path) as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if event.get("event") == "step":
+                if event.get("step") == 1:
+                    run += 1
+                yield TranscriptStep(
+                    str(path), max(run, 1), event.get("step") or 0, event.get("duration"),
+                    event.get("input_tokens"), event.get("output_tokens"), event.get("tool_calls") or [],
+                    bool(event.get("error")), bool(event.get("final")),
+                )
+
+
+def parse_transcript(path):
+    """Step records of a transcript (.txt, .txt.N.gz or .events.jsonl), in order."""
+    path = Path(path)
+    if ".events.jsonl" in path.name:
+        yield from _events(path)
+        return
+
+    run, current, in_code, defined = 0, None, False, set()
+    last_footer, last_in, last_out = 0, 0, 0
+    with _open(path) as f:
+        for line in f:
+            line = _ANSI.sub("", line).rstrip("\n")
+            stripped = line.strip()
+
+            if _NEW_RUN.match(line):
+                run += 1
+                continue
+            match = _STEP.match(stripped)
+            if match:
+                current = TranscriptStep(str(path), max(run, 1), int(match.group(1)))
+                in_code, defined = False, set()
+                continue
+            if current is None or _PLAN.match(stripped):
+                continue
+
+            if stripped.startswith("─ Executing parsed code:"):
+                in_code = True
+            elif in_code:
+                if stripped.startswith("──"):
+                    in_code = False
+                elif stripped:
+                    current.code = current.code or stripped
+                    defined |= set(re.findall(r"def\s+(\w+)", stripped))
+                    current.tool_calls += [name for name in _CALL.findall(stripped)
+                                           if name not in _NOT_TOOLS and name not in defined]
+            elif _CALLING_TOOL.search(stripped):
+                current.tool_calls.append(_CALLING_TOOL.search(stripped).group(1))
+            elif stripped.startswith("Final answer:"):
+                current.final = True
+            elif _ERROR.match(stripped):
+                current.error = True
+            else:
+                match = _FOOTER.match(stripped)
+                if match:
+                    footer = int(match.group(1))
+                    if footer <= last_footer or footer == 1:  # monitor reset: totals restart
+                        last_in, last_out = 0, 0
+                    last_footer = footer
+                    current.duration = float(match.group(2))
+                    if match.group(3):
+                        total_in, total_out = (int(g.replace(",", "")) for g in match.group(3, 4))
+                        current.input_tokens, current.output_tokens = total_in - last_in, total_out - last_out
+                        last_in, last_out = total_in, total_out
+                    yield current
+                    current = None
+
+
+def _percentile(values: list, q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def summarize(steps) -> dict:
+    """Aggregates over step records (usually those of one file)."""
+    steps = list(steps)
+    durations = [s.duration for s in steps if s.duration is not None]
+    tools = Counter(name for s in steps for name in s.tool_calls)
+    return {
+        "runs": len({(s.source, s.run) for s in steps}),
+        "steps": len(steps),
+        "tool_calls": sum(tools.values()),
+        "tools": dict(tools.most_common()),
+        "input_tokens": sum(s.input_tokens or 0 for s in steps),
+        "output_tokens": sum(s.output_tokens or 0 for s in steps),
+        "errors": sum(s.error for s in steps),
+        "final_answers": sum(s.final for s in steps),
+        "duration": round(sum(durations), 2),
+        "step_p50": _percentile(durations, 0.5),
+        "step_p95": _percentile(durations, 0.95),
+        "step_max": max(durations, default=None),
+    }
+
+
+def find_transcripts(paths) -> list:
+    """Files given, plus the transcripts found in the directories given."""
+    found = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            found += sorted(p for pattern in ("*.txt", "*.txt.*.gz", "*.events.jsonl") for p in path.rglob(pattern))
+        else:
+            found.append(path)
+    return found
+
+
+def _cell(value) -> str:
+    if value is None:
+        return "-"
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+
+def format_table(rows: dict) -> str:
+    """{file: summary} -> a fixed-width comparison table."""
+    columns = ["runs", "steps", "tool_calls", "input_tokens", "output_tokens", "errors",
+               "duration", "step_p50", "step_p95", "step_max"]
+    width = max([len("file")] + [len(name) for name in rows])
+    lines = ["file".ljust(width) + "".join(c.rjust(14) for c in columns)]
+    for name, summary in rows.items():
+        lines.append(name.ljust(width) + "".join(_cell(summary[c]).rjust(14) for c in columns))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare agent run transcripts")
+    parser.add_argument("paths", nargs="+", help="transcripts or directories of transcripts")
+    parser.add_argument("--slowest", type=int, default=0, help="also list the N slowest steps")
+    parser.add_argument("--json", action="store_true", help="print the summaries as JSON")
+    args = parser.parse_args()
+
+    rows, all_steps = {}, []
+    for path in find_transcripts(args.paths):
+        steps = list(parse_transcript(path))
+        if steps:
+            rows[str(path)] = summarize(steps)
+            all_steps += steps
+
+    if args.json:
+        slowest = sorted(all_steps, key=lambda s: s.duration or 0, reverse=True)[:args.slowest]
+        print(json.dumps({"files": rows, "slowest": [asdict(s) for s in slowest]}, ensure_ascii=False, indent=2))
+    else:
+        print(format_table(rows))
+        if all_steps:
+            print(f"\nAll files: {summarize(all_steps)}")
+        if args.slowest:
+            print(f"\n{args.slowest} slowest steps:")
+            for s in sorted(all_steps, key=lambda s: s.duration or 0, reverse=True)[:args.slowest]:
+                print(f"  {s.duration:8.2f}s  {s.source} run {s.run} step {s.step}  "
+                      f"tools={','.join(s.tool_calls) or '-'}  {s.code[:60]}")
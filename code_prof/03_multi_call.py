@@ -2,12 +2,31 @@ from dotenv import load_dotenv
 from groq import Groq
 from langfuse import observe, get_client, propagate_attributes
 import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # shared chefkit package
+from chefkit.context import StepContext
+from chefkit.prompts import PromptLayout, PrefixCacheStats
+from chefkit.tokens import check_prompt, fit_items, preload_tokenizers, prompt_sizes, token_counter
 
 load_dotenv()
 
 groq_client = Groq()
 langfuse = get_client()
 
+MODEL_ID = "openai/gpt-oss-120b"
+# Max tokens of step results handed to the synthesis (the longest ones are summarized)
+SYNTHESIS_BUDGET = 3000
+
+# Constant system prompt first, previous results next, the step last:
+# every step shares the prefix of the previous one (provider prompt caching)
+STEP_LAYOUT = PromptLayout(
+    "Execute the step given by the user. Use the context when relevant.",
+    context_title="Context",
+)
+prompt_cache = PrefixCacheStats()
+
 @observe()
 def multi_step_agent(task: str) -> dict:
 
@@ -21,13 +40,22 @@ def multi_step_agent(task: str) -> dict:
             plan = _plan_steps(task)
 
             # Step 2: Execute each step
+            # Each step gets the task, the results already sent (unchanged, so
+            # the prompt prefix stays cacheable) and the new one, in full or
+            # summarized, within a token budget (not every raw output)
             results = []
+            context = StepContext(budget_tokens=1500, count_tokens=token_counter(MODEL_ID))
+            context.pin(f"Task: {task}")
             for i, step in enumerate(plan["steps"]):
-                step_result = _execute_step(step, i, context=results)
+                step_result = _execute_step(step, i, context=context.select(step))
                 results.append(step_result)
+                context.add(step, step_result["output"])
+            get_client().update_current_span(metadata={"context": context.stats()})
 
             # Step 3: Synthesize final answer
             final_answer = _synthesize_answer(task, results)
+            prompt_cache.report()
+            prompt_sizes.report_stats()
 
             return {
                 "task": task,
@@ -48,7 +76,7 @@ def multi_step_agent(task: str) -> dict:
 @observe(name="planning", as_type="generation")
 def _plan_steps(task: str) -> dict:
     response = groq_client.chat.completions.create(
-        model="openai/gpt-oss-120b",
+        model=MODEL_ID,
         messages=[
             {
                 "role": "system",
@@ -76,19 +104,14 @@ def _execute_step(step: str, step_index: int, context: list) -> dict:
         metadata={"step_index": step_index, "step": step}
     )
 
-    context_str = "\n".join([f"- {r['output']}" for r in context]) if context else "None"
-
+    request = STEP_LAYOUT.request(step, context=context)
+    check_prompt(request["messages"], MODEL_ID, site="execute-step")
     response = groq_client.chat.completions.create(
-        model="openai/gpt-oss-120b",
-        messages=[
-            {
-                "role": "system",
-                "content": f"Execute this step. Previous results:\n{context_str}"
-            },
-            {"role": "user", "content": step}
-        ],
+        model=MODEL_ID,
+        **request,
         temperature=0.5
     )
+    prompt_cache.record(response)
 
     return {
         "step": step,
@@ -101,20 +124,23 @@ def _execute_step(step: str, step_index: int, context: list) -> dict:
 def _synthesize_answer(task: str, results: list) -> str:
     """Synthesize final answer from all step results."""
 
-    results_text = "\n\n".join([
+    # Every step output in full can exceed the context: fit them into a budget first
+    results_text = "\n\n".join(fit_items([
         f"Step {r['step_index'] + 1} ({r['step']}):\n{r['output']}"
         for r in results
-    ])
-
+    ], SYNTHESIS_BUDGET, MODEL_ID))
+
+    messages = [
+        {
+            "role": "system",
+            "content": "Synthesize a comprehensive answer from the step results."
+        },
+        {"role": "user", "content": f"Task: {task}\n\nResults:\n{results_text}"}
+    ]
+    check_prompt(messages, MODEL_ID, site="synthesis")
     response = groq_client.chat.completions.create(
-        model="openai/gpt-oss-120b",
-        messages=[
-            {
-                "role": "system",
-                "content": "Synthesize a comprehensive answer from the step results."
-            },
-            {"role": "user", "content": f"Task: {task}\n\nResults:\n{results_text}"}
-        ],
+        model=MODEL_ID,
+        messages=messages,
         temperature=0.3
     )
 
@@ -124,8 +150,10 @@ def _synthesize_answer(task: str, results: list) -> str:
 
 
 print("\n--- Exercise 1: Multi-step Agent ---")
+preload_tokenizers([MODEL_ID])  # load (maybe download) the tokenizer now, not inside a call
 result = multi_step_agent("Explain how to set up a Python virtual environment")
 print(result)
+print(prompt_sizes.format())
 if result['status'] == 'success':
     print(f"Plan: {result['plan']}")
     print(f"Final answer: {result['final_answer'][:200]}...")
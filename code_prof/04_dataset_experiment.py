@@ -2,9 +2,15 @@ from dotenv import load_dotenv
 from langfuse import observe, get_client, Evaluation
 from groq import Groq
 import json
+import sys
 from datetime import datetime
+from pathlib import Path
 from typing import Callable
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # shared chefkit package
+from chefkit.datasets import format_stats, upload_items
+from chefkit.journal import Journal, merge_journals, parse_shard, run_shards, shard_items
+
 load_dotenv()
 
 groq_client = Groq()
@@ -15,16 +21,10 @@ groq_client = Groq()
 # =============================================================================
 
 def create_sentiment_dataset():
-
-    dataset = get_client().create_dataset(
-        name="sentiment-benchmark-v1",
-        description="Benchmark dataset for sentiment analysis evaluation",
-        metadata={
-            "created_by": "lecture_demo",
-            "domain": "product_reviews",
-            "version": "1.0"
-        }
-    )
+    """
+    Items are uploaded concurrently in batches, and items whose content is
+    already in the dataset are skipped: running this twice is safe.
+    """
 
     test_cases = [
         {
@@ -69,16 +69,20 @@ def create_sentiment_dataset():
         },
     ]
 
-    for i, case in enumerate(test_cases):
-        get_client().create_dataset_item(
-            dataset_name="sentiment-benchmark-v1",
-            input=case["input"],
-            expected_output=case["expected_output"],
-            metadata=case["metadata"],
-        )
+    stats = upload_items(
+        get_client(),
+        "sentiment-benchmark-v1",
+        test_cases,
+        description="Benchmark dataset for sentiment analysis evaluation",
+        metadata={
+            "created_by": "lecture_demo",
+            "domain": "product_reviews",
+            "version": "1.0"
+        },
+    )
 
-    print(f"✓ Created dataset with {len(test_cases)} test cases")
-    return dataset
+    print(f"✓ Dataset sentiment-benchmark-v1: {format_stats(stats)}")
+    return stats
 
 
 # =============================================================================
@@ -141,23 +145,37 @@ def run_experiment_manual(
     task_fn: Callable,
     evaluator_fn: Callable,
     experiment_name: str,
-    experiment_config: dict = None
+    experiment_config: dict = None,
+    shard: tuple = (0, 1),
 ):
     """
     Run an experiment manually - useful for understanding the flow.
     For production, use get_client().run_experiment() (shown next).
+
+    Each item's output and scores are appended to a JSONL journal
+    (experiments/<experiment_name>/): re-running the same experiment skips
+    the items already scored, so a crash or a rate-limit storm only costs
+    the items in flight. With shard=(i, N) this process only runs its share
+    of the dataset; merge the shards with merge_journals().
     """
 
     # Get dataset
     dataset = get_client().get_dataset(dataset_name)
+    items = shard_items(dataset.items, *shard, key=lambda item: item.id)
+    journal = Journal.for_run(experiment_name, shard=shard)
 
     print(f"\nRunning experiment: {experiment_name}")
-    print(f"Dataset: {dataset_name} ({len(dataset.items)} items)")
+    print(f"Dataset: {dataset_name} ({len(items)}/{len(dataset.items)} items, shard {shard[0]}/{shard[1]})")
     print("-" * 50)
 
     results = []
 
-    for item in dataset.items:
+    for item in items:
+        if journal.is_done(item.id):
+            results.append(journal.records[item.id])
+            print(f"  = Item {item.id[:8]}: already in journal")
+            continue
+
         # V3 pattern: use item.run() as context manager which creates a root span
         with item.run(
             run_name=experiment_name,
@@ -178,21 +196,23 @@ def run_experiment_manual(
                         comment=f"Automated evaluation for {experiment_name}"
                     )
 
-                results.append({
-                    "item_id": item.id,
-                    "output": output,
-                    "scores": scores,
-                    "status": "success"
-                })
+                results.append(journal.append(
+                    item.id,
+                    status="success",
+                    item_id=item.id,
+                    output=output,
+                    scores=scores,
+                ))
 
                 print(f"  ✓ Item {item.id[:8]}: {scores}")
 
             except Exception as e:
-                results.append({
-                    "item_id": item.id,
-                    "error": str(e),
-                    "status": "error"
-                })
+                results.append(journal.append(
+                    item.id,
+                    status="error",
+                    item_id=item.id,
+                    error=str(e),
+                ))
                 print(f"  ✗ Item {item.id[:8]}: {e}")
 
     # Summary
@@ -289,6 +309,31 @@ def compare_models():
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Datasets & experiments demo")
+    parser.add_argument("--shard", type=parse_shard, help="run only shard i/N of the manual experiment")
+    parser.add_argument("--workers", type=int, default=1, help="split the manual experiment across N processes")
+    args = parser.parse_args()
+
+    if args.shard or args.workers > 1:
+        # Sharded manual experiment only: python code_prof/04_dataset_experiment.py --workers 4
+        if args.workers > 1:
+            run_shards(__file__, args.workers)
+            merged = merge_journals(Journal.for_run("demo-experiment").path.parent)
+            print(f"Merged {len(merged)} items")
+        else:
+            run_experiment_manual(
+                dataset_name="sentiment-benchmark-v1",
+                task_fn=sentiment_task,
+                evaluator_fn=simple_evaluator,
+                experiment_name="demo-experiment",
+                experiment_config={"model": "openai/gpt-oss-120b"},
+                shard=args.shard,
+            )
+            get_client().flush()
+        sys.exit(0)
+
     print("=" * 60)
     print("DATASETS & EXPERIMENTS DEMO")
     print("=" * 60)
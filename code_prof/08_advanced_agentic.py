@@ -7,16 +7,23 @@ Prerequisites:
 
 Building on 07, this file covers:
 - Custom Tool class (vs @tool decorator)
-- Agent with planning (periodic re-planning between steps)
+- Agent with planning (adaptive re-planning + verifier early exit)
 - Agent with custom instructions
 - Conversational agent (memory across turns)
 """
 
+import sys
+from pathlib import Path
+
 from dotenv import load_dotenv
 from smolagents import CodeAgent, LiteLLMModel, tool, Tool, WebSearchTool
 from langfuse import observe, get_client
 import litellm
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # shared chefkit package
+from chefkit.cache import lower_arg, memoize_tool, report_cache_stats, strip_arg
+from chefkit.planning import FAILURE_SIGNALS, AdaptivePlanningAgent
+
 load_dotenv()
 
 # --- Langfuse tracing for LiteLLM (v3 — OpenTelemetry) ---
@@ -57,6 +64,9 @@ class DatabaseLookupTool(Tool):
             "headphones": {"price": 149.99, "stock": 67},
         }
 
+    # Pure lookup: the agent often asks for the same product at several steps.
+    # Keyed like the lookup below (.lower().strip()): "Laptop " and "laptop" share an entry
+    @memoize_tool(ttl=300, name="database_lookup", normalize=lambda v: strip_arg(lower_arg(v)))
     def forward(self, product_name: str) -> str:
         product_name = product_name.lower().strip()
         product = self.products.get(product_name)
@@ -84,28 +94,58 @@ def calculate(expression: str) -> str:
 # AGENT WITH PLANNING
 # =============================================================================
 
+SHOPPING_LIST = {"laptop": 2, "keyboard": 3}
+
+
+def verify_order_total(candidate, products: dict):
+    """
+    Deterministic check of the agent's candidate answer (no LLM call).
+    Returns None (not a candidate yet), True (accepted) or the reason it is wrong.
+    """
+    if not isinstance(candidate, dict) or "total" not in candidate:
+        return None
+    expected = sum(products[name]["price"] * qty for name, qty in SHOPPING_LIST.items())
+    try:
+        total = float(candidate["total"])
+    except (TypeError, ValueError):
+        return f"total {candidate['total']!r} is not a number"
+    if abs(total - expected) > 0.01:
+        return f"total {total} does not match the prices in the database"
+    return True
+
+
 @observe()
 def run_planning_agent():
     """
     planning_interval=2 makes the agent pause every 2 steps to:
     - Reflect on what it knows so far
     - Update its plan for remaining steps
-    This helps on complex, multi-step tasks.
+    Re-planning on a fixed schedule costs an LLM call even when the plan is
+    on track. AdaptivePlanningAgent plans once, re-plans only when a tool
+    call fails or the verifier rejects a candidate, and
+    returns as soon as the verifier accepts one.
     """
 
-    agent = CodeAgent(
-        tools=[DatabaseLookupTool(), calculate],
+    lookup = DatabaseLookupTool()
+    agent = AdaptivePlanningAgent(
+        tools=[lookup, calculate],
         model=model,
-        planning_interval=2,  # Re-plan every 2 steps
+        verifier=lambda candidate: verify_order_total(candidate, lookup.products),
+        # What our tools answer when they fail ("Product 'x' not found...", "Error: ...")
+        failure_signals=FAILURE_SIGNALS + ("Product '",),
+        max_plan_age=4,  # still re-plan at least every 4 steps
         max_steps=8,
     )
 
     result = agent.run(
         "I want to buy 2 laptops and 3 keyboards. "
-        "Look up each product, then calculate the total cost."
+        "Look up each product, then calculate the total cost. "
+        "When you have it, end your code with a dict: {'laptop': 2, 'keyboard': 3, 'total': <total>}."
     )
 
     print(f"Result: {result}")
+    print(f"Planning: {agent.plan_stats}")
+    report_cache_stats()
     return result
 
 
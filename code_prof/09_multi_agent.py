@@ -11,11 +11,17 @@ to specialized worker agents, each with their own tools and memory.
 Pattern: Manager → [Research Agent, Analysis Agent]
 """
 
+import sys
+from pathlib import Path
+
 from dotenv import load_dotenv
 from smolagents import CodeAgent, LiteLLMModel, tool, WebSearchTool, VisitWebpageTool
 from langfuse import observe, get_client
 import litellm
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # shared chefkit package
+from chefkit.budget import RunBudget, apply_budget
+
 load_dotenv()
 
 # --- Langfuse tracing (v3 — OpenTelemetry) ---
@@ -191,22 +197,36 @@ def build_simple_multi_agent():
 # RUN — @observe() wraps agent.run() so all LLM calls nest under one trace
 # =============================================================================
 
+# max_steps only bounds each agent on its own; one budget covers the whole
+# manager/worker tree. When it runs out, every agent answers with what it has.
+def run_budget() -> RunBudget:
+    return RunBudget(max_llm_calls=15, max_tokens=100_000, max_seconds=120)
+
+
 @observe()
 def run_simple_multi_agent():
     manager = build_simple_multi_agent()
-    return manager.run(
+    budget = run_budget()
+    apply_budget(manager, budget)
+    result = manager.run(
         "Get the reviews for 'laptop', analyze the overall sentiment, "
         "and give me a summary of the key points."
     )
+    print(f"Budget used: {budget.report_stats()}")
+    return result
 
 
 @observe()
 def run_full_multi_agent():
     manager = build_multi_agent_system()
-    return manager.run(
+    budget = run_budget()
+    apply_budget(manager, budget)
+    result = manager.run(
         "Research the pros and cons of electric vehicles in 2025, "
         "then analyze the overall sentiment and summarize the key points."
     )
+    print(f"Budget used: {budget.report_stats()}")
+    return result
 
 if __name__ == "__main__":
     print("=" * 60)
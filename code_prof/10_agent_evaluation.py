@@ -14,6 +14,9 @@ Builds on:
 - 07-08 (smolagents)
 """
 
+import sys
+from pathlib import Path
+
 from dotenv import load_dotenv
 from smolagents import CodeAgent, LiteLLMModel, tool
 from langfuse import observe, get_client, Evaluation
@@ -22,6 +25,10 @@ import litellm
 import json
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # shared chefkit package
+from chefkit.cache import lower_arg, memoize_tool, report_cache_stats
+from chefkit.datasets import format_stats, load_dataset, upload_items
+
 load_dotenv()
 
 # --- Langfuse tracing for LiteLLM (v3 — OpenTelemetry) ---
@@ -35,7 +42,10 @@ model = LiteLLMModel(model_id="groq/meta-llama/llama-4-scout-17b-16e-instruct")
 # TOOLS FOR THE AGENT UNDER TEST
 # =============================================================================
 
+# Both tools are pure lookups: results are cached across steps and dataset items.
+
 @tool
+@memoize_tool(ttl=600, normalize=lower_arg)  # the lookup only uses query.lower()
 def search_knowledge_base(query: str) -> str:
     """
     Search an internal knowledge base for information.
@@ -58,6 +68,7 @@ def search_knowledge_base(query: str) -> str:
 
 
 @tool
+@memoize_tool(ttl=60, source="orders")  # exact key: order IDs are looked up as given
 def check_order_status(order_id: str) -> str:
     """
     Check the status of a customer order.
@@ -80,12 +91,6 @@ def check_order_status(order_id: str) -> str:
 def create_agent_dataset():
     """Create a dataset of customer support questions with expected behaviors."""
 
-    dataset = get_client().create_dataset(
-        name="agent-eval-v1",
-        description="Customer support agent evaluation dataset",
-        metadata={"domain": "e-commerce_support"}
-    )
-
     test_cases = [
         {
             "input": {"question": "What is your return policy for electronics?"},
@@ -128,15 +133,17 @@ def create_agent_dataset():
         },
     ]
 
-    for case in test_cases:
-        get_client().create_dataset_item(
-            dataset_name="agent-eval-v1",
-            input=case["input"],
-            expected_output=case["expected_output"],
-        )
+    # Concurrent batched upload; items already in the dataset are skipped
+    stats = upload_items(
+        get_client(),
+        "agent-eval-v1",
+        test_cases,
+        description="Customer support agent evaluation dataset",
+        metadata={"domain": "e-commerce_support"},
+    )
 
-    print(f"Created dataset with {len(test_cases)} test cases")
-    return dataset
+    print(f"Dataset agent-eval-v1: {format_stats(stats)}")
+    return stats
 
 
 # =============================================================================
@@ -213,15 +220,24 @@ def judge_agent_response(question: str, response: str, expected: dict) -> dict:
 # RUN THE EVALUATION EXPERIMENT
 # =============================================================================
 
-def run_agent_evaluation():
-    """Run the agent on each dataset item and evaluate with the LLM judge."""
+def run_agent_evaluation(dataset_version: str = None):
+    """
+    Run the agent on each dataset item and evaluate with the LLM judge.
+
+    The items come from the local dataset cache (revalidated against Langfuse,
+    or not at all with CHEFKIT_OFFLINE=1); pass `dataset_version` to re-run
+    on exactly the items of an earlier experiment.
+    """
 
-    dataset = get_client().get_dataset("agent-eval-v1")
+    dataset = load_dataset(get_client(), "agent-eval-v1", version=dataset_version)
+    print(f"Dataset agent-eval-v1 version {dataset.version} ({len(dataset.items)} items)")
     agent = build_support_agent()
 
     def task(*, item) -> str:
         # Run the agent on the question — reset memory for each item
-        return str(agent.run(item.input["question"]))
+        output = str(agent.run(item.input["question"]))
+        report_cache_stats()
+        return output
 
     def evaluator(**kwargs) -> list:
         output = kwargs.get("output", "")
@@ -252,6 +268,7 @@ def run_agent_evaluation():
         metadata={
             "agent_model": "groq/llama-3.3-70b-versatile",
             "judge_model": "llama-3.3-70b-versatile",
+            "dataset_version": dataset.version,
         },
     )
 
@@ -0,0 +1,100 @@
+import ast
+
+import pytest
+
+from chefkit.agentdocs import _compile, compact_text, prompt_cache_stats, python_type
+
+
+@pytest.fixture(autouse=True)
+def no_download(monkeypatch):
+    monkeypatch.setenv("CHEFKIT_TOKENIZERS", "0")
+
+
+def test_python_type():
+    assert [python_type(t) for t in ("string", "integer", "number", "array", "object", "any", "image")] == [
+        "str", "int", "float", "list", "dict", "Any", "Any"]
+    assert python_type(["string", "null"]) == "str | None"
+
+
+def test_a_tool_compiles_to_a_valid_annotated_stub():
+    fragment = _compile("menu_search", "Recherche\n    des plats", {
+        "category": {"type": "string", "description": "La catégorie", "nullable": True},
+        "max_price": {"type": "number", "description": "Prix\n   max"},
+        "tags": {"type": "array", "description": "tags", "nullable": True},
+    }, "array")
+    assert fragment.code == (
+        "def menu_search(category: str | None, max_price: float, tags: list = None) -> list:\n"
+        '    """Recherche des plats. Args: category: La catégorie; max_price: Prix max"""'
+    )
+    function = ast.parse(fragment.code).body[0]
+    assert [ast.unparse(arg.annotation) for arg in function.args.args] == ["str | None", "float", "list"]
+    assert fragment.text.startswith("menu_search(category: string = None, max_price: number, tags: array = None)")
+
+
+def test_an_output_schema_is_inlined():
+    fragment = _compile("order", "Commande.", {}, "object", output_schema={"type": "object", "required": ["id"]})
+    assert fragment.code == 'def order() -> dict:\n    """Commande. Returns: {"type":"object","required":["id"]}"""'
+
+
+@pytest.fixture
+def team():
+    """team(description) -> (manager, chef): a CodeAgent manager with one managed CodeAgent."""
+    smolagents = pytest.importorskip("smolagents")
+
+    class Idle(smolagents.Model):
+        def generate(self, messages, **kwargs):
+            raise AssertionError("no LLM call expected")
+
+    def menu_search(category: str, max_price: float = None) -> str:
+        """Recherche des plats
+        du menu.
+
+        Args:
+            category: La catégorie
+                du plat
+            max_price: Prix maximum
+        """
+        return category
+
+    def team(description="Expert cuisine\n    propose des plats"):
+        chef = smolagents.CodeAgent(tools=[smolagents.tool(menu_search)], model=Idle(model_id="idle"),
+                                    name="chef", description=description)
+        manager = smolagents.CodeAgent(tools=[], model=Idle(model_id="idle"), managed_agents=[chef])
+        return manager, chef
+    return team
+
+
+def test_compiled_prompts_are_smaller_and_keep_the_stubs(team):
+    from chefkit.agentdocs import compile_prompts, prompt_report
+
+    manager = compile_prompts(team()[0])
+    chef = manager.managed_agents["chef"]
+    assert ('def menu_search(category: str, max_price: float = None) -> str:\n'
+            '    """Recherche des plats du menu. Args: category: La catégorie du plat; max_price: Prix maximum"""'
+            in chef.initialize_system_prompt())
+    assert ('def chef(task: str, additional_args: dict = None) -> str:\n'
+            '    """Expert cuisine propose des plats"""' in manager.initialize_system_prompt())
+    report = prompt_report(manager)
+    assert set(report) == {"manager", "chef"}
+    for name, models in report.items():
+        assert models["idle"]["system_prompt"] < models["idle"]["uncompiled"]
+    assert set(report["chef"]["idle"]["fragments"]) == {"menu_search", "final_answer"}
+
+
+def test_the_system_prompt_is_rendered_once_per_configuration(team):
+    from chefkit.agentdocs import compile_prompts
+
+    before = prompt_cache_stats()
+    first = compile_prompts(team()[0]).initialize_system_prompt()
+    assert compile_prompts(team()[0]).initialize_system_prompt() == first
+    other = compile_prompts(team("Chef pâtissier")[0]).initialize_system_prompt()
+    assert "Chef pâtissier" in other and other != first
+    after = prompt_cache_stats()
+    assert after["hits"] - before["hits"] >= 1
+    assert after["renders"] - before["renders"] <= 2  # at most the first one and the new description
+
+    manager, _ = team()
+    compile_prompts(manager)
+    compile_prompts(manager)  # applying again keeps smolagents' own rendering available
+    assert "Expert cuisine" in manager.default_system_prompt()
+    assert compact_text(" a\n\n  b ") == "a b"
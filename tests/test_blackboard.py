@@ -0,0 +1,120 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from chefkit.blackboard import FACTS_HEADER, Blackboard
+
+
+class Tool:
+    """A tool stand-in counting its calls."""
+
+    def __init__(self, answer=str.upper):
+        self.answer = answer
+        self.calls = 0
+
+    def __call__(self, **arguments):
+        self.calls += 1
+        return self.answer(*arguments.values())
+
+
+def test_a_published_result_is_shared_by_the_agents():
+    board, menu_search = Blackboard(), Tool()
+    assert board.call("menu_search", {"category": "Plat"}, lambda: menu_search(category="Plat"), "chef") == "PLAT"
+    assert board.call("menu_search", {"category": "Plat"}, lambda: menu_search(category="Plat"), "nutritionist") == "PLAT"
+    assert board.call("menu_search", {"category": "Plat"}, lambda: menu_search(category="Plat"), "chef") == "PLAT"
+    assert menu_search.calls == 1
+    assert board.stats() == {"calls": 3, "tool_calls": 1, "hits": 2, "shared_hits": 1, "waits": 0, "facts": 1}
+
+
+def test_the_key_is_the_arguments_as_given():
+    board, check = Blackboard(), Tool()
+    for ingredient in ("Tomate ", "tomate", "tomate"):
+        board.call("check_dietary_info_tool", {"ingredient": ingredient}, lambda: check(ingredient=ingredient))
+    assert check.calls == 2
+    board.call("batch", {"items": ["a", "b"]}, lambda: check(items="ab"))
+    board.call("batch", {"items": ("a", "b")}, lambda: check(items="ab"))
+    board.call("batch", {"items": {"a", "b"}}, lambda: check(items="ab"))  # unhashable: called, not published
+    assert check.calls == 4 and board.stats()["facts"] == 3
+
+
+def test_a_running_call_is_waited_for_not_repeated():
+    board, started, release = Blackboard(), threading.Event(), threading.Event()
+    results, calls = [], []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "menu"
+
+    first = threading.Thread(target=lambda: results.append(board.call("menu_search", {}, slow, "chef")))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=lambda: results.append(board.call("menu_search", {}, slow, "budget_manager")))
+    second.start()
+    deadline = time.monotonic() + 5
+    while board.stats()["waits"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert results == ["menu", "menu"] and len(calls) == 1
+
+
+def test_a_failed_call_is_not_published():
+    board = Blackboard()
+
+    def fail():
+        raise RuntimeError("timeout")
+
+    with pytest.raises(RuntimeError):
+        board.call("menu_search", {}, fail)
+    assert board.call("menu_search", {}, lambda: "menu") == "menu" and board.stats()["facts"] == 1
+
+
+def test_facts_keep_the_most_recent_results_within_the_limits():
+    board = Blackboard(max_fact_chars=10, max_facts_chars=110)
+    assert board.facts() == ""
+    for category in ("Entrée", "Plat", "Dessert"):
+        board.call("menu_search", {"category": category}, lambda: f"{category} " * 5)
+    assert board.facts().splitlines() == [
+        FACTS_HEADER,
+        "- menu_search(category='Plat') -> Plat Plat  […]",
+        "- menu_search(category='Dessert') -> Dessert De […]",
+    ]
+
+
+def test_share_tools_covers_the_tree_and_hands_the_facts_to_managed_agents():
+    smolagents = pytest.importorskip("smolagents")
+    from chefkit.blackboard import SharedTool, share_tools
+
+    calls = []
+
+    def menu_search(category: str) -> str:
+        """Recherche des plats.
+
+        Args:
+            category: catégorie
+        """
+        calls.append(category)
+        return f"Soupe ({category})"
+
+    tasks = []
+    worker = SimpleNamespace(name="chef", tools={"menu_search": smolagents.tool(menu_search)},
+                             run=lambda task: tasks.append(task))
+    manager = SimpleNamespace(tools={"menu_search": smolagents.tool(menu_search), "final_answer": object()},
+                              managed_agents={"chef": worker})
+    board = Blackboard()
+    share_tools(manager, board)
+    share_tools(manager, board)  # applying again does not wrap twice
+    assert isinstance(manager.tools["menu_search"], SharedTool) and not isinstance(manager.tools["final_answer"], SharedTool)
+    assert isinstance(worker.tools["menu_search"].tool, smolagents.Tool)
+
+    assert manager.tools["menu_search"]("Plat") == "Soupe (Plat)"
+    assert worker.tools["menu_search"](category="Plat") == "Soupe (Plat)"
+    assert calls == ["Plat"] and board.stats()["shared_hits"] == 1
+
+    worker.run("Propose un plat")
+    assert tasks == [f"{FACTS_HEADER}\n- menu_search(category='Plat') -> Soupe (Plat)\n\nPropose un plat"]
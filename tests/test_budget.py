@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import pytest
+
+from chefkit.budget import RunBudget, apply_budget, partial_answer
+
+
+def usage(tokens):
+    return SimpleNamespace(token_usage=SimpleNamespace(input_tokens=tokens, output_tokens=0))
+
+
+def test_llm_calls_and_tokens_are_counted_until_the_limit():
+    budget = RunBudget(max_llm_calls=3, max_tokens=100)
+    assert budget.acquire() is None
+    budget.charge(usage(60))
+    assert budget.acquire() is None
+    budget.charge(usage(50))
+    assert budget.acquire() == "110 tokens" and budget.acquire() == "110 tokens"
+    assert budget.stats()["llm_calls"] == 2 and budget.stats()["refused_calls"] == 2
+    assert budget.stats()["stopped_by"] == "110 tokens"
+
+    budget = RunBudget(max_llm_calls=1)
+    budget.acquire()
+    budget.charge(SimpleNamespace())  # no usage reported
+    assert budget.acquire() == "1 LLM calls" and budget.tokens == 0
+
+
+def test_wall_time_starts_at_the_first_call(monkeypatch):
+    clock = iter([10.0, 10.0, 15.0, 15.0])
+    monkeypatch.setattr("chefkit.budget.time.monotonic", lambda: next(clock))
+    budget = RunBudget(max_seconds=5)
+    assert budget.elapsed() == 0.0
+    assert budget.acquire() is None
+    assert budget.acquire() == "5s"
+
+
+def test_partial_answer_uses_the_last_output_or_observation():
+    agent = SimpleNamespace(memory=SimpleNamespace(steps=[
+        SimpleNamespace(action_output=None, observations="Execution logs:\nSoupe, 4 €\nLast output from code snippet:\nNone"),
+        SimpleNamespace(action_output=None, observations=None),
+    ]))
+    assert partial_answer(agent, "3 LLM calls") == "[Partial answer, budget exhausted (3 LLM calls)] Soupe, 4 €"
+    agent.memory.steps.append(SimpleNamespace(action_output=["Soupe", "Tarte"], observations="ignored"))
+    assert partial_answer(agent, "x").endswith("['Soupe', 'Tarte']")
+    assert partial_answer(SimpleNamespace(), "x").endswith("no result yet.")
+
+
+@pytest.fixture
+def scripted():
+    """scripted(*steps): a smolagents model answering with the given code steps, one per call."""
+    smolagents = pytest.importorskip("smolagents")
+
+    class Scripted(smolagents.Model):
+        def __init__(self, steps):
+            super().__init__(model_id="scripted")
+            self.steps = list(steps)
+            self.calls = 0
+
+        def generate(self, messages, stop_sequences=None, **kwargs):
+            self.calls += 1
+            return smolagents.ChatMessage(role="assistant", content=f"Thought: -\n<code>\n{self.steps.pop(0)}\n</code>")
+    return Scripted
+
+
+def test_the_budget_is_shared_by_the_tree_and_ends_with_a_partial_answer(scripted):
+    from smolagents import CodeAgent
+
+    worker_model = scripted(["carte = ['Soupe de saison']", "'Soupe de saison, 4 €'"] + ["x = 1"] * 10)
+    worker = CodeAgent(tools=[], model=worker_model, name="chef", description="Propose des plats.",
+                       max_steps=10, verbosity_level=0)
+    manager_model = scripted(["r = chef(task='un plat')\nprint(r)"] + ["x = 1"] * 10)
+    manager = CodeAgent(tools=[], model=manager_model, managed_agents=[worker], max_steps=10, verbosity_level=0)
+
+    budget = RunBudget(max_llm_calls=3)
+    apply_budget(manager, budget)
+    assert manager.managed_agents["chef"].model.budget is budget
+    answer = manager.run("Un menu")
+
+    assert worker_model.calls + manager_model.calls == 3
+    assert answer.startswith("[Partial answer, budget exhausted (3 LLM calls)]")
+    assert "Soupe de saison, 4 €" in answer  # the worker's partial result, passed up to the manager
+    assert budget.stats()["stopped_by"] == "3 LLM calls"
+
+    apply_budget(manager, budget)  # applying again does not wrap twice
+    assert manager.model.model is manager_model
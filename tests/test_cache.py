@@ -0,0 +1,126 @@
+import types
+
+import pytest
+
+import chefkit.cache
+from chefkit.cache import ToolCache, cache_stats, invalidate, lower_arg, memoize_tool, normalize_arg, strip_arg
+
+MISSING = chefkit.cache._MISSING
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces time.monotonic in chefkit.cache; advance with clock.now += seconds."""
+    fake = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(chefkit.cache, "time", types.SimpleNamespace(monotonic=lambda: fake.now))
+    return fake
+
+
+def test_normalize_arg():
+    assert normalize_arg(" Crème  Fraîche ") == normalize_arg("crème fraîche")
+    assert normalize_arg("cre\u0300me") == normalize_arg("cr\u00e8me")  # decomposed / composed accent
+    assert normalize_arg(["A", ("B",)]) == ("a", ("b",))
+    assert normalize_arg({"b": "X", "a": 1}) == (("a", 1), ("b", "x"))
+
+
+def test_lru_evicts_the_least_recently_used(clock):
+    cache = ToolCache("lru", maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is MISSING
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats() == {"hits": 3, "misses": 1, "size": 2, "hit_ratio": 0.75}
+
+
+def test_ttl_expiry(clock):
+    cache = ToolCache("ttl", ttl=60)
+    cache.put("a", 1)
+    clock.now += 59
+    assert cache.get("a") == 1
+    clock.now += 2
+    assert cache.get("a") is MISSING
+    assert cache.stats()["size"] == 0  # the expired entry is dropped
+
+    forever = ToolCache("forever", ttl=None)
+    forever.put("a", 1)
+    clock.now += 10 ** 9
+    assert forever.get("a") == 1
+
+
+def test_memoize_tool_keys_on_the_raw_arguments_by_default():
+    dietary = {"tomate": "légume"}
+
+    @memoize_tool()
+    def check_dietary_info(ingredient: str) -> str:
+        return dietary.get(ingredient.lower(), "Info non disponible.")
+
+    # A miss for "Tomate " must not be returned for "tomate", whatever the call order
+    assert check_dietary_info("Tomate ") == "Info non disponible."
+    assert check_dietary_info("tomate") == "légume"
+    assert check_dietary_info("Tomate ") == "Info non disponible."
+    assert check_dietary_info.cache.stats() == {"hits": 1, "misses": 2, "size": 2, "hit_ratio": 1 / 3}
+
+
+def test_memoize_tool_normalize_matches_the_tool_body():
+    calls = []
+
+    @memoize_tool(normalize=lower_arg)
+    def lookup(ingredient: str) -> str:
+        calls.append(ingredient)
+        return ingredient.lower()
+
+    assert lookup("Tomate") == lookup("tomate") == lookup("TOMATE") == "tomate"
+    assert lookup(" tomate") == " tomate"  # lower_arg does not strip: neither does the tool
+    assert calls == ["Tomate", " tomate"]
+    assert lookup(ingredient="tomate") == "tomate"  # keyword: its own key
+    assert len(calls) == 3
+
+
+def test_lower_and_strip_arg():
+    assert lower_arg(["A", ("B ",)]) == ("a", ("b ",))
+    assert strip_arg([" a ", 1]) == ("a", 1)
+
+
+def test_memoize_tool_unhashable_arguments_call_through():
+    calls = []
+
+    @memoize_tool(normalize=None)
+    def total(prices):
+        calls.append(prices)
+        return sum(prices)
+
+    assert total([1, 2]) == total([1, 2]) == 3
+    assert len(calls) == 2
+
+
+def test_memoize_tool_method_keys_include_self():
+    class Menu:
+        def __init__(self, items):
+            self.items = items
+
+        @memoize_tool(name="test_menu_search")
+        def forward(self, category):
+            return [i for i in self.items if i == category]
+
+    assert Menu(["a"]).forward("a") == ["a"]
+    assert Menu(["b"]).forward("a") == []
+
+
+def test_invalidate_flushes_the_caches_of_a_source():
+    fridge = ["oeufs"]
+
+    @memoize_tool(source="test-fridge")
+    def check_fridge():
+        return list(fridge)
+
+    assert check_fridge() == ["oeufs"]
+    fridge.append("lait")
+    assert check_fridge() == ["oeufs"]  # stale until invalidated
+    assert invalidate("test-fridge") == 1
+    assert check_fridge() == ["oeufs", "lait"]
+
+    stats = cache_stats()
+    assert stats[check_fridge.cache.name]["misses"] == 2
+    assert stats["overall"]["calls"] >= 3
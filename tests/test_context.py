@@ -0,0 +1,51 @@
+from chefkit.context import StepContext, estimate_tokens
+
+
+def tokens(items):
+    return sum(estimate_tokens(item) for item in items)
+
+
+def run_pipeline(ctx, outputs, instruction=""):
+    contexts = []
+    for step, output in outputs:
+        contexts.append(ctx.select(instruction))
+        ctx.add(step, output)
+    contexts.append(ctx.select(instruction))
+    return contexts
+
+
+def test_each_context_is_a_prefix_of_the_next():
+    ctx = StepContext(budget_tokens=200, summary_tokens=20)
+    ctx.pin("Contraintes : végétarien, budget étudiant.")
+    outputs = [(f"jour {i}", f"Menu du jour {i}. " + "Légumes de saison, riz et lentilles. " * (i * 3))
+               for i in range(1, 7)]
+    contexts = run_pipeline(ctx, outputs)
+    for before, after in zip(contexts, contexts[1:]):
+        assert after[:len(before)] == before
+    assert all(tokens(context) <= 200 for context in contexts)
+    assert ctx.stats()["context_tokens_sent"] < ctx.stats()["context_tokens_cumulative"]
+
+
+def test_a_short_output_is_sent_whole_a_long_one_as_its_summary():
+    ctx = StepContext(budget_tokens=100, summary_tokens=10)
+    ctx.add("frigo", "oeufs, lait")
+    assert ctx.select() == ["frigo: oeufs, lait"]
+    long = "Première idée de recette. " + "Détails sans fin. " * 50
+    ctx.add("recettes", long)
+    selected = ctx.select()
+    assert selected[0] == "frigo: oeufs, lait"
+    assert selected[1].startswith("recettes: Première idée de recette.") and selected[1] != f"recettes: {long}"
+
+
+def test_outputs_that_did_not_fit_wait_and_the_relevant_ones_go_first():
+    ctx = StepContext(budget_tokens=16, summary_tokens=12)
+    ctx.add("allergènes", "Gluten dans la pâte. " + "y " * 200)
+    ctx.add("desserts", "Tarte aux pommes. " + "x " * 200)  # more recent, but off topic
+    selected = ctx.select("vérifier les allergènes")
+    assert [text.split(":")[0] for text in selected] == ["allergènes"] and tokens(selected) <= 16
+    assert ctx.stats()["steps_left_out"] == 1
+
+    ctx.budget_tokens = 40  # room again: the waiting output is appended, as its summary
+    selected = ctx.select()
+    assert [text.split(":")[0] for text in selected] == ["allergènes", "desserts"]
+    assert selected[1] == "desserts: Tarte aux pommes. […]"
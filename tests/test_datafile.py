@@ -0,0 +1,90 @@
+import json
+import os
+
+import pytest
+
+from chefkit.datafile import DATA_DIR, MappedTable, build, build_table, load_table, read_source
+
+RECORDS = [
+    {"nom": "Soupe Potiron", "prix": 8, "vegan": True, "note": 4.5, "allergenes": [],
+     "nutrition": {"kcal": 120, "tags": ["hiver"]}},
+    {"nom": "Crème brûlée", "prix": 6, "vegan": False, "note": 4, "allergenes": ["lait", "oeufs"],
+     "nutrition": None},
+    {"nom": "Soupe Potiron", "prix": -1, "vegan": False, "note": 0.0, "allergenes": ["céleri"],
+     "nutrition": [1, "deux"]},
+]
+
+
+def test_round_trip_every_field_type(tmp_path):
+    table = MappedTable(build_table(RECORDS, tmp_path / "menu.tbl"))
+    assert dict(zip(table.fields, table.types)) == {"nom": "s", "prix": "i", "vegan": "b", "note": "f",
+                                                    "allergenes": "l", "nutrition": "j"}
+    assert list(table) == [{**r, "note": float(r["note"])} for r in RECORDS]
+    assert len(table) == 3 and table[-1] == table[2]
+    assert table.column("nom") == ["Soupe Potiron", "Crème brûlée", "Soupe Potiron"]
+    with pytest.raises(IndexError):
+        table[3]
+    table.close()
+
+
+def test_missing_values_and_identical_strings(tmp_path):
+    table = MappedTable(build_table([{"a": "x" * 100, "n": 1}, {"a": "x" * 100}, {"b": ["y"]}],
+                                    tmp_path / "sparse.tbl"))
+    assert list(table) == [{"a": "x" * 100, "n": 1, "b": []}, {"a": "x" * 100, "n": 0, "b": []},
+                           {"a": "", "n": 0, "b": ["y"]}]
+    # The repeated string is stored once
+    distinct = build_table([{"a": "x" * 100, "n": 1}, {"a": "z" * 100}, {"b": ["y"]}], tmp_path / "distinct.tbl")
+    assert os.path.getsize(distinct) - os.path.getsize(table.path) == 100
+
+
+def test_empty_table(tmp_path):
+    table = MappedTable(build_table([], tmp_path / "empty.tbl"))
+    assert len(table) == 0 and list(table) == [] and table.fields == []
+
+
+def test_not_a_table(tmp_path):
+    path = tmp_path / "bad.tbl"
+    path.write_bytes(b"NOPE" + bytes(64))
+    with pytest.raises(ValueError, match="not a version"):
+        MappedTable(path)
+
+
+def test_csv_typed_headers(tmp_path):
+    source = tmp_path / "fridge.csv"
+    source.write_text("ingredient,quantite:int,bio:bool,prix:float,tags:list,extra:json\n"
+                      'oeufs,6,oui,2.5,frais | protéines,"{""dlc"": 3}"\n'
+                      "lait,1,non,1,,null\n", encoding="utf-8")
+    assert read_source(source) == [
+        {"ingredient": "oeufs", "quantite": 6, "bio": True, "prix": 2.5, "tags": ["frais", "protéines"],
+         "extra": {"dlc": 3}},
+        {"ingredient": "lait", "quantite": 1, "bio": False, "prix": 1.0, "tags": [], "extra": None},
+    ]
+    assert list(MappedTable(build(source))) == read_source(source)
+
+
+def test_load_table_rebuilds_when_the_source_is_newer(tmp_path):
+    source = tmp_path / "recipes.json"
+    source.write_text(json.dumps([{"nom": "gratin"}]), encoding="utf-8")
+    assert load_table(source).column("nom") == ["gratin"]
+    assert load_table(tmp_path / "recipes.tbl") is load_table(source)  # opened once
+
+    previous = load_table(source)
+    source.write_text(json.dumps([{"nom": "gratin"}, {"nom": "quiche"}]), encoding="utf-8")
+    later = os.path.getmtime(tmp_path / "recipes.tbl") + 10
+    os.utime(source, (later, later))
+    assert load_table(source).column("nom") == ["gratin", "quiche"]
+    assert previous._mm.closed  # the old mapping is released
+
+
+def test_csv_unknown_type_names_the_column(tmp_path):
+    source = tmp_path / "fridge.csv"
+    source.write_text("ingredient,quantite:integer\noeufs,6\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="'quantite:integer'"):
+        read_source(source)
+
+
+@pytest.mark.parametrize("name", sorted(p.stem for p in DATA_DIR.glob("*.json")))
+def test_data_files_round_trip(tmp_path, name):
+    records = read_source(DATA_DIR / f"{name}.json")
+    table = MappedTable(build_table(records, tmp_path / f"{name}.tbl"))
+    assert [{k: row[k] for k in record} for record, row in zip(records, table)] == records
@@ -0,0 +1,68 @@
+import contextvars
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+@pytest.fixture
+def delegation():
+    pytest.importorskip("smolagents")
+    import chefkit.delegation
+    return chefkit.delegation
+
+
+class Agent:
+    """A managed agent stand-in: calling it returns `answer(task)`."""
+
+    def __init__(self, answer, managed_agents=None):
+        self.answer = answer
+        self.managed_agents = managed_agents or {}
+
+    def __call__(self, task):
+        return self.answer(task)
+
+
+def test_agents_run_at_the_same_time_and_results_are_joined(delegation):
+    both_started = threading.Barrier(2, timeout=5)  # breaks if the agents ran one after the other
+
+    def answer(name):
+        def run(task):
+            both_started.wait()
+            return f"{name}: {task} ({request_id.get()})"
+        return run
+
+    tool = delegation.ParallelDelegationTool({"nutritionist": Agent(answer("nutritionist")),
+                                              "chef": Agent(answer("chef"))})
+    request_id.set("req-1")
+    assert tool.forward({"nutritionist": "allergènes", "chef": "plats"}) == {
+        "nutritionist": "nutritionist: allergènes (req-1)",
+        "chef": "chef: plats (req-1)",
+    }
+
+
+def test_a_failed_agent_does_not_fail_the_others(delegation):
+    def fail(task):
+        raise RuntimeError("rate limit")
+
+    tool = delegation.ParallelDelegationTool({"chef": Agent(fail), "budget_manager": Agent(str.upper)})
+    assert tool.forward({"chef": "plats", "budget_manager": "prix"}) == {
+        "chef": "Error: agent 'chef' failed: RuntimeError: rate limit",
+        "budget_manager": "PRIX",
+    }
+    with pytest.raises(ValueError, match="Unknown agents \\['sommelier'\\]"):
+        tool.forward({"sommelier": "vins"})
+
+
+def test_the_tool_goes_to_every_manager_with_several_agents(delegation):
+    team = Agent(str, {"chef": Agent(str), "pâtissier": Agent(str)})
+    team.tools = {}
+    solo = Agent(str, {"chef": Agent(str)})
+    solo.tools = {}
+    manager = SimpleNamespace(managed_agents={"team": team, "solo": solo}, tools={})
+    delegation.enable_parallel_delegation(manager)
+    assert list(manager.tools) == ["delegate_parallel"] and list(team.tools) == ["delegate_parallel"]
+    assert solo.tools == {}
+    assert set(team.tools["delegate_parallel"].agents) == {"chef", "pâtissier"}
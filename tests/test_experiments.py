@@ -0,0 +1,147 @@
+import pytest
+
+from chefkit.experiments import OutputCache, expand, load_spec, run_matrix, summarize
+
+
+def make_spec(**overrides) -> dict:
+    spec = {"name": "test", "concurrency": 2, "params": {"judge": "j1"}, "score_params": ["judge"], "exclude": [],
+            "matrix": {"model": ["groq/big", "groq/small"], "routing": ["default", "routed"]}}
+    spec.update(overrides)
+    return spec
+
+
+ITEMS = [{"id": "a"}, {"id": "b"}]
+
+
+class Agent:
+    """run / score / load_items of run_matrix, counting the agent runs."""
+
+    def __init__(self, fail_on=()):
+        self.runs = []
+        self.fail_on = set(fail_on)
+
+    def run(self, params, item):
+        self.runs.append((params["model"], params["routing"], item["id"]))
+        if item["id"] in self.fail_on:
+            raise RuntimeError("agent crashed")
+        return f"{params['model']}:{item['id']}"
+
+    @staticmethod
+    def score(params, item, output):
+        return {"judge": params["judge"], "length": len(output)}
+
+    @staticmethod
+    def load_items(dataset):
+        return ITEMS
+
+
+def run(spec, agent, tmp_path, **kwargs):
+    return run_matrix(spec, agent.run, agent.score, agent.load_items, cache=OutputCache(tmp_path / "outputs"),
+                      journal_root=tmp_path / "journals", **kwargs)
+
+
+# --- expansion ------------------------------------------------------------------
+
+def test_expand_is_the_cartesian_product_named_by_the_varying_axes():
+    cells = expand(make_spec(matrix={"model": ["groq/big", "groq/small"], "routing": ["default", "routed"],
+                                     "dataset": ["scenarios"]}))
+    assert [c.name for c in cells] == ["model=big,routing=default", "model=big,routing=routed",
+                                       "model=small,routing=default", "model=small,routing=routed"]
+    assert cells[0].params == {"judge": "j1", "model": "groq/big", "routing": "default", "dataset": "scenarios"}
+
+
+def test_expand_table_axis_labels_and_exclude():
+    spec = make_spec(matrix={"model": ["groq/big", "groq/small"], "instructions": {"none": "", "batch": "Batch."}},
+                     exclude=[{"model": "small", "instructions": "batch"}])
+    cells = expand(spec)
+    assert [c.name for c in cells] == ["model=big,instructions=none", "model=big,instructions=batch",
+                                       "model=small,instructions=none"]
+    assert cells[1].params["instructions"] == "Batch."
+
+
+def test_expand_merges_identical_cells():
+    spec = make_spec(matrix={"model": ["groq/big"], "planning": {"off": 0, "none": 0, "two": 2}})
+    cells = expand(spec)
+    assert [(c.name, c.aliases) for c in cells] == [("planning=off", ["planning=none"]), ("planning=two", [])]
+    assert len({c.key for c in cells}) == 2
+
+
+def test_load_spec_toml_defaults(tmp_path):
+    path = tmp_path / "compare.toml"
+    path.write_text('[matrix]\nmodel = ["a", "b"]\n', encoding="utf-8")
+    spec = load_spec(path)
+    assert (spec["name"], spec["concurrency"], spec["params"], spec["exclude"]) == ("compare", 1, {}, [])
+    path.write_text("name = 'x'\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="matrix"):
+        load_spec(path)
+
+
+# --- output cache ---------------------------------------------------------------
+
+def test_output_cache_keys_ignore_the_score_params(tmp_path):
+    agent = Agent()
+    first = run(make_spec(), agent, tmp_path)
+    assert len(agent.runs) == 8 and not any(r["cached_output"] for r in first)
+
+    # Another judge, another run name: everything is re-scored, no agent runs again
+    stats = {}
+    second = run(make_spec(name="rejudge", params={"judge": "j2"}), agent, tmp_path, stats=stats)
+    assert len(agent.runs) == 8
+    assert stats["cached_outputs"] == 8 and all(r["scores"]["judge"] == "j2" for r in second)
+
+    # An agent parameter changes the key
+    run(make_spec(name="other", params={"judge": "j1", "temperature": 0.5}), agent, tmp_path)
+    assert len(agent.runs) == 16
+
+
+def test_duplicate_cells_share_one_agent_run(tmp_path):
+    agent = Agent()
+    spec = make_spec(matrix={"model": ["groq/big"], "routing": {"default": "default", "same": "default"}})
+    stats = {}
+    results = run(spec, agent, tmp_path, stats=stats)
+    assert stats["duplicates"] == 1 and len(results) == 2 and len(agent.runs) == 2
+    assert results[0]["aliases"] == ["routing=same"]
+
+
+def test_refresh_reruns_and_failed_outputs_are_not_cached(tmp_path):
+    agent = Agent()
+    run(make_spec(), agent, tmp_path)
+    run(make_spec(name="refreshed"), agent, tmp_path, refresh=True)
+    assert len(agent.runs) == 16
+
+    cache = OutputCache(tmp_path / "unsuccessful")
+    outputs = iter([{"success": False}, {"success": True}])
+    spec = make_spec(matrix={"model": ["groq/big"], "routing": ["default"]})
+    for name in ("first", "second"):
+        run_matrix({**spec, "name": name}, lambda params, item: next(outputs), lambda params, item, output: {},
+                   lambda dataset: ITEMS[:1], cache=cache, journal_root=tmp_path / "journals")
+    assert len(list(cache.root.glob("*.json"))) == 1
+
+
+# --- resume -------------------------------------------------------------------------
+
+def test_resume_from_the_journal_retries_only_the_errors(tmp_path):
+    crashing = Agent(fail_on={"b"})
+    stats = {}
+    first = run(make_spec(), crashing, tmp_path, stats=stats)
+    assert stats["errors"] == 4 and sum("error" in r for r in first) == 4
+
+    fixed = Agent()
+    stats = {}
+    second = run(make_spec(), fixed, tmp_path, stats=stats)
+    assert stats["resumed"] == 4 and stats["errors"] == 0
+    assert sorted(item for _, _, item in fixed.runs) == ["b"] * 4
+    assert [r["item"] for r in second] == [r["item"] for r in first]
+
+
+def test_shards_split_the_runs(tmp_path):
+    agent = Agent()
+    shards = [run(make_spec(), agent, tmp_path, shard=(i, 3)) for i in range(3)]
+    keys = [(r["cell_key"], r["item"]) for shard in shards for r in shard]
+    assert len(keys) == len(set(keys)) == 8
+
+
+def test_summarize_means_and_errors():
+    results = [{"cell": "a", "scores": {"score": 1.0, "ok": True}}, {"cell": "a", "scores": {"score": 0.5}},
+               {"cell": "a", "error": "boom"}]
+    assert summarize(results) == {"a": {"runs": 3, "errors": 1, "score": 0.75}}
@@ -0,0 +1,56 @@
+import pytest
+
+from chefkit.ingredients import Ingredient, IngredientKB, fold, get_kb, normalize_key
+
+
+@pytest.fixture(scope="module")
+def kb():
+    return get_kb()
+
+
+def test_normalize_key():
+    assert fold("Crème  Fraîche") == "creme fraiche"
+    assert fold("Œufs") == "oeufs"
+    assert normalize_key("crèmes fraîches") == normalize_key("Crème fraiche") == "creme fraiche"
+    assert normalize_key("gâteaux") == "gateau"
+    assert normalize_key("riz") == "riz"  # too short to lemmatize
+
+
+def test_exact_names_and_synonyms(kb):
+    assert kb.lookup("Crèmes Fraîches").name == "crème fraîche"
+    assert kb.lookup("crème liquide").name == "crème fraîche"
+    assert kb.lookup("Parmesan").name == "fromage"
+    assert kb.lookup("oeufs").name == "oeuf"
+    assert kb.lookup("") is None
+
+
+@pytest.mark.parametrize("text, prefix", [
+    ("beurre de cacahuète", "beurre"),  # peanuts, not lactose
+    ("lait de coco", "lait"),           # no lactose
+    ("farine de riz", "farine"),        # no gluten
+])
+def test_a_known_prefix_is_never_the_answer(kb, text, prefix):
+    assert kb.lookup(text) is None
+    assert [i.name for i in kb.partial(text)] == [prefix]
+    assert kb.lookup_many([text, "beurre"]) == {text: None, "beurre": kb.lookup("beurre")}
+
+
+def test_partial_candidates(kb):
+    assert [i.name for i in kb.partial("épin")] == ["épinards"]  # unique completion
+    assert kb.partial("beurre") == []  # known: nothing uncertain
+    assert kb.partial("cacahuète") == []
+    assert kb.partial("beurrette") == []  # not on a word boundary
+
+
+def test_complete(kb):
+    assert [i.name for i in kb.complete("crè")] == ["crème fraîche"]
+    assert {i.name for i in kb.complete("c")} >= {"champignons", "chèvre", "citron", "crème fraîche"}
+
+
+def test_a_synonym_never_shadows_a_name():
+    first = Ingredient("crème", "laitier", "")
+    kb = IngredientKB([first, Ingredient("crème dessert", "dessert", "", synonyms=["crème"])])
+    assert kb.lookup("crème") is first and len(kb) == 2
+    named = Ingredient("crème", "laitier", "")
+    kb = IngredientKB([Ingredient("crème dessert", "dessert", "", synonyms=["crème"]), named])
+    assert kb.lookup("crème") is named
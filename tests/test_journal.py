@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from chefkit.journal import Journal, merge_journals, parse_shard, read_journal, shard_items
+
+
+def test_parse_shard():
+    assert parse_shard("2/4") == (2, 4)
+    assert parse_shard("0") == (0, 1)
+    for text in ("4/4", "-1/2", "a/2"):
+        with pytest.raises(ValueError):
+            parse_shard(text)
+
+
+def test_shard_items_partition_is_stable_and_complete():
+    items = [f"item-{i}" for i in range(50)]
+    shards = [shard_items(items, i, 4) for i in range(4)]
+    assert sorted(sum(shards, [])) == sorted(items)
+    assert shards == [shard_items(items, i, 4) for i in range(4)]
+    assert shard_items(items, 0, 1) == items
+
+
+def test_resume_skips_successes_and_retries_errors(tmp_path):
+    journal = Journal(tmp_path / "run" / "journal.jsonl", durable=False)
+    journal.append("a", status="success", output=1)
+    journal.append("b", status="error", error="429")
+    journal.append("a", status="error", error="late failure")  # a success is never replaced
+
+    resumed = Journal(journal.path, durable=False)
+    assert resumed.is_done("a") and not resumed.is_done("b") and not resumed.is_done("c")
+    assert resumed.records["a"]["output"] == 1
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = Journal(path, durable=False)
+    journal.append("a", output=1)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "b", "stat')  # killed mid-write
+    assert [r["key"] for r in read_journal(path)] == ["a"]
+    assert Journal(path).is_done("a")
+
+
+def test_for_run_names_shard_journals(tmp_path):
+    assert Journal.for_run("demo/x", root=tmp_path).path == tmp_path / "demo_x" / "journal.jsonl"
+    assert Journal.for_run("demo", shard=(1, 4), root=tmp_path).path.name == "shard-1-of-4.jsonl"
+
+
+def test_merge_journals_last_success_wins(tmp_path):
+    shard_0 = Journal.for_run("demo", shard=(0, 2), root=tmp_path, durable=False)
+    shard_1 = Journal.for_run("demo", shard=(1, 2), root=tmp_path, durable=False)
+    shard_0.append("a", output="first")
+    shard_0.append("b", status="error")
+    shard_1.append("b", output="retried")
+    shard_1.append("a", status="error")
+
+    merged = merge_journals(tmp_path / "demo")
+    assert {r["key"]: r.get("output") for r in merged} == {"a": "first", "b": "retried"}
+    lines = (tmp_path / "demo" / "merged.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2 and all(json.loads(line)["status"] == "success" for line in lines)
+    # merging again does not read the previous merge
+    assert len(merge_journals(tmp_path / "demo")) == 2
@@ -0,0 +1,77 @@
+import pytest
+
+from chefkit.planning import FAILURE_SIGNALS, tool_failed
+
+
+def test_tool_failed():
+    assert tool_failed(None)
+    assert tool_failed("Aucun plat trouvé avec ces critères.")
+    assert tool_failed("  recette introuvable.")
+    assert tool_failed("Product 'x' not found", FAILURE_SIGNALS + ("Product '",))
+    # Normal answers that merely contain the words
+    assert not tool_failed('[{"nom": "Soupe sans erreur", "allergenes": []}]')
+    assert not tool_failed("Sans gluten, aucun allergène")
+    assert not tool_failed("Recettes : aucune introuvable")
+    assert not tool_failed(0) and not tool_failed([])
+
+
+@pytest.fixture
+def agent_with():
+    """agent_with(steps, **kwargs): an AdaptivePlanningAgent whose model answers with the given code steps."""
+    smolagents = pytest.importorskip("smolagents")
+    from chefkit.planning import AdaptivePlanningAgent
+
+    class Scripted(smolagents.Model):
+        def __init__(self, steps):
+            super().__init__(model_id="scripted")
+            self.steps = list(steps)
+
+        def generate(self, messages, stop_sequences=None, **kwargs):
+            if stop_sequences and "<end_plan>" in stop_sequences:
+                return smolagents.ChatMessage(role="assistant", content="1. Chercher\n<end_plan>")
+            return smolagents.ChatMessage(role="assistant", content=f"Thought: -\n<code>\n{self.steps.pop(0)}\n</code>")
+
+    def menu_search(category: str) -> str:
+        """Recherche des plats.
+
+        Args:
+            category: catégorie
+        """
+        return {"Plat": "Soupe sans erreur (aucun gluten)", "Apéritif": "Aucun plat trouvé."}.get(category)
+
+    def agent_with(steps, **kwargs):
+        return AdaptivePlanningAgent(tools=[smolagents.tool(menu_search)], model=Scripted(steps),
+                                     max_steps=6, verbosity_level=0, **kwargs)
+    return agent_with
+
+
+def observations(agent):
+    return [step.observations for step in agent.memory.steps if hasattr(step, "observations")]
+
+
+def test_normal_output_mentioning_errors_does_not_replan(agent_with):
+    agent = agent_with(["print(menu_search('Plat'))", "x = 1", "final_answer('ok')"])
+    assert agent.run("menu") == "ok"
+    assert agent.plan_stats == {"plans": 1, "skipped": 2, "early_exits": 0}
+
+
+@pytest.mark.parametrize("call", ["menu_search('Apéritif')", "menu_search('Dessert')"])
+def test_a_failed_tool_call_replans(agent_with, call):
+    agent = agent_with([f"r = {call}", "x = 1", "final_answer('ok')"])
+    agent.run("menu")
+    assert agent.plan_stats == {"plans": 2, "skipped": 1, "early_exits": 0}
+    assert "Tool call failed: menu_search ->" in observations(agent)[0]
+
+
+def test_failure_signals_are_configurable(agent_with):
+    agent = agent_with(["r = menu_search('Plat')", "final_answer('ok')"], failure_signals=("Soupe",))
+    agent.run("menu")
+    assert agent.plan_stats["plans"] == 2
+
+
+def test_verifier_accepts_or_rejects(agent_with):
+    verdicts = {1: "trop cher", 2: True}
+    agent = agent_with(["1", "2"], verifier=lambda candidate: verdicts.get(candidate))
+    assert agent.run("menu") == 2
+    assert agent.plan_stats == {"plans": 2, "skipped": 0, "early_exits": 1}
+    assert "Verification failed: trop cher" in observations(agent)[0]
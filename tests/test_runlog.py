@@ -0,0 +1,42 @@
+import gzip
+import json
+
+from chefkit.runlog import RunLog
+
+
+def events(path):
+    return [json.loads(line)["event"] for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_a_second_run_appends_to_the_same_files(tmp_path):
+    path = tmp_path / "run.txt"
+    for run in ("premier", "second"):
+        log = RunLog(path, echo=False)
+        log.write(f"\x1b[1m{run}\x1b[0m\n")
+        log.event("step", run=run)
+        log.close()
+    assert path.read_text(encoding="utf-8") == "premier\nsecond\n"
+    assert events(tmp_path / "run.events.jsonl") == ["step", "run_end", "step", "run_end"]
+
+
+def test_an_existing_file_over_max_bytes_is_rotated_first(tmp_path):
+    path = tmp_path / "run.txt"
+    path.write_text("x" * 100, encoding="utf-8")
+    log = RunLog(path, events=False, max_bytes=50, compress=False, echo=False)
+    log.write("nouveau\n")
+    log.close()
+    assert (tmp_path / "run.txt.1").read_text(encoding="utf-8") == "x" * 100
+    assert path.read_text(encoding="utf-8") == "nouveau\n"
+
+
+def test_rotation_keeps_compressed_backups(tmp_path):
+    path = tmp_path / "run.txt"
+    log = RunLog(path, events=False, max_bytes=10, backups=2, echo=False)
+    for line in ("aaaaaaaaaa\n", "bbbbbbbbbb\n", "cccccccccc\n"):
+        log.write(line)
+    log.close()
+    with gzip.open(tmp_path / "run.txt.1.gz", "rt", encoding="utf-8") as newest:
+        assert newest.read() == "cccccccccc\n"
+    with gzip.open(tmp_path / "run.txt.2.gz", "rt", encoding="utf-8") as oldest:
+        assert oldest.read() == "bbbbbbbbbb\n"
+    assert not (tmp_path / "run.txt.3.gz").exists() and log.stats()["rotations"] == 3
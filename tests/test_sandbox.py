@@ -0,0 +1,136 @@
+import multiprocessing
+
+import pytest
+
+from chefkit.sandbox import SandboxPool, _record, _state_changes, _worker_main
+
+
+# --- delta protocol ----------------------------------------------------------------
+
+def test_a_received_delta_removes_nothing():
+    seen = {}
+    _record({"a": 1, "b": [2]}, seen)
+    _record({"a": 5}, seen)  # only the variable that changed
+    assert {key: value for key, (value, _) in seen.items()} == {"a": 5, "b": [2]}
+
+
+def test_state_changes_against_the_executor_state():
+    seen = {}
+    state = {"a": 1, "b": [2], "f": lambda: 0}
+    _record({"a": 1, "b": [2]}, seen)
+    state["b"] = seen["b"][0]
+    assert _state_changes(state, seen) == ({}, [])  # the lambda can't be pickled: never shipped
+
+    state["b"].append(3)  # in place
+    state["c"] = "new"
+    del state["a"]
+    changes, removed = _state_changes(state, seen)
+    assert changes == {"b": [2, 3], "c": "new"} and removed == ["a"]
+    assert _state_changes(state, seen) == ({}, [])
+
+
+@pytest.fixture
+def worker():
+    """A worker process driven directly through its pipe."""
+    pytest.importorskip("smolagents")
+    ctx = multiprocessing.get_context("spawn")
+    conn, child = ctx.Pipe()
+    process = ctx.Process(target=_worker_main, args=(child, None, None), daemon=True)
+    process.start()
+    child.close()
+
+    def run(code, variables, full=False, session=1):
+        conn.send(("run", session, code, variables, full, [], [], None))
+        assert conn.poll(60)
+        return conn.recv()
+
+    yield run
+    conn.send(("stop",))
+    process.join(5)
+
+
+def user_changes(reply):
+    """(changes, removed) of a reply, without the executor's own bookkeeping variables."""
+    changes, removed = reply[-2:]
+    return {k: v for k, v in changes.items() if not k.startswith("_")}, removed
+
+
+def test_worker_ships_only_what_changed(worker):
+    reply = worker("c = a + len(b)", {"a": 1, "b": [1, 2]}, full=True)
+    assert reply[0] == "done" and user_changes(reply) == ({"c": 3}, [])
+
+    # Delta: only `a` is sent; b and c are still alive in the worker and in the parent
+    reply = worker("d = a + c", {"a": 10})
+    assert user_changes(reply) == ({"d": 13}, [])
+
+    reply = worker("b.append(a)\ndel c", {})
+    assert user_changes(reply) == ({"b": [1, 2, 10]}, ["c"])
+
+
+def test_worker_asks_for_a_resync_of_an_unknown_session(worker):
+    assert worker("x = 1", {}, session=42) == ("resync",)
+    assert worker("y = x + 1", {"x": 1}, full=True, session=42)[0] == "done"
+
+
+# --- pool --------------------------------------------------------------------------
+
+@pytest.fixture
+def pool():
+    pytest.importorskip("smolagents")
+    pool = SandboxPool(workers=1, timeout=5, cpu_seconds=None, memory_mb=None, acquire_timeout=0.2)
+    yield pool
+    pool.close()
+
+
+def executor(pool):
+    from chefkit.sandbox import PooledPythonExecutor
+
+    return PooledPythonExecutor(pool, [])
+
+
+def test_state_persists_across_steps(pool):
+    run = executor(pool)
+    run.send_variables({"menu": ["soupe"]})
+    run("menu.append('gratin')\ntotal = len(menu)")
+    assert run.state["menu"] == ["soupe", "gratin"] and run.state["total"] == 2
+    run.send_variables({"total": 10})
+    assert run("total + len(menu)").output == 12
+    assert run.state["menu"] == ["soupe", "gratin"]
+
+
+def test_tool_calls_run_in_the_parent(pool):
+    calls = []
+    run = executor(pool)
+    run.send_tools({"lookup": lambda name: calls.append(name) or name.upper()})
+    assert run("lookup('beurre')").output == "BEURRE"
+    assert calls == ["beurre"]
+
+
+def test_timeout_replaces_the_worker(pool):
+    from smolagents.local_python_executor import InterpreterError
+
+    pool.timeout = 0.5
+    run = executor(pool)
+    before = pool._workers[0]
+    with pytest.raises(InterpreterError, match="timed out"):
+        run("while True:\n    pass")
+    assert pool._workers[0] is not before
+    pool.timeout = 5
+    assert run("1 + 1").output == 2
+
+
+def test_a_busy_pool_runs_the_step_in_an_extra_worker(pool):
+    from smolagents.local_python_executor import InterpreterError
+
+    held = pool.acquire()
+    try:
+        run = executor(pool)
+        run.send_variables({"a": 1})
+        assert run("a + 1").output == 2
+        assert run.state["a"] == 1 and pool.overflow == 0  # the extra worker is gone
+
+        pool.max_overflow = 0
+        with pytest.raises(InterpreterError, match="No sandbox worker available"):
+            run("1")
+    finally:
+        pool.release(held)
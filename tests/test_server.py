@@ -0,0 +1,259 @@
+import asyncio
+import json
+import threading
+
+from chefkit.server import JsonServer, LLMBudget, Overloaded, _is_rate_limit, require
+
+
+class RateLimitError(Exception):
+    """Named like litellm's."""
+
+
+class Gate:
+    """A blocking handler that counts its calls and waits until opened."""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.opened = threading.Event()
+
+    def __call__(self, body: dict) -> dict:
+        self.calls.append(body)
+        self.started.set()
+        assert self.opened.wait(5)
+        return {"answer": body.get("question"), "call": len(self.calls)}
+
+
+def run(server: JsonServer, scenario):
+    async def main():
+        server._slots = asyncio.Semaphore(server.max_concurrency)  # what serve() sets up
+        return await scenario()
+    return asyncio.run(main())
+
+
+def post(server: JsonServer, path: str, body) -> asyncio.Task:
+    raw = body if isinstance(body, bytes) else json.dumps(body).encode()
+    return asyncio.ensure_future(server._respond("POST", path, raw))
+
+
+async def started(gate: Gate):
+    await asyncio.get_running_loop().run_in_executor(None, gate.started.wait, 5)
+    await asyncio.sleep(0.01)  # let the other requests reach the server
+
+
+# --- coalescing -------------------------------------------------------------------
+
+def test_identical_requests_share_one_execution():
+    server = JsonServer(max_concurrency=4)
+    gate = Gate()
+    server.route("POST", "/ask", gate, coalesce_key=lambda body: body["question"].lower())
+
+    async def scenario():
+        same = [post(server, "/ask", {"question": q}) for q in ("Soupe ?", "soupe ?", "SOUPE ?")]
+        other = post(server, "/ask", {"question": "Gratin ?"})
+        await started(gate)
+        gate.opened.set()
+        return await asyncio.gather(*same), await other
+
+    same, other = run(server, scenario)
+    assert [status for status, _, _ in same] == [200, 200, 200]
+    assert len({json.dumps(payload) for _, payload, _ in same}) == 1
+    assert other[0] == 200 and len(gate.calls) == 2
+    assert server.stats["coalesced"] == 2
+
+
+def test_coalescing_only_while_in_flight():
+    server = JsonServer()
+    calls = []
+    server.route("POST", "/ask", lambda body: calls.append(body) or {"n": len(calls)},
+                 coalesce_key=lambda body: body["question"])
+
+    async def scenario():
+        first = await post(server, "/ask", {"question": "q"})
+        second = await post(server, "/ask", {"question": "q"})
+        return first, second
+
+    first, second = run(server, scenario)
+    assert (first[1], second[1]) == ({"n": 1}, {"n": 2})
+    assert server.stats["coalesced"] == 0
+
+
+def test_coalesce_key_error_is_a_400():
+    server = JsonServer()
+    server.route("POST", "/ask", lambda body: {}, coalesce_key=lambda body: body["question"])
+    status, payload, _ = run(server, lambda: post(server, "/ask", {}))
+    assert status == 400 and "question" in payload["error"]
+
+
+# --- 429 ------------------------------------------------------------------------------
+
+def test_full_queue_answers_429_immediately():
+    server = JsonServer(max_concurrency=1, max_queue=1)
+    gate = Gate()
+    server.route("POST", "/ask", gate)
+
+    async def scenario():
+        running = post(server, "/ask", {"question": "1"})
+        await started(gate)
+        waiting = post(server, "/ask", {"question": "2"})
+        await asyncio.sleep(0.01)
+        rejected = await post(server, "/ask", {"question": "3"})
+        gate.opened.set()
+        return rejected, await running, await waiting
+
+    rejected, running, waiting = run(server, scenario)
+    assert rejected[0] == 429 and rejected[2] == {"Retry-After": "1"} and rejected[1]["error"] == "server busy"
+    assert (running[0], waiting[0]) == (200, 200)
+    assert server.stats["rejected"] == 1
+
+
+def test_exhausted_budget_answers_429_with_retry_after():
+    server = JsonServer(budget=LLMBudget(per_minute=6, burst=4))
+    calls = []
+    server.route("POST", "/plan", lambda body: calls.append(body) or {}, cost=3)
+
+    async def scenario():
+        return [await post(server, "/plan", {}) for _ in range(2)]
+
+    accepted, rejected = run(server, scenario)
+    assert accepted[0] == 200 and len(calls) == 1
+    # 1 token left, 3 needed at 0.1 token/s
+    assert rejected[0] == 429 and rejected[1]["retry_after"] == 20 and rejected[2] == {"Retry-After": "20"}
+
+
+def test_upstream_rate_limit_blocks_the_budget():
+    budget = LLMBudget(per_minute=600)
+    server = JsonServer(budget=budget, upstream_cooldown=7.5)
+
+    def handler(body):
+        try:
+            raise RateLimitError("429 from groq")
+        except RateLimitError as e:
+            raise RuntimeError("AgentGenerationError") from e
+
+    server.route("POST", "/ask", handler)
+
+    async def scenario():
+        return [await post(server, "/ask", {}) for _ in range(2)]
+
+    first, second = run(server, scenario)
+    assert first == (429, {"error": "upstream rate limited", "retry_after": 8}, {"Retry-After": "8"})
+    assert second[0] == 429 and second[1]["error"] == "upstream rate limited"
+    assert budget.tokens == 0 and server.stats["rejected"] == 2
+
+
+def test_handler_overloaded_is_a_429():
+    server = JsonServer()
+
+    def handler(body):
+        raise Overloaded(2.2, "kitchen closed")
+
+    server.route("POST", "/ask", handler)
+    assert run(server, lambda: post(server, "/ask", {})) == \
+        (429, {"error": "kitchen closed", "retry_after": 3}, {"Retry-After": "3"})
+
+
+def test_failed_request_refunds_the_budget():
+    budget = LLMBudget(per_minute=6, burst=3)
+    server = JsonServer(budget=budget)
+    server.route("POST", "/plan", lambda body: {"menu": require(body, "constraints")}, cost=3)
+
+    async def scenario():
+        return [await post(server, "/plan", body) for body in ({}, {"constraints": "vegan"})]
+
+    failed, accepted = run(server, scenario)
+    assert failed[0] == 400 and accepted == (200, {"menu": "vegan"}, {})
+    assert budget.tokens < 1
+
+
+def test_timed_out_handler_keeps_its_slot_until_it_returns():
+    budget = LLMBudget(per_minute=60, burst=2)
+    server = JsonServer(max_concurrency=1, budget=budget, request_timeout=0.05)
+    gate = Gate()
+    server.route("POST", "/ask", gate)
+
+    async def scenario():
+        timed_out = await post(server, "/ask", {"question": "1"})
+        assert server._slots.locked()  # the thread is still running
+        waiting = post(server, "/ask", {"question": "2"})
+        await asyncio.sleep(0.02)
+        assert len(gate.calls) == 1
+        gate.opened.set()
+        return timed_out, await waiting
+
+    timed_out, waiting = run(server, scenario)
+    assert timed_out[0] == 504 and waiting[0] == 200 and len(gate.calls) == 2
+    assert budget.tokens < 1  # no refund: the timed-out handler kept using the LLM
+
+
+def test_is_rate_limit():
+    assert _is_rate_limit(RateLimitError())
+    assert _is_rate_limit(ValueError("Rate limit reached for model"))
+    assert not _is_rate_limit(ValueError("boom"))
+
+
+def test_budget_refills_and_refunds():
+    budget = LLMBudget(per_minute=60, burst=2)
+    budget.take(2)
+    budget._updated -= 1.5  # 1.5 s later
+    budget.take(1)
+    budget.refund(5)
+    assert budget.tokens == 2
+
+
+# --- errors and HTTP -----------------------------------------------------------------
+
+def test_bad_requests():
+    server = JsonServer()
+    server.route("POST", "/ask", lambda body: {"answer": require(body, "question")})
+
+    async def scenario():
+        return [await post(server, "/ask", body) for body in ({"question": ""}, b"{not json", b"[1]")] + \
+            [await server._respond("GET", "/nowhere", b"")]
+
+    assert [status for status, _, _ in run(server, scenario)] == [400, 400, 400, 404]
+
+
+def test_http_round_trip_with_retry_after_header():
+    server = JsonServer(budget=LLMBudget(per_minute=60, burst=1))
+    server.route("POST", "/ask", lambda body: {"answer": body["question"].upper()})
+
+    async def scenario():
+        listener = await asyncio.start_server(server._handle_connection, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        responses = []
+        for _ in range(2):
+            body = json.dumps({"question": "crème"}).encode()
+            writer.write(b"POST /ask HTTP/1.1\r\nHost: x\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+            await writer.drain()
+            head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+            headers = dict(line.split(": ", 1) for line in head[1:] if line)
+            payload = json.loads(await reader.readexactly(int(headers["Content-Length"])))
+            responses.append((head[0], headers.get("Retry-After"), payload))
+        writer.close()
+        listener.close()
+        return responses
+
+    ok, limited = run(server, scenario)
+    assert ok == ("HTTP/1.1 200 OK", None, {"answer": "CRÈME"})
+    assert limited[:2] == ("HTTP/1.1 429 Too Many Requests", "1")
+
+
+def test_invalid_content_length_is_a_400():
+    server = JsonServer()
+    server.route("POST", "/ask", lambda body: {})
+
+    async def send(length):
+        listener = await asyncio.start_server(server._handle_connection, "127.0.0.1", 0)
+        reader, writer = await asyncio.open_connection("127.0.0.1", listener.sockets[0].getsockname()[1])
+        writer.write(b"POST /ask HTTP/1.1\r\nHost: x\r\nContent-Length: %s\r\n\r\n{}" % length)
+        status = (await reader.readline()).decode()
+        writer.close()
+        listener.close()
+        return status
+
+    async def scenario():
+        return [await send(length) for length in (b"abc", b"-5", b"2")]
+
+    assert run(server, scenario) == ["HTTP/1.1 400 Bad Request\r\n"] * 2 + ["HTTP/1.1 200 OK\r\n"]
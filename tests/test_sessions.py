@@ -0,0 +1,137 @@
+import sqlite3
+import threading
+
+import pytest
+
+from chefkit.sessions import (MemorySessionStore, RedisSessionStore, SessionConflict, SessionState,
+                              SQLiteSessionStore)
+
+
+def redis_store(max_idle, server):
+    """A client of the local Redis server, or of an in-process fakeredis server if there is none."""
+    redis = pytest.importorskip("redis")
+    store = RedisSessionStore(max_idle=max_idle, prefix="chefkit-test:")
+    try:
+        store._client.ping()
+    except redis.ConnectionError:
+        fakeredis = pytest.importorskip("fakeredis", reason="no Redis server on localhost:6379")
+        server.setdefault("fake", fakeredis.FakeServer())
+        store._client = fakeredis.FakeRedis(server=server["fake"])
+    return store
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def open_store(request, tmp_path):
+    """open_store(max_idle) -> a store; for sqlite and redis, every call is another client of the same data."""
+    shared = {}
+
+    def open_store(max_idle=3600):
+        if request.param == "memory":
+            return shared.setdefault("store", MemorySessionStore(max_idle=max_idle))
+        if request.param == "sqlite":
+            return SQLiteSessionStore(str(tmp_path / "sessions.db"), max_idle)
+        shared["redis"] = redis_store(max_idle, shared)
+        return shared["redis"]
+
+    yield open_store
+    if "redis" in shared:
+        client = shared["redis"]._client
+        for key in client.scan_iter("chefkit-test:*"):
+            client.delete(key)
+
+
+def test_round_trip_bumps_the_version(open_store):
+    store = open_store()
+    assert store.get("t1") is None
+    state = store.load("t1")
+    state.record_turn("Bonjour", "Bienvenue")
+    state.add_to_order({"nom": "Soupe", "prix": 8})
+    store.put(state)
+    assert state.version == 1
+    assert store.get("t1") == state
+    store.delete("t1")
+    assert store.get("t1") is None
+
+
+def test_a_stale_put_is_refused(open_store):
+    first, second = open_store(), open_store()
+    base = first.load("t1")
+    first.put(base)
+    mine, theirs = first.load("t1"), second.load("t1")
+    theirs.add_to_order({"nom": "Gratin", "prix": 12})
+    second.put(theirs)
+
+    mine.record_turn("L'addition", "42€")
+    with pytest.raises(SessionConflict):
+        first.put(mine)
+    assert mine.version == 1
+    assert first.get("t1") == theirs
+
+
+def test_update_replays_the_change_on_conflict(open_store):
+    first, second = open_store(), open_store()
+    calls = []
+
+    def change(state):
+        calls.append(state.version)
+        if len(calls) == 1:  # another worker saves the table meanwhile
+            second.update("t1", lambda other: other.add_to_order({"nom": "Gratin", "prix": 12}))
+        state.record_turn("Et un dessert", "Crème brûlée")
+
+    state = first.update("t1", change)
+    assert calls == [0, 1] and state.version == 2
+    saved = first.get("t1")
+    assert saved.order == [{"nom": "Gratin", "prix": 12}] and len(saved.turns) == 1
+
+
+def test_concurrent_updates_lose_nothing(open_store):
+    stores = [open_store() for _ in range(4)]
+
+    def serve(store, n):
+        for i in range(10):
+            store.update("t1", lambda state: state.record_turn(f"{n}-{i}", "ok", max_turns=100), retries=100)
+
+    threads = [threading.Thread(target=serve, args=(store, n)) for n, store in enumerate(stores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    state = stores[0].get("t1")
+    assert len(state.turns) == 40 and state.version == 40
+
+
+def test_an_expired_session_starts_over(open_store):
+    store = open_store(max_idle=60)
+    if isinstance(store, RedisSessionStore):
+        pytest.skip("Redis expires the key itself")
+    store.put(SessionState("t1", updated_at=0))  # idle for ages, not evicted yet
+    fresh = store.load("t1")
+    assert fresh.version == 0 and fresh.turns == []
+    store.put(fresh)
+    assert store.get("t1").version == 1
+
+
+def test_sqlite_adds_the_version_column(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)")
+    conn.execute("INSERT INTO sessions VALUES ('t1', ?, 1e12)", ('{"session_id": "t1", "updated_at": 1e12}',))
+    conn.commit()
+    conn.close()
+
+    store = SQLiteSessionStore(path)
+    state = store.get("t1")
+    assert state.version == 0
+    store.put(state)
+    assert store.get("t1").version == 1
+
+
+def test_context_and_turn_truncation():
+    state = SessionState("t1")
+    assert state.context() == ""
+    for i in range(8):
+        state.record_turn(f"q{i}", "x" * 700)
+    assert [t["client"] for t in state.turns] == [f"q{i}" for i in range(2, 8)]
+    assert state.turns[0]["agent"] == "x" * 600 + "…"
+    state.add_to_order({"nom": "Soupe", "prix": 8, "vegan": True})
+    assert "Commande en cours : Soupe (8€). Total : 8€" in state.context()
@@ -0,0 +1,80 @@
+import re
+
+import pytest
+
+import chefkit.tokens
+from chefkit.context import TRUNCATED, estimate_tokens, summarize
+from chefkit.tokens import _Tokenizer, count_tokens, fit_items, model_family, truncate
+
+LLAMA = "groq/llama-3.3-70b-versatile"
+
+
+@pytest.fixture(autouse=True)
+def no_download(monkeypatch):
+    monkeypatch.setenv("CHEFKIT_TOKENIZERS", "0")
+
+
+@pytest.fixture
+def word_tokenizer(monkeypatch):
+    """Llama's tokenizer replaced by one token per word (with its leading spaces)."""
+    vocab = []
+
+    def encode(text):
+        ids = []
+        for piece in re.findall(r"\s*\S+|\s+", text):
+            if piece not in vocab:
+                vocab.append(piece)
+            ids.append(vocab.index(piece))
+        return ids
+
+    spec = model_family(LLAMA)[1]
+    monkeypatch.setenv("CHEFKIT_TOKENIZERS", "1")
+    monkeypatch.setitem(chefkit.tokens._tokenizers, spec,
+                        _Tokenizer(encode, lambda ids: "".join(vocab[i] for i in ids), spec))
+
+
+def total(texts, model_id=None):
+    return sum(count_tokens(text, model_id) for text in texts)
+
+
+def test_fit_items_never_exceeds_the_budget():
+    texts = fit_items(["a" * 10, "b " * 5000, "c " * 5000], 300)
+    assert texts[0] == "a" * 10 and texts[1].endswith(TRUNCATED)
+    assert total(texts) <= 300
+
+
+@pytest.mark.parametrize("max_tokens", [0, 1, 2, 5, 17, 64, 300])
+@pytest.mark.parametrize("model_id", [None, LLAMA])
+def test_fit_items_budget_with_sentences_and_without(max_tokens, model_id):
+    items = ["court", "Une phrase. " * 40, "mot " * 400, "x" * 3000]
+    assert total(fit_items(items, max_tokens, model_id), model_id) <= max_tokens
+    assert total(fit_items(items, max_tokens, model_id, summary=False), model_id) <= max_tokens
+
+
+@pytest.mark.parametrize("max_tokens", [1, 3, 10, 100])
+def test_fit_items_with_the_model_tokenizer(word_tokenizer, max_tokens):
+    texts = fit_items(["oeufs", "crème " * 300, "Le gratin. " + "pâtes " * 300], max_tokens, LLAMA)
+    assert total(texts, LLAMA) <= max_tokens
+    if max_tokens == 100:
+        assert texts[0] == "oeufs" and count_tokens(texts[1], LLAMA) == 49  # 47 words + " […]"
+
+
+def test_truncate_counts_the_marker(word_tokenizer):
+    assert truncate("un deux trois quatre", 4, LLAMA) == "un deux trois quatre"
+    assert truncate("un deux trois quatre", 3, LLAMA) == "un deux" + TRUNCATED  # the marker is one token
+    assert truncate("un deux trois quatre", 0, LLAMA) == ""
+
+
+def test_summarize_keeps_sentences_and_counts_the_marker():
+    text = "Première phrase. Deuxième phrase plus longue. " + "Troisième. " * 10
+    assert summarize(text, 12) == "Première phrase." + TRUNCATED  # 12 tokens + 1 for the marker: too long
+    summary = summarize(text, 13)
+    assert summary == "Première phrase. Deuxième phrase plus longue." + TRUNCATED
+    assert estimate_tokens(summary) <= 13
+    assert summarize("Court.", 12) == "Court."
+
+
+def test_summarize_cuts_a_long_sentence_at_a_word():
+    summary = summarize("mot " * 100, 10)
+    assert summary == "mot " * 8 + "mot" + TRUNCATED and estimate_tokens(summary) <= 10
+    assert summarize("mot " * 100, 10, cut=lambda text, n: "cut") == "cut"
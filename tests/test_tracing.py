@@ -0,0 +1,86 @@
+import pytest
+
+from chefkit.tracing import TracingPolicy, parse_rates, truncate_payload
+
+
+def test_parse_rates():
+    assert parse_rates("*=0.1, ask_chef=1,chefbot-*=0.5") == {"*": 0.1, "ask_chef": 1.0, "chefbot-*": 0.5}
+    assert parse_rates("0.2") == {"*": 0.2}
+    assert parse_rates("") == {}
+
+
+def test_truncate_payload():
+    assert truncate_payload("x" * 10, max_chars=4) == "xxxx… [+6 chars]"
+    assert truncate_payload(list(range(5)), max_items=2) == [0, 1, "… +3 items"]
+    assert truncate_payload({"a": 1, "b": 2, "c": 3}, max_items=1) == {"a": 1, "…": "+2 keys"}
+    assert truncate_payload({"menu": [{"plats": ["soupe"]}]}, depth=2) == {"menu": ["{… 1 keys}"]}
+    assert truncate_payload(("a", 1.5, None)) == ["a", 1.5, None]
+
+
+def test_rate_exact_name_then_longest_pattern_then_default():
+    policy = TracingPolicy(tail_rates={"*": 0.1, "chefbot-*": 0.5, "chefbot-eval-*": 0.9, "ask_chef": 1})
+    rates = policy.tail_rates
+    assert policy.rate(rates, "ask_chef") == 1
+    assert policy.rate(rates, "chefbot-eval-7") == 0.9
+    assert policy.rate(rates, "chefbot-menu") == 0.5
+    assert policy.rate(rates, "plan") == 0.1
+    assert policy.tail_sampling and not TracingPolicy().tail_sampling
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("CHEFKIT_TRACE_TAIL", "*=0.2,ask_chef=1")
+    monkeypatch.setenv("CHEFKIT_TRACE_KEEP_ERRORS", "no")
+    policy = TracingPolicy.from_env(max_chars=10)
+    assert policy.tail_rates == {"*": 0.2, "ask_chef": 1.0}
+    assert not policy.keep_errors and policy.max_chars == 10 and policy.head_rates == {"*": 1.0}
+
+
+@pytest.fixture
+def traced():
+    """traced(policy) -> (tracer, exporter): an OpenTelemetry provider set up like init_tracing."""
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    from chefkit.tracing import _policy_sampler, _tail_sampling_processors
+
+    def traced(policy):
+        provider = TracerProvider(
+            sampler=_policy_sampler()(policy),
+            active_span_processor=_tail_sampling_processors()(policy) if policy.tail_sampling else None,
+        )
+        exporter = InMemorySpanExporter()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        return provider.get_tracer("test"), exporter
+    return traced
+
+
+def run_trace(tracer, name, error=False):
+    with tracer.start_as_current_span(name):
+        with tracer.start_as_current_span("child") as child:
+            if error:
+                child.set_attribute("langfuse.observation.level", "ERROR")
+
+
+def test_head_sampling_drops_whole_traces(traced):
+    policy = TracingPolicy(head_rates={"*": 1.0, "bruit": 0.0})
+    tracer, exporter = traced(policy)
+    run_trace(tracer, "bruit")
+    run_trace(tracer, "ask_chef")
+    assert sorted(span.name for span in exporter.get_finished_spans()) == ["ask_chef", "child"]
+    assert policy.stats()["head_dropped"] == 1 and policy.stats()["head_sampled"] == 1
+
+
+def test_tail_sampling_keeps_errors_and_exports_on_root_end(traced):
+    policy = TracingPolicy(tail_rates={"*": 0.0})
+    tracer, exporter = traced(policy)
+    for _ in range(5):
+        run_trace(tracer, "plan")
+    run_trace(tracer, "plan", error=True)
+    assert [span.name for span in exporter.get_finished_spans()] == ["child", "plan"]
+    assert policy.stats()["tail_dropped"] == 5 and policy.stats()["errors_kept"] == 1
+
+    with tracer.start_as_current_span("ask_chef"):
+        with tracer.start_as_current_span("child"):
+            pass
+        assert len(exporter.get_finished_spans()) == 2  # the child waits for the root's decision